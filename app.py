@@ -12,12 +12,13 @@ home_page = st.Page("pages/home.py", title="Home")
 demo_page = st.Page("pages/demo.py", title="Demo")
 eval_page = st.Page("pages/evaluation.py", title="Model Evaluation")
 doctors_page = st.Page("pages/doctors.py", title="Clinician Portal")
+admin_page = st.Page("pages/admin.py", title="Admin")
 
 # --- Setup Navigation With Sections---
 pages = {
     "": [home_page],
     "Projects": [demo_page, doctors_page],
-    "Performance": [eval_page]
+    "Performance": [eval_page, admin_page]
 }
 
 navigation = st.navigation(pages)
@@ -0,0 +1,58 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run any benchmark from the project root, e.g. `python -m benchmarks.bench_bmi`.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+from config import DATA_FILE
+
+
+def load_data():
+    """Reads data/data.csv the same way the notebook does."""
+    return pd.read_csv(DATA_FILE, na_values=[], keep_default_na=False)
+
+
+def synthetic_frame(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Builds a validated-style frame (the output schema of `UserDataCollector.validate`)
+    by resampling data/data.csv and drawing plausible weights and heights.
+    """
+    rng = np.random.default_rng(seed)
+    data = load_data()
+    idx = rng.integers(0, len(data), n_rows)
+    sample = data.iloc[idx].reset_index(drop=True)
+
+    return pd.DataFrame({
+        "Gender": sample["Gender"].to_numpy(dtype=object),
+        "Age": sample["Age"].to_numpy(dtype=float),
+        "Occupation": sample["Occupation"].to_numpy(dtype=object),
+        "Sleep Duration": sample["Sleep Duration"].to_numpy(dtype=float),
+        "Quality of Sleep": sample["Quality of Sleep"].to_numpy(dtype=float),
+        "Physical Activity Level": sample["Physical Activity Level"].to_numpy(dtype=float),
+        "Stress Level": sample["Stress Level"].to_numpy(dtype=float),
+        "Weight": rng.uniform(40, 160, n_rows).round(2),
+        "Height": rng.uniform(1.4, 2.05, n_rows),
+        "Heart Rate": sample["Heart Rate"].to_numpy(dtype=float),
+        "Daily Steps": sample["Daily Steps"].to_numpy(dtype=float),
+        "Blood Pressure": sample["Blood Pressure"].to_numpy(dtype=object),
+    })
+
+
+def best_time(func, *args, repeat: int = 3, **kwargs) -> float:
+    """Returns the best wall time (in seconds) of `repeat` calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label: str, n_rows: int, seconds: float):
+    """Prints one result line in a fixed-width format."""
+    rate = n_rows / seconds if seconds else float("inf")
+    print(f"{label:<28} {n_rows:>12,} rows  {seconds * 1e3:>12.3f} ms  {rate:>16,.0f} rows/sec")
@@ -0,0 +1,115 @@
+"""
+Throughput of concurrent single-record predictions, with and without micro-batching.
+
+--callers threads (50 by default, like 50 Streamlit sessions) each predict distinct, already
+validated synthetic patients back to back for --duration seconds:
+
+    direct    every call runs `compiled_pipeline.transform` and `scorer.score` on its own record
+              (what `helper.predictor.predict` did on a cache miss before micro-batching)
+    batched   every call goes through a `MicroBatcher`, which scores the records of concurrent
+              callers together
+
+The prediction cache is bypassed in both modes. Reports predictions/sec, latency percentiles,
+whether both modes give the same predictions, and the batch-size and queueing-delay statistics.
+
+Usage:
+    python -m benchmarks.bench_batching [--callers 50] [--duration 5] [--max-wait-ms 2] [--max-batch 64]
+"""
+
+import argparse
+import threading
+import time
+import warnings
+
+import numpy as np
+
+from helper.artifacts import registry
+from helper.batching import MicroBatcher, predict_frame
+from helper.synthetic_data import PatientGenerator
+from helper.utils import UserDataCollector
+
+
+def validated_records(n: int, seed: int = 7) -> list:
+    """`n` synthetic form records, each validated into its own one-row frame."""
+    collector = UserDataCollector()
+    raw = PatientGenerator.from_csv().sample(n, seed=seed, schema='raw')
+    return [collector.validate(record) for record in raw.to_dict('records')]
+
+
+def run_mode(predict, records, callers, duration):
+    """(predictions, latencies in seconds, elapsed) of `callers` threads calling `predict`."""
+    latencies = []  # list.append is atomic, the callers share it
+    deadline = time.perf_counter() + duration
+
+    def caller(offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            record = records[i % len(records)]
+            i += callers
+            start = time.perf_counter()
+            predict(record)
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), np.array(latencies), time.perf_counter() - start
+
+
+def report(name, n, latencies, elapsed):
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1e3
+    print(f"{name:<8} {n / elapsed:>9,.0f} predictions/s   p50 {p50:>8.2f} ms   p90 {p90:>8.2f} ms"
+          f"   p99 {p99:>8.2f} ms   max {latencies.max() * 1e3:>8.2f} ms")
+    return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=50, help="Concurrent callers")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per mode")
+    parser.add_argument("--patients", type=int, default=2_000, help="Distinct patients predicted")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", category=FutureWarning)
+    artifacts = registry.artifacts()
+    records = validated_records(args.patients)
+    batcher = MicroBatcher(max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+    def direct(record):
+        return predict_frame(record, artifacts)[0]
+
+    def batched(record):
+        return batcher.predict(record, artifacts)
+
+    # Same predictions either way (confidences up to floating-point differences between batch sizes)
+    sample = records[:200]
+    expected = [direct(record) for record in sample]
+    futures = [batcher.submit(record, artifacts) for record in sample]
+    got = [future.result() for future in futures]
+    same_labels = all(a[0] == b[0] for a, b in zip(expected, got))
+    max_diff = max(abs(a[1] - b[1]) for a, b in zip(expected, got))
+    print(f"{args.callers} callers, {args.duration:g} s per mode, model {artifacts.version} ({artifacts.source})")
+    print(f"batched == direct on {len(sample)} records: labels {'identical' if same_labels else 'DIFFER'}, "
+          f"max confidence difference {max_diff:.2e}\n")
+
+    run_mode(direct, records, args.callers, min(args.duration, 1.0))  # warm-up
+    unbatched = report("direct", *run_mode(direct, records, args.callers, args.duration))
+    batcher.reset_stats()
+    gained = report("batched", *run_mode(batched, records, args.callers, args.duration))
+    print(f"\nspeedup x{gained / unbatched:.1f}")
+
+    stats = batcher.stats()
+    print(f"batches {stats['batches']:,}, mean size {stats['mean_batch_size']:.1f}, "
+          f"max size {stats['max_batch_size']}")
+    print("batch sizes: " + ", ".join(f"{size}: {count:,}" for size, count in stats['batch_size_histogram'].items()))
+    print(f"queueing delay p50 {stats['queue_delay_ms_p50']:.2f} ms, p99 {stats['queue_delay_ms_p99']:.2f} ms, "
+          f"max {stats['queue_delay_ms_max']:.2f} ms; batch scoring p50 {stats['batch_ms_p50']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark for BMICategorizer: the original row-wise `apply` against the columnar implementation.
+
+Usage:
+    python -m benchmarks.bench_bmi [--sizes 1000 100000 1000000] [--legacy-max 1000000]
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+
+from benchmarks._common import best_time, report, synthetic_frame
+from transformers import BMICategorizer
+
+
+def legacy_transform(X):
+    """The original row-wise implementation, kept here as the reference."""
+    X = X.copy()
+    X['BMI'] = X['Weight'] / (X['Height'] ** 2)
+
+    def categorize(row):
+        bmi = row['BMI']
+        gender = str(row['Gender']).lower() if isinstance(row['Gender'], str) else None
+        if gender == 'male':
+            if bmi <= 25:
+                return 'Normal Weight'
+            elif bmi <= 30:
+                return 'Overweight'
+            else:
+                return 'Obese'
+        elif gender == 'female':
+            if bmi <= 24:
+                return 'Normal Weight'
+            elif bmi <= 39:
+                return 'Overweight'
+            else:
+                return 'Obese'
+        else:
+            return 'Unknown'
+
+    X['BMI Category'] = X.apply(categorize, axis=1)
+    X.drop(columns=['Weight', 'Height', 'BMI'], inplace=True)
+    return X
+
+
+def check_equivalence(n_rows=100_000):
+    """Asserts that both implementations agree, including odd genders and boundary BMIs."""
+    frame = synthetic_frame(n_rows)
+    rng = np.random.default_rng(0)
+
+    # Odd genders and exact threshold values
+    odd = np.array(["MALE", "female", "Other", "", None, np.nan, 1], dtype=object)
+    frame.loc[frame.index[:len(odd) * 50], "Gender"] = np.tile(odd, 50)
+    for bmi in (24, 25, 30, 39):
+        rows = rng.integers(0, n_rows, 100)
+        frame.loc[rows, "Height"] = 1.0
+        frame.loc[rows, "Weight"] = float(bmi)
+
+    expected = legacy_transform(frame)
+    actual = BMICategorizer().transform(frame)
+    pd.testing.assert_frame_equal(actual, expected)
+    print(f"Equivalence check passed on {n_rows:,} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--legacy-max", type=int, default=1_000_000,
+                        help="Skip the row-wise version above this many rows (it is slow)")
+    args = parser.parse_args()
+
+    check_equivalence()
+    transformer = BMICategorizer()
+    for n in args.sizes:
+        frame = synthetic_frame(n)
+        if n <= args.legacy_max:
+            report("row-wise apply (before)", n, best_time(legacy_transform, frame, repeat=1))
+        report("columnar (after)", n, best_time(transformer.transform, frame))
+
+
+if __name__ == "__main__":
+    main()
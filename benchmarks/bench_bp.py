@@ -0,0 +1,71 @@
+"""
+Benchmark for BPClassifier: the original per-row split/classify against the columnar implementation.
+
+Usage:
+    python -m benchmarks.bench_bp [--sizes 1 1000 100000 10000000] [--legacy-max 100000]
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+
+from benchmarks._common import best_time, report, synthetic_frame
+from transformers import BPClassifier
+
+
+def legacy_transform(X):
+    """The original row-wise implementation, kept here as the reference."""
+    X = X.copy()
+    classifier = BPClassifier()
+
+    if 'Blood Pressure' in X.columns:
+        def split_bp(bp_value):
+            try:
+                systolic, diastolic = bp_value.split('/')
+                return int(systolic), int(diastolic)
+            except (ValueError, AttributeError):
+                return None, None
+
+        X[['Systolic BP', 'Diastolic BP']] = X['Blood Pressure'].apply(lambda x: pd.Series(split_bp(x)))
+        X.drop(columns=['Blood Pressure'], inplace=True)
+
+    if 'Systolic BP' in X.columns and 'Diastolic BP' in X.columns:
+        X['BP Category'] = X.apply(
+            lambda row: classifier.classify_bp(row['Systolic BP'], row['Diastolic BP']), axis=1)
+        X.drop(columns=['Systolic BP', 'Diastolic BP'], inplace=True)
+
+    return X
+
+
+def check_equivalence():
+    """Asserts that both implementations agree on every integer pair in range and on malformed strings."""
+    sbp, dbp = np.meshgrid(np.arange(40, 260), np.arange(20, 160))
+    strings = [f"{s}/{d}" for s, d in zip(sbp.ravel(), dbp.ravel())]
+    strings += ["", "120", "120/80/70", "abc/80", "120/", " 126 / 83 ", "+120/-80", "120.5/80", None, np.nan, 120]
+    frame = pd.DataFrame({"Blood Pressure": pd.Series(strings, dtype=object)})
+    pd.testing.assert_frame_equal(BPClassifier().transform(frame), legacy_transform(frame))
+
+    # The Systolic/Diastolic pair path used by the app
+    pairs = pd.DataFrame({"Systolic BP": sbp.ravel(), "Diastolic BP": dbp.ravel()})
+    pd.testing.assert_frame_equal(BPClassifier().transform(pairs), legacy_transform(pairs))
+    print(f"Equivalence check passed on {len(frame) + len(pairs):,} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 1_000, 100_000, 10_000_000])
+    parser.add_argument("--legacy-max", type=int, default=100_000,
+                        help="Skip the row-wise version above this many rows (it is slow)")
+    args = parser.parse_args()
+
+    check_equivalence()
+    transformer = BPClassifier()
+    for n in args.sizes:
+        frame = synthetic_frame(n)[["Blood Pressure"]]
+        if n <= args.legacy_max:
+            report("row-wise apply (before)", n, best_time(legacy_transform, frame, repeat=1))
+        report("columnar (after)", n, best_time(transformer.transform, frame))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark for CompiledPipeline against the five-step sklearn `pipeline.transform`.
+
+Reports single-row latency percentiles (p50/p99) and large-batch throughput.
+
+Usage:
+    python -m benchmarks.bench_compiled [--calls 2000] [--sizes 10000 1000000]
+"""
+
+import argparse
+import time
+import warnings
+import numpy as np
+
+from benchmarks._common import best_time, report, synthetic_frame
+from transformers.pipeline import default_pipeline as pipeline, default_compiled_pipeline as compiled_pipeline
+
+
+def pipeline_transform(X):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=FutureWarning)
+        return pipeline.transform(X)
+
+
+def check_equivalence(n_rows=50_000):
+    """Asserts bit-identical output, including unknown occupations and unparseable readings."""
+    frame = synthetic_frame(n_rows)
+    frame.loc[::7, "Occupation"] = "Others"
+    frame.loc[::11, "Occupation"] = "software engineer"
+    frame.loc[::13, "Blood Pressure"] = "not a reading"
+    frame.loc[::17, "Gender"] = "Female"
+
+    expected = pipeline_transform(frame)
+    actual = compiled_pipeline.transform(frame)
+    assert actual.dtype == expected.dtype and actual.shape == expected.shape
+    assert np.array_equal(actual, expected), "CompiledPipeline output differs from pipeline.transform"
+
+    # Systolic/Diastolic pairs, as sent by the app pages
+    systolic, diastolic = (frame["Blood Pressure"].str.split("/", expand=True)
+                           .apply(lambda c: c.str.extract(r"(\d+)", expand=False).astype(float))
+                           .fillna(120).astype(int).to_numpy().T)
+    pairs = frame.drop(columns=["Blood Pressure"]).assign(**{"Systolic BP": systolic, "Diastolic BP": diastolic})
+    assert np.array_equal(compiled_pipeline.transform(pairs), pipeline_transform(pairs))
+    print(f"Bit-identical check passed on {n_rows:,} rows (x2)")
+
+
+def latency(func, frame, calls):
+    """Per-call latencies in microseconds."""
+    timings = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        func(frame)
+        timings[i] = time.perf_counter() - start
+    return timings * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2_000, help="Single-row calls to time")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    args = parser.parse_args()
+
+    check_equivalence()
+
+    row = synthetic_frame(1)
+    print(f"\nSingle-row latency over {args.calls:,} calls")
+    for label, func in [("sklearn pipeline", pipeline_transform), ("compiled", compiled_pipeline.transform)]:
+        timings = latency(func, row, args.calls)
+        p50, p99 = np.percentile(timings, [50, 99])
+        print(f"{label:<28} p50 {p50:>10.1f} us   p99 {p99:>10.1f} us")
+
+    print("\nBatch throughput")
+    for n in args.sizes:
+        frame = synthetic_frame(n)
+        report("sklearn pipeline", n, best_time(pipeline_transform, frame, repeat=1))
+        report("compiled", n, best_time(compiled_pipeline.transform, frame))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark for EncodeScaleTransformer: the saved_encoder and saved_scaler steps against the fused
+stage writing into a preallocated float64 or float32 array.
+
+Checks that the fused stage matches the two steps (float64 within 1e-12, float32 within float32
+rounding) on validated rows, unknown and missing categories, then reports, per batch size, the
+time of each and the peak memory one warm call allocates (tracemalloc).
+
+Usage:
+    python -m benchmarks.bench_encode_scale [--sizes 1 10 1000 100000 1000000]
+"""
+
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks._common import best_time, report, synthetic_frame
+from config import CAT_FEATURES, FEATURE_ENCODER, SCALER_FILE
+from helper.artifacts import registry
+from transformers import (BMICategorizer, BPClassifier, EncodeScaleTransformer, FeatureCorrecter,
+                          SavedEncoderTransformer, SavedScalerTransformer)
+
+
+def stage_input(n_rows: int) -> pd.DataFrame:
+    """What the encoder step gets in the pipeline: the output of FeatureCorrecter."""
+    return FeatureCorrecter().transform(BPClassifier().transform(BMICategorizer().transform(synthetic_frame(n_rows))))
+
+
+def peak_allocated(func, *args) -> int:
+    """Peak bytes allocated (and traced) during one call, after a warm-up call."""
+    func(*args)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def check_equivalence(encoder, scaler, fused):
+    """Asserts that the fused stage matches the two steps it replaces."""
+    n_checked = 0
+    for n_rows in (1, 7, fused.SMALL + 1, 5_000, fused.BLOCK + 3):
+        frame = stage_input(n_rows)
+        rng = np.random.default_rng(n_rows)
+        # Unknown and missing categories, in every categorical column
+        for col in CAT_FEATURES:
+            rows = rng.choice(n_rows, size=min(3, n_rows), replace=False)
+            frame.loc[rows, col] = pd.Series(['Others', None, np.nan][:len(rows)], index=rows, dtype=object)
+        expected = scaler.transform(encoder.transform(frame))
+
+        np.testing.assert_allclose(fused.transform(frame, out=np.empty(expected.shape)), expected,
+                                   rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(fused.transform(frame, out=np.empty(expected.shape, dtype=np.float32)),
+                                   expected, rtol=1e-6, atol=1e-6)
+        n_checked += n_rows
+    print(f"Equivalence check passed on {n_checked:,} rows (float64 and float32)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    f_encoder, scaler = registry.load(FEATURE_ENCODER), registry.load(SCALER_FILE)
+    encoder = SavedEncoderTransformer(f_encoder, CAT_FEATURES)
+    saved_scaler = SavedScalerTransformer(scaler)
+    fused = EncodeScaleTransformer(f_encoder, scaler, CAT_FEATURES)
+    check_equivalence(encoder, saved_scaler, fused)
+
+    def two_steps(frame):
+        return saved_scaler.transform(encoder.transform(frame))
+
+    for n in args.sizes:
+        frame = stage_input(n)
+        out64 = np.empty((n, len(scaler.feature_names_in_)))
+        out32 = np.empty(out64.shape, dtype=np.float32)
+        repeat = max(3, 1_000 // n)  # single rows are timed over many calls
+        for label, func, args_ in (("encoder + scaler (before)", two_steps, (frame,)),
+                                   ("fused into float64", fused.transform, (frame, out64)),
+                                   ("fused into float32", fused.transform, (frame, out32))):
+            report(label, n, best_time(func, *args_, repeat=repeat))
+            print(f"{'':<28} {'':>12}       peak allocated {peak_allocated(func, *args_) / 1024:>12,.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
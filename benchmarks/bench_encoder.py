@@ -0,0 +1,75 @@
+"""
+Benchmark for SavedEncoderTransformer: one `OrdinalEncoder.transform` per column against the
+compiled lookup tables.
+
+Usage:
+    python -m benchmarks.bench_encoder [--sizes 1 10 1000 100000 1000000]
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+
+from benchmarks._common import best_time, report, synthetic_frame
+from config import CAT_FEATURES, FEATURE_ENCODER
+from helper.artifacts import registry
+from transformers import BMICategorizer, BPClassifier, SavedEncoderTransformer
+
+
+def legacy_transform(X, encoders):
+    """The original implementation, kept here as the reference."""
+    X = X.copy()
+    for col in CAT_FEATURES:
+        if col in X.columns:
+            X[col] = encoders[col].transform(X[[col]])
+    return X
+
+
+def encoder_input(n_rows: int) -> pd.DataFrame:
+    """What the encoder step gets in the pipeline: validated rows with their BMI and BP categories."""
+    frame = BPClassifier().transform(BMICategorizer().transform(synthetic_frame(n_rows)))
+    frame['Occupation'] = frame['Occupation'].str.title()
+    return frame
+
+
+def check_equivalence(encoders):
+    """Asserts that both implementations agree on every category, unknown and missing values."""
+    transformer = SavedEncoderTransformer(encoders, CAT_FEATURES)
+    values = {col: list(encoders[col].categories_[0]) + ['Others', 'doctor', '', None, np.nan, 1.0]
+              for col in CAT_FEATURES}
+    n = max(len(v) for v in values.values())
+    # Short frames go through the per-value lookups, long ones through factorize
+    for n_rows in (1, n, 5_000):
+        rng = np.random.default_rng(n_rows)
+        frame = pd.DataFrame({col: pd.Series([v[i] for i in rng.integers(0, len(v), n_rows)], dtype=object)
+                              for col, v in values.items()})
+        frame['Age'] = rng.integers(20, 60, n_rows)
+        pd.testing.assert_frame_equal(transformer.transform(frame), legacy_transform(frame, encoders))
+
+    strict = SavedEncoderTransformer(encoders, CAT_FEATURES, handle_unknown='error')
+    try:
+        strict.transform(pd.DataFrame({'Occupation': ['Doctor', 'Others']}))
+    except ValueError as e:
+        assert "'Others'" in str(e)
+    else:
+        raise AssertionError("handle_unknown='error' accepted an unknown occupation")
+    print("Equivalence check passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    encoders = registry.load(FEATURE_ENCODER)
+    check_equivalence(encoders)
+    transformer = SavedEncoderTransformer(encoders, CAT_FEATURES)
+    for n in args.sizes:
+        frame = encoder_input(n)
+        repeat = max(3, 1_000 // n)  # single rows are timed over many calls
+        report("OrdinalEncoder per column (before)", n, best_time(legacy_transform, frame, encoders, repeat=repeat))
+        report("lookup tables (after)", n, best_time(transformer.transform, frame, repeat=repeat))
+
+
+if __name__ == "__main__":
+    main()
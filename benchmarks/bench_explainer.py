@@ -0,0 +1,73 @@
+"""
+Benchmark for per-patient SHAP explanations against a latency budget.
+
+Explains distinct synthetic patients with the cache cleared and reports p50/p99/max latency
+(excluding the one-off explainer set-up), next to the notebook's set-up (50 k-means centroids,
+`model.predict_proba`, default number of samples) for reference. Exits with status 1 if the
+p99 latency is over the budget.
+
+Usage:
+    python -m benchmarks.bench_explainer [--patients 50] [--budget-ms 200]
+"""
+
+import argparse
+import sys
+import time
+import numpy as np
+
+from benchmarks._common import synthetic_frame
+from helper.artifacts import registry
+from helper.explainer import explanation_service, training_features
+
+
+def notebook_latency(artifacts, record, repeat=3):
+    """One explanation with the notebook's KernelExplainer set-up, in milliseconds."""
+    import shap
+
+    explainer = shap.KernelExplainer(artifacts.model.predict_proba, shap.kmeans(training_features(artifacts), 50))
+    X = artifacts.compiled_pipeline.transform(record)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        explainer.shap_values(X, silent=True)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=50, help="Distinct patients to explain")
+    parser.add_argument("--budget-ms", type=float, default=200.0, help="p99 latency budget per patient")
+    args = parser.parse_args()
+
+    artifacts = registry.artifacts()
+    patients = synthetic_frame(args.patients, seed=7)
+
+    start = time.perf_counter()
+    explanation_service.explainer(artifacts)
+    print(f"Explainer set-up (once per model version): {(time.perf_counter() - start) * 1e3:,.0f} ms")
+
+    explanation_service.cache.clear()
+    timings = np.empty(args.patients)
+    for i in range(args.patients):
+        record = patients.iloc[[i]].reset_index(drop=True)
+        start = time.perf_counter()
+        explanation_service.explain(record, artifacts)
+        timings[i] = (time.perf_counter() - start) * 1e3
+
+    start = time.perf_counter()
+    explanation_service.explain(patients.iloc[[0]].reset_index(drop=True), artifacts)
+    cached = (time.perf_counter() - start) * 1e3
+
+    p50, p99 = np.percentile(timings, [50, 99])
+    print(f"{'explanation service':<28} p50 {p50:>8.1f} ms   p99 {p99:>8.1f} ms   max {timings.max():>8.1f} ms")
+    print(f"{'cached explanation':<28} {cached:>12.2f} ms")
+    print(f"{'notebook KernelExplainer':<28} {notebook_latency(artifacts, patients.iloc[[0]]):>12.1f} ms")
+
+    within = p99 <= args.budget_ms
+    print(f"\np99 {p99:.1f} ms is {'within' if within else 'OVER'} the {args.budget_ms:.0f} ms budget")
+    sys.exit(0 if within else 1)
+
+
+if __name__ == "__main__":
+    main()
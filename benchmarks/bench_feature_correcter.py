@@ -0,0 +1,79 @@
+"""
+Benchmark for FeatureCorrecter: the original per-call `reindex` against the compiled
+`FeatureSchema` (a cached index map, one `take`, Occupation title-cased only if it needs it).
+
+Usage:
+    python -m benchmarks.bench_feature_correcter [--sizes 1 10 1000 100000 1000000]
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+
+from benchmarks._common import best_time, report, synthetic_frame
+from config import MODEL_FEATURES
+from transformers import BMICategorizer, BPClassifier, FeatureCorrecter
+from transformers.feature_correcter import FEATURE_SCHEMA
+
+
+def legacy_transform(X):
+    """The original implementation, kept here as the reference."""
+    X = X.copy()
+    expected_order = ['Gender', 'Age', 'Occupation', 'Sleep Duration',
+                      'Quality of Sleep', 'Physical Activity Level', 'Stress Level',
+                      'BMI Category', 'Heart Rate', 'Daily Steps', 'BP Category']
+    X = X.reindex(columns=expected_order)
+
+    if 'Occupation' in X.columns:
+        X['Occupation'] = X['Occupation'].str.title()
+    return X
+
+
+def correcter_input(n_rows: int) -> pd.DataFrame:
+    """What FeatureCorrecter gets in the pipeline: validated rows with their BMI and BP categories."""
+    return BPClassifier().transform(BMICategorizer().transform(synthetic_frame(n_rows)))
+
+
+def check_equivalence(correcter):
+    """Asserts that both implementations agree, in any column order, and that bad layouts are rejected."""
+    for n_rows in (1, FEATURE_SCHEMA.SMALL + 1, 5_000):
+        frame = correcter_input(n_rows)
+        rng = np.random.default_rng(n_rows)
+        # Lower-case, upper-case and missing occupations
+        rows = rng.choice(n_rows, size=min(3, n_rows), replace=False)
+        frame.loc[rows, 'Occupation'] = pd.Series(['software engineer', 'NURSE', None][:len(rows)], index=rows)
+        for columns in (list(frame.columns), MODEL_FEATURES, list(rng.permutation(frame.columns))):
+            pd.testing.assert_frame_equal(correcter.transform(frame[columns]), legacy_transform(frame[columns]))
+        # Occupations already title-cased are left untouched
+        frame['Occupation'] = frame['Occupation'].str.title()
+        pd.testing.assert_frame_equal(correcter.transform(frame), legacy_transform(frame))
+
+    frame = correcter_input(2)
+    for bad in (frame.drop(columns='Heart Rate'), frame.assign(Weight=70.0)):
+        try:
+            correcter.transform(bad)
+        except ValueError as e:
+            assert "'Heart Rate'" in str(e) or "'Weight'" in str(e), e
+        else:
+            raise AssertionError("FeatureCorrecter accepted a frame that does not match the model")
+    print("Equivalence check passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    correcter = FeatureCorrecter()
+    check_equivalence(correcter)
+    for n in args.sizes:
+        frame = correcter_input(n)
+        repeat = max(3, 1_000 // n)  # single rows are timed over many calls
+        report("reindex per call (before)", n, best_time(legacy_transform, frame, repeat=repeat))
+        report("compiled schema (after)", n, best_time(correcter.transform, frame, repeat=repeat))
+    columns = tuple(correcter_input(1).columns)
+    report("schema check alone", 1, best_time(FEATURE_SCHEMA.index_map, columns, repeat=10_000))
+
+
+if __name__ == "__main__":
+    main()
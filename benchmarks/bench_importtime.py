@@ -0,0 +1,118 @@
+"""
+Benchmark for the app's cold start: what each page imports before it can render, against a budget.
+
+Every target is imported in a fresh interpreter with `python -X importtime` (best of --repeat
+runs). A page's target is app.py plus the page, i.e. what a new process imports before showing
+that page; the modules come from the top-level imports of the scripts, so imports deferred into
+functions are not counted. Each target also lists heavy packages it must not pull in.
+
+Prints the import time of every target with its heaviest modules, and exits with status 1 if a
+target is over its budget or imports a module it should not.
+
+Usage:
+    python -m benchmarks.bench_importtime [--repeat 5] [--top 5] [--scale 1.0]
+"""
+
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+from config import ROOT_DIR
+
+# Loaded only by the feature that needs it (evaluation plots, explanations, sheet writes, ...)
+DEFERRED = ('sklearn', 'scipy', 'matplotlib', 'seaborn', 'shap', 'statsmodels', 'streamlit_gsheets', 'gspread')
+SERVING = tuple(name for name in DEFERRED if name not in ('sklearn', 'scipy'))  # the model needs sklearn
+
+# name: (scripts or modules to import, budget in ms, packages it must not import)
+TARGETS = {
+    'app.py': (['app.py'], 600, DEFERRED),
+    'Home': (['app.py', 'pages/home.py'], 700, DEFERRED),
+    'Model Evaluation': (['app.py', 'pages/evaluation.py'], 1_100, DEFERRED),
+    'Demo': (['app.py', 'pages/demo.py'], 2_300, SERVING),
+    'Clinician Portal': (['app.py', 'pages/doctors.py'], 2_300, SERVING),
+    'Admin': (['app.py', 'pages/admin.py'], 1_100, DEFERRED),
+    'transformers': (['transformers'], 20, DEFERRED),
+    'helper.artifacts': (['helper.artifacts'], 50, DEFERRED),
+    'helper.forms': (['helper.forms'], 600, DEFERRED),
+}
+
+
+def script_imports(path) -> list:
+    """The top-level import statements of a script (imports inside functions are lazy)."""
+    with open(os.path.join(ROOT_DIR, path)) as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body
+            if isinstance(node, ast.Import) or (isinstance(node, ast.ImportFrom) and node.level == 0)]
+
+
+def resolve(items) -> list:
+    """Import statements for a list of scripts and module names, without repeats."""
+    statements = []
+    for item in items:
+        for statement in (script_imports(item) if item.endswith('.py') else [f"import {item}"]):
+            if statement not in statements:
+                statements.append(statement)
+    return statements
+
+
+def importtime(statement: str) -> list:
+    """(name, depth, cumulative microseconds) of every module imported by `statement`."""
+    env = {**os.environ, 'PYTHONPATH': str(ROOT_DIR)}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(cumulative)))
+    return entries
+
+
+def measure(statements, startup, repeat):
+    """Best total import time in ms and the entries of that run."""
+    best = None
+    for _ in range(repeat):
+        entries = [e for e in importtime("\n".join(statements)) if e[0] not in startup]
+        total = sum(cumulative for _, depth, cumulative in entries if depth == 0) / 1e3
+        if best is None or total < best[0]:
+            best = (total, entries)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per target (best is kept)")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest modules to show per target")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for every budget (slower machines)")
+    args = parser.parse_args()
+
+    # Modules the interpreter imports before running anything (site, encodings, ...)
+    startup = {name for name, _, _ in importtime("pass")}
+
+    failures = []
+    for target, (items, budget, forbidden) in TARGETS.items():
+        total, entries = measure(resolve(items), startup, args.repeat)
+        budget *= args.scale
+        loaded = {name for name, _, _ in entries}
+        leaked = sorted(name for name in forbidden if name in loaded)
+
+        status = 'ok' if total <= budget and not leaked else 'OVER' if total > budget else 'LEAK'
+        print(f"{target:<20} {total:>8.0f} ms   budget {budget:>6.0f} ms   {status}")
+        heaviest = sorted((e for e in entries if e[1] <= 1), key=lambda e: -e[2])[:args.top]
+        for name, _, cumulative in heaviest:
+            print(f"    {name:<40} {cumulative / 1e3:>8.1f} ms")
+        if leaked:
+            print(f"    imports {', '.join(leaked)}")
+        if status != 'ok':
+            failures.append(target)
+
+    print(f"\n{'All targets within budget' if not failures else 'Over budget: ' + ', '.join(failures)}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark for helper/train.py --precomputed-kernels: the SVC grid search fitting each candidate
+on the fold matrices (libsvm computes the kernel for every C) against fitting every C of a kernel
+on fold kernel matrices computed once and cached.
+
+Checks that both searches select the same parameters with the same mean macro-F1, and that every
+candidate both score in full gets the same mean, then reports the wall time of each, per size of
+the training set. Size 0 is the notebook's training split of data.csv; other sizes are training
+splits of that many synthetic rows (helper/synthetic_data.py), where computing the kernel is a
+larger part of a fit.
+
+Usage:
+    python -m benchmarks.bench_kernel_cache [--sizes 0 1000 3000] [--grid full|rbf] [--jobs 1]
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+import helper.train as train
+from helper.retrain import split
+from helper.synthetic_data import PatientGenerator
+from helper.train import PARAM_GRID, fold_matrices, search_svc, training_data
+
+GRIDS = {
+    'full': PARAM_GRID,
+    'rbf': {'C': [0.1, 1, 10, 100], 'kernel': ['rbf'], 'gamma': ['scale', 'auto', 0.01, .1, 1]},
+}
+
+
+def training_split(n_rows: int):
+    """(X_train, y_train): the notebook's training split of data.csv, or of `n_rows` synthetic rows."""
+    if n_rows:
+        data = PatientGenerator.from_csv().sample(n_rows, seed=42)
+        X_train, _, y_train, _ = split(data, data.iloc[:0])
+    else:
+        X_train, _, y_train, _ = training_data()
+    return X_train, LabelEncoder().fit_transform(y_train)
+
+
+def check_equivalence(expected, actual):
+    """Asserts that the precomputed search selects and scores like the normal one."""
+    (params, score, results), (params_, score_, results_) = expected, actual
+    assert params == params_, (params, params_)
+    assert abs(score - score_) < 1e-12, (score, score_)
+    both = ~(results['pruned'] | results_['pruned']).to_numpy()
+    np.testing.assert_allclose(results['mean_test_score'].to_numpy()[both],
+                               results_['mean_test_score'].to_numpy()[both], rtol=0, atol=1e-12)
+    print(f"Equivalence check passed: {params}, F1 {score:.4f} ({both.sum()} candidates compared)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1_000, 3_000])
+    parser.add_argument("--grid", choices=GRIDS, default='full')
+    parser.add_argument("--jobs", type=int, default=1)
+    args = parser.parse_args()
+    param_grid = GRIDS[args.grid]
+
+    for n in args.sizes:
+        X_train, y = training_split(n)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            folds_path = fold_matrices(X_train, y, cache_dir=cache_dir)
+            searches = []
+            for label, precomputed in (("fold matrices (before)", False), ("precomputed kernels", True)):
+                start = time.perf_counter()
+                searches.append(search_svc(folds_path, args.jobs, param_grid=param_grid, precomputed=precomputed))
+                seconds = time.perf_counter() - start
+                print(f"{label:<28} {len(X_train):>8,} rows  {seconds:>10.2f} s  "
+                      f"({searches[-1][2]['fits'].sum()} fits)")
+            if args.jobs == 1:
+                cache = train._kernels
+                print(f"{'':<28} kernel cache: {cache.misses} matrices computed, {cache.hits} reused, "
+                      f"{cache.nbytes / 2**20:,.1f} MiB held")
+        check_equivalence(*searches)
+
+
+if __name__ == "__main__":
+    main()
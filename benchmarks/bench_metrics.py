@@ -0,0 +1,98 @@
+"""
+Overhead of the per-stage instrumentation (helper/metrics.py) on the single-record path.
+
+The path is what the Clinician Portal runs for one uncached prediction: `validate`, then
+`compiled_pipeline.transform` and `scorer.score`. It is timed with metrics on and off, and the
+cost of the instrumentation while off is bounded from below by timing its hooks on their own:
+
+    off overhead = (hooks per prediction x cost of one disabled hook) / time of the path
+
+The script exits with status 1 if that is over --budget (1% by default).
+
+Usage:
+    python -m benchmarks.bench_metrics [--records 200] [--repeat 5] [--budget 0.01]
+"""
+
+import argparse
+import sys
+import time
+import warnings
+
+from helper.artifacts import registry
+from helper.batching import predict_frame
+from helper.metrics import metrics
+from helper.synthetic_data import PatientGenerator
+from helper.utils import UserDataCollector
+
+
+def path_seconds(records, artifacts, repeat: int) -> float:
+    """Best time per record of validate + transform + score over `repeat` passes."""
+    collector = UserDataCollector()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for record in records:
+            predict_frame(collector.validate(record), artifacts)
+        best = min(best, (time.perf_counter() - start) / len(records))
+    return best
+
+
+def disabled_hook_seconds(n: int = 200_000) -> float:
+    """Time of the most expensive disabled hook: a timer with one lap, or a `timed` call."""
+    @metrics.timed('bench')
+    def noop():
+        pass
+
+    start = time.perf_counter()
+    for _ in range(n):
+        with metrics.timer('bench') as timer:
+            timer.lap('lap')
+    with_timer = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    for _ in range(n):
+        noop()
+    decorated = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    for _ in range(n):
+        pass
+    empty = (time.perf_counter() - start) / n
+    return max(with_timer, decorated) - empty
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200, help="Distinct records per pass")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes per mode (best is kept)")
+    parser.add_argument("--budget", type=float, default=0.01, help="Largest overhead allowed while off")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", category=FutureWarning)
+    artifacts = registry.artifacts()
+    records = PatientGenerator.from_csv().sample(args.records, seed=3, schema='raw').to_dict('records')
+    was_enabled = metrics.enabled
+
+    # Hooks hit by one prediction, counted with metrics on (laps are recorded as calls of their own)
+    metrics.enabled = True
+    metrics.reset()
+    path_seconds(records, artifacts, 1)
+    hooks = sum(stage['calls'] for stage in metrics.snapshot()) / len(records)
+
+    metrics.enabled = False
+    off = path_seconds(records, artifacts, args.repeat)
+    hook = disabled_hook_seconds()
+    metrics.enabled = True
+    on = path_seconds(records, artifacts, args.repeat)
+    metrics.enabled = was_enabled
+
+    off_overhead = hooks * hook / off
+    print(f"single-record path: {off * 1e3:.3f} ms off, {on * 1e3:.3f} ms on "
+          f"(on costs {(on / off - 1) * 100:+.2f}%)")
+    print(f"{hooks:.0f} hooks per prediction, {hook * 1e9:.0f} ns each while off: "
+          f"{off_overhead * 100:.3f}% of the path (budget {args.budget * 100:g}%)")
+    sys.exit(1 if off_overhead > args.budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark for SVC scoring: `predict` + `predict_proba` against the single-pass `SVCScorer`
+and the approximate (Nystroem) `ApproximateSVCScorer`.
+
+Usage:
+    python -m benchmarks.bench_scoring [--calls 2000] [--sizes 10000 1000000] [--components 96]
+"""
+
+import argparse
+import numpy as np
+
+from benchmarks._common import best_time, report, synthetic_frame
+from benchmarks.bench_compiled import latency
+from helper.artifacts import registry
+from helper.scoring import ApproximateSVCScorer, reference_features
+
+
+def sklearn_score(model, X):
+    """What the pages did before: two kernel passes over the same rows."""
+    return model.predict(X), model.predict_proba(X)
+
+
+def check_equivalence(artifacts, n_rows=100_000):
+    """The exact scorer gives `predict`'s labels and `predict_proba`'s probabilities."""
+    X = artifacts.compiled_pipeline.transform(synthetic_frame(n_rows))
+    labels, proba = artifacts.scorer.score(X)
+    assert np.array_equal(labels, artifacts.model.predict(X)), "labels differ from model.predict"
+    assert np.allclose(proba, artifacts.model.predict_proba(X), rtol=0, atol=1e-12), \
+        "probabilities differ from model.predict_proba"
+    for n in (1, 5):
+        assert np.array_equal(artifacts.scorer.score(X[:n])[0], artifacts.model.predict(X[:n]))
+        assert np.allclose(artifacts.scorer.score(X[:n])[1], artifacts.model.predict_proba(X[:n]), rtol=0, atol=1e-12)
+    print(f"Exact scorer matches predict/predict_proba on {n_rows:,} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2_000, help="Single-row calls to time")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--components", type=int, default=96, help="Rank of the approximate scorer")
+    args = parser.parse_args()
+
+    artifacts = registry.artifacts()
+    model = artifacts.model
+    check_equivalence(artifacts)
+
+    fast = ApproximateSVCScorer(model, n_components=args.components)
+    print(f"Approximate scorer ({args.components} components): "
+          f"{fast.agreement(reference_features(artifacts), artifacts.scorer):.2%} label agreement on data.csv")
+
+    scorers = [("predict + predict_proba", lambda X: sklearn_score(model, X)),
+               ("SVCScorer", artifacts.scorer.score),
+               ("ApproximateSVCScorer", fast.score)]
+
+    row = artifacts.compiled_pipeline.transform(synthetic_frame(1))
+    print(f"\nSingle-row latency over {args.calls:,} calls")
+    for label, func in scorers:
+        p50, p99 = np.percentile(latency(func, row, args.calls), [50, 99])
+        print(f"{label:<28} p50 {p50:>10.1f} us   p99 {p99:>10.1f} us")
+
+    print("\nBatch throughput")
+    for n in args.sizes:
+        X = artifacts.compiled_pipeline.transform(synthetic_frame(n))
+        for label, func in scorers:
+            report(label, n, best_time(func, X, repeat=1))
+        print(f"{'approximate label agreement':<28} {(fast.score(X)[0] == artifacts.scorer.score(X)[0]).mean():.4%}")
+
+
+if __name__ == "__main__":
+    main()
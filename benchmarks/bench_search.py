@@ -0,0 +1,85 @@
+"""
+Benchmark for helper/train.py: the notebook's SVC grid search (GridSearchCV over a Pipeline of
+the preprocessing and SVC(probability=True), sequential) against the harness.
+
+Checks that both select the same parameters with the same mean macro-F1 (and that the harness
+scores every candidate it does not stop early exactly as GridSearchCV does), then reports the wall
+time of each. The harness is timed with and without its fold cache on disk.
+
+On a single core the speed-up comes from the shared fold preprocessing, the fits shared by
+equivalent candidates, the early stopping and fitting without probability=True; --jobs adds
+the process pool on top.
+
+Usage:
+    python -m benchmarks.bench_search [--jobs 4] [--grid full|small]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder
+from sklearn.svm import SVC
+
+from helper.train import N_SPLITS, PARAM_GRID, RANDOM_STATE, Preprocessor, fold_matrices, search_svc, training_data
+
+GRIDS = {
+    'full': PARAM_GRID,
+    'small': {'C': [1, 100], 'kernel': ['linear', 'rbf', 'poly'], 'gamma': ['scale', 0.01], 'degree': [2, 3]},
+}
+
+
+def notebook_search(X, y, param_grid) -> GridSearchCV:
+    """The notebook's search, with the preprocessing fitted per fold inside the Pipeline."""
+    pipeline = Pipeline([('preprocessor', Preprocessor()),
+                         ('svc', SVC(decision_function_shape='ovo', probability=True, random_state=RANDOM_STATE))])
+    grid = {f'svc__{key}': values for key, values in param_grid.items()}
+    cv = StratifiedKFold(n_splits=N_SPLITS, shuffle=True, random_state=RANDOM_STATE)
+    return GridSearchCV(pipeline, grid, cv=cv, scoring='f1_macro', n_jobs=1).fit(X, y)
+
+
+def check_equivalence(search: GridSearchCV, best_params: dict, best_score: float, results):
+    """Asserts that the harness selects what GridSearchCV selects, with the same scores."""
+    expected = {key.removeprefix('svc__'): value for key, value in search.best_params_.items()}
+    assert best_params == expected, (best_params, expected)
+    assert abs(best_score - search.best_score_) < 1e-12, (best_score, search.best_score_)
+
+    scored = ~results['pruned'].to_numpy()
+    np.testing.assert_allclose(results['mean_test_score'].to_numpy()[scored],
+                               search.cv_results_['mean_test_score'][scored], rtol=0, atol=1e-12)
+    print(f"Equivalence check passed: {best_params}, F1 {best_score:.4f} "
+          f"({scored.sum()} of {len(results)} candidates scored in full)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--grid", choices=GRIDS, default='full')
+    args = parser.parse_args()
+    param_grid = GRIDS[args.grid]
+
+    X_train, _, y_train, _ = training_data()
+    y = LabelEncoder().fit_transform(y_train)
+
+    start = time.perf_counter()
+    search = notebook_search(X_train, y, param_grid)
+    baseline = time.perf_counter() - start
+    print(f"{'GridSearchCV (before)':<28} {baseline:>10.2f} s")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label in ("harness, cold cache", "harness, warm cache"):
+            start = time.perf_counter()
+            folds_path = fold_matrices(X_train, y, cache_dir=cache_dir)
+            best_params, best_score, results = search_svc(folds_path, args.jobs, param_grid=param_grid)
+            seconds = time.perf_counter() - start
+            print(f"{label:<28} {seconds:>10.2f} s  {baseline / seconds:>8.1f}x  "
+                  f"({results['fits'].sum()} of {len(results) * N_SPLITS} fits, jobs={args.jobs})")
+    check_equivalence(search, best_params, best_score, results)
+
+
+if __name__ == "__main__":
+    main()
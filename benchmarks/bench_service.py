@@ -0,0 +1,138 @@
+"""
+Load test for the HTTP inference service (helper/service.py).
+
+Each concurrency level runs that many clients for --duration seconds. Every client keeps one
+connection open and sends requests back to back, cycling through --patients distinct synthetic
+patients (so that most requests miss the prediction cache). Reports requests/sec (and rows/sec
+for batches), p50/p90/p99/max latency and errors per level.
+
+By default the service is started here with --workers processes and stopped at the end; pass
+--url to test a service that is already running.
+
+Usage:
+    python -m benchmarks.bench_service [--workers 4] [--concurrency 1 4 16 64] [--duration 10]
+                                       [--batch 0] [--url http://127.0.0.1:8000]
+"""
+
+import argparse
+import http.client
+import json
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from config import ROOT_DIR, SERVICE_HOST
+from helper.synthetic_data import PatientGenerator
+
+
+def payloads(n_patients: int, batch: int, seed: int = 42) -> list:
+    """Encoded request bodies: one form record each, or `batch` records each."""
+    records = PatientGenerator.from_csv().sample(n_patients * max(batch, 1), seed=seed, schema='raw')
+    records = records.to_dict('records')
+    if not batch:
+        return [json.dumps(record).encode() for record in records]
+    return [json.dumps({'records': records[i:i + batch]}).encode() for i in range(0, len(records), batch)]
+
+
+def client(host, port, path, bodies, offset, deadline, latencies, errors):
+    """Sends requests on one keep-alive connection until `deadline`."""
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    i = offset
+    while time.perf_counter() < deadline:
+        body = bodies[i % len(bodies)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request("POST", path, body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run_level(host, port, path, bodies, concurrency, duration):
+    """(requests, errors, latencies in seconds) of `concurrency` clients over `duration` seconds."""
+    latencies, errors = [], []  # list.append is atomic, the clients share them
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client, args=(host, port, path, bodies, i * 997, deadline, latencies, errors))
+               for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), errors, np.array(latencies), time.perf_counter() - start
+
+
+def wait_ready(host, port, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", "/ready")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"The service on {host}:{port} did not become ready within {timeout:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Service to test (default: start one on --port)")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the service started here")
+    parser.add_argument("--workers", type=int, default=4, help="Workers of the service started here")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--batch", type=int, default=0, help="Records per request (0: single /predict)")
+    parser.add_argument("--patients", type=int, default=5_000, help="Distinct patients sent")
+    args = parser.parse_args()
+
+    service = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = SERVICE_HOST, args.port
+        service = subprocess.Popen([sys.executable, "-m", "helper.service", "--host", host, "--port", str(port),
+                                    "--workers", str(args.workers), "--log-level", "WARNING"], cwd=ROOT_DIR)
+    try:
+        wait_ready(host, port)
+        path = "/predict/batch" if args.batch else "/predict"
+        bodies = payloads(args.patients, args.batch)
+        rows = max(args.batch, 1)
+        print(f"{path} on {host}:{port}" + (f" ({args.workers} workers)" if service else "")
+              + (f", {args.batch} records per request" if args.batch else ""))
+
+        run_level(host, port, path, bodies, 1, min(args.duration, 1.0))  # warm-up
+        for concurrency in args.concurrency:
+            n, errors, latencies, elapsed = run_level(host, port, path, bodies, concurrency, args.duration)
+            if not n:
+                print(f"concurrency {concurrency:>4}: no successful requests, errors {errors[:5]}")
+                continue
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1e3
+            print(f"concurrency {concurrency:>4}: {n / elapsed:>9,.0f} req/s"
+                  + (f" {n * rows / elapsed:>11,.0f} rows/s" if args.batch else "")
+                  + f"   p50 {p50:>8.2f} ms   p90 {p90:>8.2f} ms   p99 {p99:>8.2f} ms"
+                  f"   max {latencies.max() * 1e3:>8.2f} ms   errors {len(errors)}")
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
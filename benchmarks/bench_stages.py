@@ -0,0 +1,229 @@
+"""
+Benchmark suite: every preprocessing stage and model call, timed separately at each batch size.
+
+Each stage is timed on the output of the stage before it, as in the app:
+
+    validate           `UserDataCollector.validate`, once per record (up to --loop-max rows)
+    validate_frame     `UserDataCollector.validate_frame` on the whole batch
+    bmi_categorizer .. saved_scaler
+                       the five steps of the sklearn `pipeline`, one at a time
+    pipeline           the whole `pipeline.transform`
+    compiled_pipeline  `CompiledPipeline.transform`, what the app runs instead
+    predict, predict_proba
+                       the served model (`registry.artifacts().model`)
+    scorer             `SVCScorer.score`, labels and probabilities in one kernel pass
+
+For every stage and size it records the best and median wall time per call (calls are repeated
+until --min-time has passed) and the peak memory allocated by one call (tracemalloc, in a separate
+untimed call), and saves everything to JSON with the commit and library versions. Two saved runs
+can be compared; the comparison exits with status 1 if a stage got slower than --tolerance.
+
+Usage:
+    python -m benchmarks.bench_stages [--sizes 1 10 ... 1000000] [--stages predict scorer] [--output FILE]
+    python -m benchmarks.bench_stages --baseline OLD.json          # run, save, then compare
+    python -m benchmarks.bench_stages --compare OLD.json NEW.json  # compare two saved runs
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_validate import loop_validate, raw_frame
+from config import ROOT_DIR
+from helper.artifacts import registry
+from helper.utils import UserDataCollector
+
+RESULTS_DIR = ROOT_DIR / 'benchmarks' / 'results'
+
+STAGES = ['validate', 'validate_frame', 'bmi_categorizer', 'bp_classifier', 'feature_correcter',
+          'saved_encoder', 'saved_scaler', 'pipeline', 'compiled_pipeline', 'predict', 'predict_proba',
+          'scorer']
+
+# Timings below this are dominated by noise and never count as a regression
+MIN_COMPARED_SECONDS = 50e-6
+
+
+def git_commit():
+    """(commit, dirty) of the working tree, or (None, None) outside a git checkout."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def environment(artifacts) -> dict:
+    import sklearn
+
+    commit, dirty = git_commit()
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'model_version': artifacts.version,
+        'model_source': artifacts.source,
+    }
+
+
+def stage_functions(artifacts, pipeline):
+    """stage -> (function, name of the stage whose output it takes, or 'raw')."""
+    collector = UserDataCollector()
+    steps = pipeline.named_steps
+    model = artifacts.model
+    return {
+        'validate': (loop_validate, 'raw'),
+        'validate_frame': (lambda raw: collector.validate_frame(raw)[0], 'raw'),
+        'bmi_categorizer': (steps['bmi_categorizer'].transform, 'validate_frame'),
+        'bp_classifier': (steps['bp_classifier'].transform, 'bmi_categorizer'),
+        'feature_correcter': (steps['feature_correcter'].transform, 'bp_classifier'),
+        'saved_encoder': (steps['saved_encoder'].transform, 'feature_correcter'),
+        'saved_scaler': (steps['saved_scaler'].transform, 'saved_encoder'),
+        'pipeline': (pipeline.transform, 'validate_frame'),
+        'compiled_pipeline': (artifacts.compiled_pipeline.transform, 'validate_frame'),
+        'predict': (model.predict, 'compiled_pipeline'),
+        'predict_proba': (model.predict_proba, 'compiled_pipeline'),
+        'scorer': (artifacts.scorer.score, 'compiled_pipeline'),
+    }
+
+
+def time_calls(func, arg, min_time: float, max_calls: int) -> list:
+    """Per-call wall times in seconds, calling `func` until `min_time` has passed (at least twice)."""
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < 2 or (time.perf_counter() < deadline and len(timings) < max_calls):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def peak_allocated(func, arg) -> int:
+    """Peak bytes allocated (and traced) during one call."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(arg)
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, stages, min_time, max_calls, loop_max) -> dict:
+    from transformers.pipeline import default_pipeline as pipeline
+
+    artifacts = registry.artifacts()
+    functions = stage_functions(artifacts, pipeline)
+    needed = set(stages)  # the requested stages and every stage they take their input from
+    for stage in reversed(STAGES):
+        if stage in needed:
+            needed.add(functions[stage][1])
+
+    results = []
+    for n in sizes:
+        # Each stage's input is the output of the stage before it, computed outside the timings
+        outputs = {'raw': raw_frame(n, error_rate=0)}
+        for stage in STAGES:
+            func, source = functions[stage]
+            if stage not in needed or (stage == 'validate' and n > loop_max):
+                continue
+            arg = outputs[source]
+            outputs[stage] = func(arg)
+            if stage not in stages:
+                continue
+            timings = time_calls(func, arg, min_time, max_calls)
+            best, median = min(timings), statistics.median(timings)
+            results.append({
+                'stage': stage,
+                'rows': n,
+                'calls': len(timings),
+                'best_seconds': best,
+                'median_seconds': median,
+                'rows_per_second': n / best if best else None,
+                'peak_allocated_bytes': peak_allocated(func, arg),
+            })
+            print(f"{stage:<20} {n:>10,} rows  best {best * 1e3:>11.3f} ms  median {median * 1e3:>11.3f} ms  "
+                  f"{n / best:>14,.0f} rows/sec  {results[-1]['peak_allocated_bytes'] / 2**20:>9.2f} MiB")
+    return {'environment': environment(artifacts), 'results': results}
+
+
+def compare(old: dict, new: dict, tolerance: float) -> list:
+    """Prints new/old time ratios per stage and size; returns the (stage, rows) that regressed."""
+    before = {(r['stage'], r['rows']): r for r in old['results']}
+    commits = [(run['environment'].get('commit') or '?')[:12] for run in (old, new)]
+    print(f"\n{commits[0]} -> {commits[1]} (best time ratio, new / old)")
+    regressions = []
+    for result in new['results']:
+        key = (result['stage'], result['rows'])
+        if key not in before:
+            continue
+        ratio = result['best_seconds'] / before[key]['best_seconds']
+        memory = result['peak_allocated_bytes'] / max(before[key]['peak_allocated_bytes'], 1)
+        slower = ratio > tolerance and result['best_seconds'] >= MIN_COMPARED_SECONDS
+        if slower:
+            regressions.append(key)
+        print(f"{key[0]:<20} {key[1]:>10,} rows  time x{ratio:>6.2f}  memory x{memory:>6.2f}"
+              f"{'   REGRESSION' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds spent timing each stage and size")
+    parser.add_argument("--max-calls", type=int, default=1_000, help="Most calls per stage and size")
+    parser.add_argument("--loop-max", type=int, default=1_000,
+                        help="Skip the per-record `validate` loop above this many rows (it is slow)")
+    parser.add_argument("--output", help="JSON file to save the run to (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--baseline", help="Saved run to compare this run against")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Only compare two saved runs")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        old, new = (json.load(open(path)) for path in args.compare)
+        sys.exit(1 if compare(old, new, args.tolerance) else 0)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=FutureWarning)
+        run_results = run(sorted(args.sizes), args.stages, args.min_time, args.max_calls, args.loop_max)
+
+    output = args.output
+    if output is None:
+        commit, dirty = run_results['environment']['commit'], run_results['environment']['dirty']
+        name = f"{commit[:12]}{'-dirty' if dirty else ''}" if commit else time.strftime('%Y%m%d-%H%M%S')
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = RESULTS_DIR / f"stages-{name}.json"
+    with open(output, 'w') as f:
+        json.dump(run_results, f, indent=1)
+    print(f"\nSaved {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            sys.exit(1 if compare(json.load(f), run_results, args.tolerance) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark for `UserDataCollector.validate_frame` against a Python loop over `validate`.
+
+Usage:
+    python -m benchmarks.bench_validate [--sizes 1 1000 100000 1000000] [--loop-max 100000]
+"""
+
+import argparse
+import numpy as np
+
+from benchmarks._common import best_time, report, synthetic_frame
+from helper.utils import UserDataCollector
+
+
+def raw_frame(n_rows, seed=42, error_rate=0.1):
+    """
+    Builds form-style records (units, BP as a string or a Systolic/Diastolic pair) with
+    a share of invalid values sprinkled in.
+    """
+    rng = np.random.default_rng(seed)
+    frame = synthetic_frame(n_rows, seed).astype(object)
+    frame["Physical Activity Level"] = rng.integers(1, 11, n_rows)
+
+    lbs = rng.random(n_rows) < 0.3
+    frame["Weight Unit"] = np.where(lbs, "lbs", "kg")
+    frame.loc[lbs, "Weight"] = (frame.loc[lbs, "Weight"] / 0.453592).astype(float).round(1)
+
+    units = rng.choice(["m", "cm", "ft"], n_rows)
+    frame["Height Unit"] = units
+    frame.loc[units == "cm", "Height"] = (frame.loc[units == "cm", "Height"] * 100).astype(float).round(0)
+    frame.loc[units == "ft", "Height"] = (frame.loc[units == "ft", "Height"] / 0.3048).astype(float).round(2)
+
+    pair = rng.random(n_rows) < 0.5
+    split = frame["Blood Pressure"].str.split("/", expand=True)
+    frame["Systolic BP"] = np.where(pair, split[0].astype(int), None)
+    frame["Diastolic BP"] = np.where(pair, split[1].astype(int), None)
+    frame.loc[pair, "Blood Pressure"] = None
+
+    # Invalid values, several per row at times
+    bad_values = {
+        "Gender": ["Other", "", None],
+        "Age": ["abc", -4, 150],
+        "Sleep Duration": [30, "x"],
+        "Quality of Sleep": [0, 11],
+        "Weight": [1, 1000, "heavy"],
+        "Height": [5, "tall"],
+        "Heart Rate": [10, 300],
+        "Daily Steps": [-5],
+        "Blood Pressure": ["120-80", "300/80", "120/20", "1/2"],
+        "Systolic BP": ["abc", 400],
+    }
+    for col, values in bad_values.items():
+        rows = np.flatnonzero(rng.random(n_rows) < error_rate / len(bad_values))
+        frame.loc[rows, col] = rng.choice(np.array(values, dtype=object), len(rows))
+    return frame
+
+
+def loop_validate(frame):
+    """Calls `validate` once per row, like a caller without `validate_frame` would."""
+    collector = UserDataCollector()
+    results, errors = [], []
+    for record in frame.to_dict("records"):
+        record = {k: v for k, v in record.items() if v is not None and v == v}  # empty cells are missing keys
+        try:
+            results.append(collector.validate(record))
+            errors.append("")
+        except ValueError as e:
+            results.append(None)
+            errors.append(str(e))
+    return results, errors
+
+
+def check_equivalence(n_rows=20_000):
+    """Every invalid row reports `validate`'s error first; every valid row has `validate`'s values."""
+    frame = raw_frame(n_rows)
+    results, errors = loop_validate(frame)
+    clean, invalid, messages = UserDataCollector().validate_frame(frame)
+
+    assert invalid.tolist() == [bool(e) for e in errors]
+    for message, error in zip(messages, errors):
+        assert message.split("; ")[0] == error, (message, error)
+
+    for i, result in enumerate(results):
+        if result is None:
+            continue
+        row = clean.iloc[i]
+        for col in result.columns:
+            expected = result[col].iloc[0]
+            actual = row[col] if col in clean.columns else None
+            if col in ("Systolic BP", "Diastolic BP"):
+                actual = row["Blood Pressure"].split("/")[col == "Diastolic BP"]
+                expected = str(expected)
+            assert actual == expected, (i, col, actual, expected)
+    print(f"Equivalence check passed on {n_rows:,} rows ({int(invalid.sum()):,} invalid)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 1_000, 100_000, 1_000_000])
+    parser.add_argument("--loop-max", type=int, default=100_000,
+                        help="Skip the per-row loop above this many rows (it is slow)")
+    args = parser.parse_args()
+
+    check_equivalence()
+    collector = UserDataCollector()
+    for n in args.sizes:
+        frame = raw_frame(n)
+        if n <= args.loop_max:
+            report("loop over validate", n, best_time(loop_validate, frame, repeat=1))
+        report("validate_frame", n, best_time(collector.validate_frame, frame))
+
+
+if __name__ == "__main__":
+    main()
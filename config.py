@@ -9,6 +9,9 @@ DATA_DIR = ROOT_DIR / 'data'
 MODELS_DIR = ROOT_DIR / 'models'
 TRANSFORMERS_DIR = ROOT_DIR / 'transformers'
 APP_DIR = ROOT_DIR / 'helper'
+OUTBOX_DIR = ROOT_DIR / '.outbox'
+RETRAIN_DIR = MODELS_DIR / 'retrain'  # feedback pulled for retraining, job state and model history
+TRAINING_CACHE_DIR = ROOT_DIR / '.cache' / 'training'  # per-fold matrices of helper/train.py
 
 # Files
 # data directory files
@@ -24,6 +27,58 @@ FEATURE_ENCODER = MODELS_DIR / 'feature_encoder.pkl'
 TARGET_ENCODER = MODELS_DIR / 'target_encoder.pkl'
 SCALER_FILE = MODELS_DIR / 'scaler.pkl'
 MODEL_EVAL = MODELS_DIR / 'model_evaluation.pkl'
+EVAL_BUNDLE = MODELS_DIR / 'evaluation_bundle.json'  # built from the two above by helper/evaluation_bundle.py
+MODEL_BUNDLE_DIR = MODELS_DIR / 'bundle'  # exported from the pickles by helper/model_bundle.py
+SWAP_JOURNAL = MODELS_DIR / '.swap.json'  # present while helper/artifacts.py swaps in a new model
+
+# retraining directory files
+FEEDBACK_FILE = RETRAIN_DIR / 'feedback.csv'
+RETRAIN_STATE = RETRAIN_DIR / 'state.json'
+MODEL_HISTORY_DIR = RETRAIN_DIR / 'history'
+
+# local outbox for rows waiting to be appended to Google Sheets
+OUTBOX_FILE = OUTBOX_DIR / 'sheets.jsonl'
+
+# Approximate (Nystroem) SVC scoring for large batches, see helper/scoring.py:
+# rank of the approximation, and the minimum label agreement with the exact model on data.csv
+FAST_SCORING_COMPONENTS = 96
+FAST_SCORING_MIN_AGREEMENT = 0.99
+
+# Per-patient SHAP explanations, see helper/explainer.py:
+# number of shap.kmeans background centroids, and coalition samples per explanation
+SHAP_BACKGROUND_SIZE = 20
+SHAP_NSAMPLES = 512
+
+# Micro-batching of concurrent predictions, see helper/batching.py: the longest a request waits
+# for others to join its batch, and the largest batch
+MICRO_BATCH_MAX_WAIT_MS = 2.0
+MICRO_BATCH_MAX_SIZE = 64
+
+# Retraining from the clinicians' evaluations, see helper/retrain.py: the worksheet they are saved
+# to, the CPU seconds one run may use, the new rows needed before a run retrains, the previous
+# model versions kept for rollback, and the seconds between two scheduled runs
+FEEDBACK_WORKSHEET = 'Sleep Data'
+RETRAIN_CPU_BUDGET = 120.0
+RETRAIN_MIN_ROWS = 20
+RETRAIN_HISTORY = 5
+RETRAIN_INTERVAL = 24 * 3600
+
+# Training with precomputed kernels, see helper/train.py: the bytes of fold kernel matrices each
+# worker keeps
+KERNEL_CACHE_BYTES = 256 * 2**20
+
+# Per-stage timing of the inference path, see helper/metrics.py: on unless SLEEPDISORDER_METRICS=0,
+# histogram bucket bounds in seconds, and the number of recent calls kept per stage for percentiles
+METRICS_ENABLED = os.environ.get('SLEEPDISORDER_METRICS', '1') != '0'
+METRICS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_WINDOW = 1024
+
+# HTTP inference service, see helper/service.py: default address, largest accepted batch and body
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8000
+SERVICE_MAX_BATCH = 10_000
+SERVICE_MAX_BODY = 32 * 1024 * 1024
 
 # transformers directories files
 BMI_FILE = TRANSFORMERS_DIR / 'bmi_categorizer.py'
@@ -41,6 +96,10 @@ CONTACT_FORM = APP_DIR / 'contact_form.py'
 NUM_FEATURES = ["Age", "Sleep Duration", "Quality of Sleep",
                 "Physical Activity Level", "Stress Level", "Heart Rate", "Daily Steps"]
 CAT_FEATURES = ["Gender", "Occupation", "BMI Category", "BP Category"]
+# Order of the features the scaler and the model were fitted with (FeatureCorrecter's output)
+MODEL_FEATURES = ["Gender", "Age", "Occupation", "Sleep Duration", "Quality of Sleep",
+                  "Physical Activity Level", "Stress Level", "BMI Category", "Heart Rate",
+                  "Daily Steps", "BP Category"]
 
 
 # Utility function to ensure paths exist
@@ -0,0 +1,408 @@
+"""
+Process-wide registry for the pickled artifacts in models/.
+
+Every Streamlit session (and thread) shares one registry, so each file is unpickled once
+per change rather than on every rerun. File changes are detected from their size and
+modification time; a changed model is loaded in full and swapped in atomically, so a
+rerun always sees a consistent model, encoders, scaler and pipeline.
+
+The model snapshot is served from the memory-mapped bundle in models/bundle/ (see
+helper/model_bundle.py) whenever there is one that matches its own content hash and the pickles
+it was exported from; the pickles are then not unpickled, and need not be there at all. A pickle
+whose mtime or size differs from the one recorded at export is hashed, and if its content differs
+too (e.g. a model retrained in the notebook) the pickles are served instead, with a warning.
+Retraining re-exports the bundle; after replacing the pickles by hand, re-export it with
+`python -m helper.model_bundle`.
+
+A new model (several files) is put in place with `swap_files`, which journals the swap in
+models/.swap.json. While the journal exists the registry keeps serving its current snapshot,
+and a snapshot is only kept if no file changed while it was being loaded, so a reader never
+mixes the files of two models. The swap holds a lock on models/.swap.json.lock, so a reader only
+completes a journal whose swapper has died.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from config import MODEL_FILE, TARGET_ENCODER, FEATURE_ENCODER, SCALER_FILE, MODEL_BUNDLE_DIR, SWAP_JOURNAL
+from helper.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path) -> str:
+    """sha256 of a file's bytes (without unpickling it)."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def model_version(directory=None) -> str:
+    """
+    Version of the model files in `directory` (models/ by default), as `ModelArtifacts.version`
+    would report it: a short hash of the sha256 of the four pickles.
+    """
+    files = ArtifactRegistry.MODEL_FILES.items()
+    if directory is not None:
+        files = ((name, os.path.join(directory, os.path.basename(path))) for name, path in files)
+    return ArtifactRegistry._version({name: file_sha256(path) for name, path in files})
+
+
+# A journal older than this was left by a process that died while swapping
+SWAP_TIMEOUT = 30.0
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _swap_lock(journal, blocking: bool = True):
+    """Held while a swap's journal is written and completed (released if the process dies)."""
+    with open(f"{journal}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def swap_files(files: dict, journal=SWAP_JOURNAL):
+    """
+    Replaces several files as one change.
+
+    Every new file is first copied next to its destination (as `<destination>.swap`), then the
+    journal listing them is written, then each copy is renamed over its destination and the
+    journal is removed. A swap interrupted after the journal was written is completed by
+    `recover_swap` (the renames are idempotent); one interrupted before leaves the old files.
+
+    Arguments:
+        files : dict
+            Destination path -> path of its new content.
+    """
+    staged = {}
+    for destination, source in files.items():
+        tmp = f"{destination}.swap"
+        shutil.copyfile(source, tmp)
+        with open(tmp, 'rb+') as f:
+            os.fsync(f.fileno())
+        staged[str(destination)] = tmp
+
+    with _swap_lock(journal):
+        with open(f"{journal}.tmp", 'w') as f:
+            json.dump({'started': time.time(), 'files': staged}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{journal}.tmp", journal)
+        _fsync_dir(os.path.dirname(os.path.abspath(journal)))
+        _complete_swap(journal)
+
+
+def recover_swap(journal=SWAP_JOURNAL) -> bool:
+    """
+    Completes the swap recorded in `journal`, if any, once no process is swapping. Returns True
+    if there was one.
+    """
+    with _swap_lock(journal):
+        return _complete_swap(journal)
+
+
+def _complete_swap(journal) -> bool:
+    # Called with the swap lock held
+    try:
+        with open(journal) as f:
+            staged = json.load(f)['files']
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError, KeyError):
+        # Unreadable: written by a swap that never got to its renames
+        _remove(journal)
+        return False
+
+    for destination, tmp in staged.items():
+        if os.path.exists(tmp):
+            os.replace(tmp, destination)
+    for directory in {os.path.dirname(os.path.abspath(d)) for d in staged}:
+        _fsync_dir(directory)
+    _remove(journal)
+    return True
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def swap_in_progress(journal=SWAP_JOURNAL) -> bool:
+    """
+    True while another process is swapping files. A journal left by a process that died is
+    completed here instead.
+    """
+    try:
+        started = os.stat(journal).st_mtime
+    except FileNotFoundError:
+        return False
+    if time.time() - started < SWAP_TIMEOUT:
+        return True
+    try:
+        # Held by a swapper that is still running, however long it takes
+        with _swap_lock(journal, blocking=False):
+            if os.path.exists(journal):
+                logger.warning("Completing the model swap left in %s", journal)
+                _complete_swap(journal)
+    except BlockingIOError:
+        return True
+    except OSError:
+        logger.warning("Could not complete the model swap", exc_info=True)
+        return True
+    return False
+
+
+class ModelArtifacts:
+    """
+    An immutable snapshot of everything needed to make a prediction.
+
+    Attributes:
+    -----------
+    model : the fitted SVC (a BundledSVC when served from the bundle)
+    t_encoder : LabelEncoder for the target
+    f_encoder : dict of OrdinalEncoders for the categorical features (of SimpleNamespace category
+        tables with `categories_` and `unknown_value` when served from the bundle)
+    scaler : StandardScaler (a BundledScaler when served from the bundle)
+    compiled_pipeline : CompiledPipeline built from `f_encoder` and `scaler`
+    scorer : SVCScorer, labels and probabilities of `model` in one kernel pass
+    version : str
+        Short content hash of the four pickles (recorded in the bundle's manifest when served
+        from it); changes whenever any of them does.
+    source : str
+        'bundle' if served from models/bundle/ (model is a BundledSVC, the encoders are plain
+        tables and the scaler a BundledScaler), 'pickle' otherwise.
+    """
+
+    def __init__(self, model, t_encoder, f_encoder, scaler, version, source='pickle'):
+        # Imported here so that loading transformers does not depend on this module
+        from transformers import CompiledPipeline
+        from helper.scoring import SVCScorer
+
+        self.model = model
+        self.t_encoder = t_encoder
+        self.f_encoder = f_encoder
+        self.scaler = scaler
+        self.compiled_pipeline = CompiledPipeline(f_encoder, scaler, timer=metrics.timer)
+        self.scorer = SVCScorer(model)
+        self.version = version
+        self.source = source
+        self._pipeline = None
+
+    @property
+    def pipeline(self):
+        """The five-step sklearn preprocessing Pipeline (`compiled_pipeline` gives the same output)."""
+        if self._pipeline is None:
+            from transformers.pipeline import build_pipeline
+            self._pipeline = build_pipeline(self.f_encoder, self.scaler, timer=metrics.timer)
+        return self._pipeline
+
+
+class ArtifactRegistry:
+    """
+    Loads pickled artifacts once and reloads them when the files change.
+
+    Arguments:
+        check_interval : float
+            Minimum number of seconds between two checks of the files on disk.
+    """
+
+    MODEL_FILES = {
+        'model': MODEL_FILE,
+        't_encoder': TARGET_ENCODER,
+        'f_encoder': FEATURE_ENCODER,
+        'scaler': SCALER_FILE,
+    }
+
+    def __init__(self, check_interval: float = 1.0):
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._files = {}             # path -> (signature, object, sha256)
+        self._current = None         # ModelArtifacts
+        self._last_signatures = None  # signatures the current snapshot was built from
+        self._last_check = 0.0
+        self._bad_bundle = None      # signature of a manifest that could not be loaded
+        self._stale_bundle = None    # signatures under which the pickles differed from the bundle
+
+    BUNDLE_MANIFEST = MODEL_BUNDLE_DIR / 'manifest.json'
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _signatures(self):
+        """Signatures of the bundle's manifest and of the pickles (None for a missing file)."""
+        signatures = {'bundle': self.BUNDLE_MANIFEST, **self.MODEL_FILES}
+        for name, path in signatures.items():
+            try:
+                signatures[name] = self._signature(path)
+            except FileNotFoundError:
+                signatures[name] = None
+        return signatures
+
+    def _use_bundle(self, signatures) -> bool:
+        return (signatures['bundle'] is not None and signatures['bundle'] != self._bad_bundle
+                and signatures != self._stale_bundle)
+
+    def _from_bundle(self, signatures):
+        """
+        The snapshot from models/bundle/, or None if it cannot be loaded, fails its hash check or
+        was not exported from the pickles in models/.
+        """
+        from helper.model_bundle import load_model_bundle
+
+        try:
+            bundle = load_model_bundle(MODEL_BUNDLE_DIR)
+        except (OSError, ValueError, KeyError):
+            logger.warning("Could not load models/bundle/; serving the pickles", exc_info=True)
+            self._bad_bundle = signatures['bundle']
+            return None
+        for name, path in self.MODEL_FILES.items():
+            signature = signatures[name]
+            # A missing pickle does not contradict the bundle; a touched one is checked by content
+            if signature is None or bundle.source_stats.get(name) == list(signature):
+                continue
+            if file_sha256(path) != bundle.sources[name]:
+                logger.warning("%s is not the file models/bundle/ was exported from; serving the pickles "
+                               "(re-export the bundle with `python -m helper.model_bundle`)", path)
+                self._stale_bundle = signatures
+                return None
+
+        current = self._current
+        if current is not None and current.source == 'bundle' and self._last_signatures['bundle'] == signatures['bundle']:
+            return current  # only the pickles' signatures changed
+        return ModelArtifacts(bundle.model, bundle.t_encoder, bundle.f_encoder, bundle.scaler,
+                              version=self._version(bundle.sources), source='bundle')
+
+    @staticmethod
+    def _version(sources):
+        return hashlib.sha256(''.join(sources.values()).encode()).hexdigest()[:12]
+
+    def _load_file(self, path, signature):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        obj = pickle.loads(raw)
+        self._files[str(path)] = (signature, obj, hashlib.sha256(raw).hexdigest())
+        return obj
+
+    def load(self, path):
+        """
+        Returns the unpickled content of `path`, loading it only on first use or after it changed.
+        """
+        signature = self._signature(path)
+        cached = self._files.get(str(path))
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with self._lock:
+            cached = self._files.get(str(path))
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            return self._load_file(path, signature)
+
+    def digest(self, path):
+        """Returns the sha256 of `path` as of its last load."""
+        self.load(path)
+        return self._files[str(path)][2]
+
+    def artifacts(self) -> ModelArtifacts:
+        """
+        Returns the current model snapshot, swapping in a new one if any model file changed.
+
+        If a changed file cannot be loaded (e.g. it is still being written), or the files are
+        being swapped, the previous snapshot keeps being served and the reload is retried on the
+        next check. Without a previous snapshot, a swap in progress is waited for.
+        """
+        now = time.monotonic()
+        current = self._current
+        if current is not None and now - self._last_check < self.check_interval:
+            return current
+
+        with self._lock:
+            self._last_check = now
+            try:
+                signatures, snapshot = self._load_snapshot()
+                if snapshot is None:
+                    return self._current
+            except Exception:
+                if self._current is None:
+                    raise
+                logger.warning("Could not reload model artifacts; keeping version %s",
+                               self._current.version, exc_info=True)
+                return self._current
+
+            if self._current is not None and snapshot is not self._current:
+                logger.info("Model artifacts changed: %s (%s) -> %s (%s)", self._current.version,
+                            self._current.source, snapshot.version, snapshot.source)
+            self._current = snapshot
+            self._last_signatures = signatures
+            return snapshot
+
+    def _load_snapshot(self, attempts: int = 3):
+        """(signatures, snapshot) of the files on disk, or (signatures, None) if they did not change."""
+        for _ in range(attempts):
+            signatures = self._signatures()
+            if self._current is not None and signatures == self._last_signatures:
+                return signatures, None
+
+            if self._use_bundle(signatures):
+                # The bundle is self-contained: its manifest is replaced last, in one rename
+                snapshot = self._from_bundle(signatures)
+                if snapshot is None:
+                    continue
+                if self._signatures() == signatures:
+                    return signatures, snapshot
+            else:
+                self._wait_for_swap()
+                objects = {name: self.load(path) for name, path in self.MODEL_FILES.items()}
+                sources = {name: self._files[str(path)][2] for name, path in self.MODEL_FILES.items()}
+                snapshot = ModelArtifacts(version=self._version(sources), **objects)
+                # Files swapped while they were being read may belong to two different models
+                if not swap_in_progress() and self._signatures() == signatures:
+                    return signatures, snapshot
+            if self._current is not None:
+                break  # keep serving the current snapshot; retried on the next check
+        raise RuntimeError("Model files changed while they were being loaded")
+
+    def _wait_for_swap(self):
+        if not swap_in_progress():
+            return
+        if self._current is not None:
+            raise RuntimeError("Model files are being swapped")
+        deadline = time.monotonic() + SWAP_TIMEOUT
+        while swap_in_progress() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def reload(self) -> ModelArtifacts:
+        """Forces a check of the files on disk, ignoring `check_interval`."""
+        with self._lock:
+            self._last_check = 0.0
+        return self.artifacts()
+
+
+# Shared by every module and Streamlit session in the process
+registry = ArtifactRegistry()
@@ -0,0 +1,142 @@
+"""
+Batch scoring of patient files.
+
+Reads a CSV or JSONL file in fixed-size chunks, runs each chunk through the preprocessing
+pipeline and the model, and streams the predictions and class probabilities to the output
+file. Memory use depends on the chunk size, not on the size of the input.
+
+Accepted input schemas:
+    - data/data.csv: combined "Blood Pressure" column and a precomputed "BMI Category"
+    - form records, as accepted by `UserDataCollector.validate`: "Weight"/"Height" (with optional
+      units) and either "Blood Pressure" or "Systolic BP" and "Diastolic BP". These are
+      validated in bulk; invalid rows are written out with their error messages.
+
+Usage (from the project root):
+    python -m helper.batch_score data/data.csv -o predictions.csv --chunksize 50000 [--fast]
+"""
+
+import argparse
+import resource
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Setting directory to be parent root directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import FAST_SCORING_MIN_AGREEMENT
+from helper.artifacts import registry
+from helper.scoring import build_fast_scorer
+from helper.utils import UserDataCollector
+
+ID_COLUMN = "Person ID"
+
+
+def read_chunks(path, chunksize):
+    """Yields DataFrames of at most `chunksize` rows from a CSV or JSONL file."""
+    if str(path).endswith((".jsonl", ".json")):
+        return pd.read_json(path, lines=True, chunksize=chunksize, dtype=False)
+    # Same as the notebook: keep 'None' (no sleep disorder) as a string
+    return pd.read_csv(path, chunksize=chunksize, na_values=[], keep_default_na=False)
+
+
+def prepare(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Fixes the known quirks of the data/data.csv schema."""
+    if "BMI Category" in chunk.columns:
+        # data.csv uses both 'Normal' and 'Normal Weight' (see the notebook)
+        chunk["BMI Category"] = chunk["BMI Category"].replace("Normal", "Normal Weight")
+    return chunk
+
+
+def score_chunk(chunk: pd.DataFrame, artifacts, scorer=None) -> pd.DataFrame:
+    """
+    Returns the id, prediction, confidence and per-class probabilities of every row in `chunk`.
+
+    Form-style records (with "Weight" and "Height") are validated first, like the app does;
+    rows that fail validation get an "Error" message instead of a prediction.
+    `scorer` defaults to the exact `artifacts.scorer`.
+    """
+    scorer = scorer or artifacts.scorer
+    chunk = prepare(chunk)
+    if "Weight" in chunk.columns:
+        features, invalid, errors = UserDataCollector().validate_frame(chunk)
+    else:
+        features = chunk.drop(columns=[ID_COLUMN, "Sleep Disorder"], errors="ignore")
+        invalid = pd.Series(False, index=chunk.index)
+        errors = pd.Series("", index=chunk.index)
+
+    class_names = artifacts.t_encoder.inverse_transform(artifacts.model.classes_)
+    prediction = np.full(len(chunk), None, dtype=object)
+    proba = np.full((len(chunk), len(class_names)), np.nan)
+
+    valid = ~invalid.to_numpy()
+    if valid.any():
+        X = artifacts.compiled_pipeline.transform(features[valid])
+        pred, proba[valid] = scorer.score(X)
+        prediction[valid] = artifacts.t_encoder.inverse_transform(pred)
+
+    result = pd.DataFrame({
+        ID_COLUMN: chunk[ID_COLUMN].to_numpy() if ID_COLUMN in chunk.columns else chunk.index.to_numpy(),
+        "Prediction": prediction,
+        "Confidence": proba.max(axis=1).round(6),
+    })
+    for i, name in enumerate(class_names):
+        result[f"P({name})"] = proba[:, i].round(6)
+    result["Error"] = errors.to_numpy()
+    return result
+
+
+def write_chunk(result: pd.DataFrame, output, first: bool):
+    """Appends `result` to the open output file as CSV or JSONL."""
+    if output.name.endswith(".jsonl"):
+        result.to_json(output, orient="records", lines=True)
+    else:
+        result.to_csv(output, header=first, index=False)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV/JSONL file of patients in chunks.")
+    parser.add_argument("input", help="CSV or JSONL file")
+    parser.add_argument("-o", "--output", required=True, help="Output .csv or .jsonl file")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows per chunk (default: 50000)")
+    parser.add_argument("--fast", action="store_true",
+                        help="Use the approximate kernel (only if it passes the agreement check on data.csv)")
+    parser.add_argument("--min-agreement", type=float, default=FAST_SCORING_MIN_AGREEMENT,
+                        help=f"Minimum label agreement for --fast (default: {FAST_SCORING_MIN_AGREEMENT})")
+    args = parser.parse_args(argv)
+
+    # One snapshot for the whole run, so every chunk is scored by the same model version
+    artifacts = registry.artifacts()
+
+    scorer = artifacts.scorer
+    if args.fast:
+        try:
+            scorer = build_fast_scorer(artifacts, min_agreement=args.min_agreement)
+            print(f"Approximate scoring: {scorer.agreement_:.2%} agreement with the exact model on data.csv")
+        except ValueError as e:
+            print(f"{e}. Falling back to exact scoring.")
+
+    n_rows = 0
+    start = time.perf_counter()
+    with open(args.output, "w", newline="") as output:
+        for i, chunk in enumerate(read_chunks(args.input, args.chunksize)):
+            write_chunk(score_chunk(chunk, artifacts, scorer), output, first=i == 0)
+            n_rows += len(chunk)
+    elapsed = time.perf_counter() - start
+
+    print(f"Scored {n_rows:,} rows with model {artifacts.version} in {elapsed:.2f}s "
+          f"({n_rows / elapsed if elapsed else 0:,.0f} rows/sec)")
+    print(f"Peak RSS: {peak_rss_mb():,.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
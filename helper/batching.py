@@ -0,0 +1,192 @@
+"""
+Micro-batching of concurrent single-record predictions.
+
+Every Streamlit session (and every thread of the HTTP service) predicts one record at a time,
+and a one-row call spends almost all of its time in per-call overhead: building the frame,
+preprocessing it and scoring one row against every support vector. `MicroBatcher` queues the
+records of concurrent callers, and a single worker thread scores them together:
+
+- the first record waits at most `max_wait_ms` for others to join it, and a batch is cut at
+  `max_batch` records (records already queued are always taken without waiting further);
+- the batch goes through one `compiled_pipeline.transform` and one `scorer.score` call;
+- each caller gets its own (label, confidence, probabilities). If the batch fails, its records are scored again
+  one by one, so only the callers whose own record fails get an exception.
+
+The batcher also records the distribution of batch sizes and how long records waited in the
+queue, see `stats()`. benchmarks/bench_batching.py measures the gain with 50 concurrent callers.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from config import MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS
+
+logger = logging.getLogger(__name__)
+
+
+def predict_frame(frame: pd.DataFrame, artifacts) -> list:
+    """
+    (label, confidence, probabilities) of every validated row of `frame`, from one pass of the
+    model; probabilities is a dict of class label -> probability.
+    """
+    X = artifacts.compiled_pipeline.transform(frame)
+    pred, proba = artifacts.scorer.score(X)
+    labels = artifacts.t_encoder.inverse_transform(pred)
+    class_names = artifacts.t_encoder.inverse_transform(artifacts.model.classes_).tolist()
+    return [(label, max(row), dict(zip(class_names, row))) for label, row in zip(labels, proba.tolist())]
+
+
+class MicroBatcher:
+    """
+    Scores the records of concurrent callers in shared batches.
+
+    Arguments:
+        max_batch : int
+            Largest number of records scored together.
+        max_wait_ms : float
+            Longest time the first record of a batch waits for more records (0: only records that
+            are already queued are batched).
+        history : int
+            Number of recent queueing delays kept for the percentiles of `stats()`.
+    """
+
+    def __init__(self, max_batch: int = MICRO_BATCH_MAX_SIZE, max_wait_ms: float = MICRO_BATCH_MAX_WAIT_MS,
+                 history: int = 10_000):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1e3
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self._sizes = Counter()
+        self._delays = deque(maxlen=history)   # seconds between submit and the start of its batch
+        self._compute = deque(maxlen=history)  # seconds to score each batch
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+
+    def _ensure_worker(self):
+        # Started on first use, and again in a forked child (threads do not survive fork)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, record: pd.DataFrame, artifacts) -> Future:
+        """Queues one validated record; the future resolves to (label, confidence)."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((record, artifacts, future, time.perf_counter()))
+        return future
+
+    def predict(self, record: pd.DataFrame, artifacts, timeout: float = None) -> tuple[str, float, dict]:
+        """Blocks until the batch holding `record` has been scored."""
+        return self.submit(record, artifacts).result(timeout)
+
+    def _collect(self) -> list:
+        items = [self._queue.get()]
+        deadline = items[0][3] + self.max_wait
+        while len(items) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            start = time.perf_counter()
+
+            # Records of one model snapshot and one input layout (a "Blood Pressure" string or a
+            # Systolic/Diastolic pair) are scored together
+            groups = {}
+            for item in items:
+                groups.setdefault((id(item[1]), tuple(item[0].columns)), []).append(item)
+            for group in groups.values():
+                self._score(group)
+
+            with self._lock:
+                self.requests += len(items)
+                self.batches += 1
+                self._sizes[len(items)] += 1
+                self._delays.extend(start - item[3] for item in items)
+                self._compute.append(time.perf_counter() - start)
+
+    def _score(self, group):
+        try:
+            frame = pd.concat([record for record, _, _, _ in group], ignore_index=True)
+            results = predict_frame(frame, group[0][1])
+        except Exception as e:
+            error = e
+        else:
+            for (_, _, future, _), result in zip(group, results):
+                future.set_result(result)
+            return
+
+        if len(group) > 1:
+            # One bad record (e.g. a blood pressure BPClassifier cannot parse) must not fail the
+            # others: each record is scored again on its own
+            logger.warning("Micro-batch of %d records failed; scoring them one by one", len(group),
+                           exc_info=error)
+            for item in group:
+                self._score([item])
+            return
+        logger.warning("Prediction failed", exc_info=error)
+        with self._lock:
+            self.errors += 1
+        group[0][2].set_exception(error)
+
+    def reset_stats(self):
+        with self._lock:
+            self._sizes.clear()
+            self._delays.clear()
+            self._compute.clear()
+            self.requests = self.batches = self.errors = 0
+
+    def stats(self) -> dict:
+        """Batch-size distribution, queueing delay and scoring time of the recent batches."""
+        with self._lock:
+            sizes = dict(self._sizes)
+            delays = np.array(self._delays) * 1e3
+            compute = np.array(self._compute) * 1e3
+            requests, batches, errors = self.requests, self.batches, self.errors
+
+        # Batch sizes in power-of-two buckets: 1, 2-3, 4-7, ...
+        histogram = Counter()
+        for size, count in sizes.items():
+            low = 1 << (size.bit_length() - 1)
+            histogram[f"{low}-{2 * low - 1}" if low > 1 else "1"] += count
+        return {
+            "requests": requests,
+            "batches": batches,
+            "errors": errors,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "max_batch_size": max(sizes, default=0),
+            "batch_size_histogram": dict(sorted(histogram.items(), key=lambda kv: int(kv[0].split('-')[0]))),
+            "queue_delay_ms_p50": float(np.percentile(delays, 50)) if len(delays) else None,
+            "queue_delay_ms_p99": float(np.percentile(delays, 99)) if len(delays) else None,
+            "queue_delay_ms_max": float(delays.max()) if len(delays) else None,
+            "batch_ms_p50": float(np.percentile(compute, 50)) if len(compute) else None,
+            "batch_ms_p99": float(np.percentile(compute, 99)) if len(compute) else None,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1e3,
+        }
+
+
+# Shared by every Streamlit session (and service thread) in the process
+micro_batcher = MicroBatcher()
@@ -0,0 +1,124 @@
+"""
+Precomputed evaluation bundle for the Model Evaluation page.
+
+Everything the page shows (F1 scores, classification report, confusion matrix, log loss and
+the precision-recall curves) is computed once per model version by `build_bundle` and saved
+to models/evaluation_bundle.json, keyed on the sha256 of model.pkl and model_evaluation.pkl.
+The page only reads that file, so it neither unpickles the model nor runs sklearn.
+
+Rebuild after retraining (from the project root):
+    python -m helper.evaluation_bundle
+"""
+
+import json
+import os
+import sys
+
+# Setting directory to be parent root directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import EVAL_BUNDLE, MODEL_EVAL, MODEL_FILE
+from helper.artifacts import file_sha256
+
+# Bump when the layout of the bundle changes
+FORMAT_VERSION = 1
+
+
+def bundle_key(model_file=MODEL_FILE, model_eval=MODEL_EVAL) -> dict:
+    """What a bundle must have been built from to be current."""
+    return {
+        'format_version': FORMAT_VERSION,
+        'model_sha256': file_sha256(model_file),
+        'evaluation_sha256': file_sha256(model_eval),
+    }
+
+
+def _to_json(value):
+    """Converts numpy arrays and scalars (from the pickled metrics) to plain Python."""
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return value
+
+
+def build_bundle(model_file=MODEL_FILE, model_eval=MODEL_EVAL, output=EVAL_BUNDLE) -> dict:
+    """
+    Computes every metric shown on the Model Evaluation page and saves them to `output`.
+
+    Returns:
+        the bundle, also when it could not be saved (e.g. on a read-only file system).
+    """
+    # sklearn is only needed here, never on the page itself
+    import pickle
+    from sklearn.metrics import average_precision_score, log_loss, precision_recall_curve
+    from sklearn.preprocessing import label_binarize
+
+    key = bundle_key(model_file, model_eval)
+    with open(model_eval, 'rb') as f:
+        full_metrics = pickle.load(f)
+    with open(model_file, 'rb') as f:
+        model = pickle.load(f)
+
+    test_metrics = full_metrics['test_metrics']
+    train_metrics = full_metrics['train_metrics']
+    class_names = list(test_metrics['class_names'])
+
+    y_true = test_metrics['y_test']
+    y_pred_proba = model.predict_proba(test_metrics['X_test'])
+    y_true_bin = label_binarize(y_true, classes=range(len(class_names)))  # One-vs-Rest
+
+    pr_curves = {}
+    for i, cls in enumerate(class_names):
+        precision, recall, _ = precision_recall_curve(y_true_bin[:, i], y_pred_proba[:, i])
+        pr_curves[str(cls)] = {
+            'precision': precision.round(6).tolist(),
+            'recall': recall.round(6).tolist(),
+            'average_precision': float(average_precision_score(y_true_bin[:, i], y_pred_proba[:, i])),
+        }
+
+    bundle = {
+        **key,
+        'class_names': [str(cls) for cls in class_names],
+        'test': {
+            'f1_score': float(test_metrics['f1_score']),
+            'classification_report': _to_json(test_metrics['classification_report']),
+            'confusion_matrix': _to_json(test_metrics['confusion_matrix']),
+            'log_loss': float(log_loss(y_true, y_pred_proba)),
+            'pr_curves': pr_curves,
+        },
+        'train': {
+            'f1_score': float(train_metrics['f1_score']),
+        },
+    }
+
+    try:
+        tmp = f"{output}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(bundle, f, separators=(',', ':'))
+        os.replace(tmp, output)
+    except OSError:
+        pass
+    return bundle
+
+
+def load_bundle(path=EVAL_BUNDLE, model_file=MODEL_FILE, model_eval=MODEL_EVAL):
+    """
+    Returns the saved bundle, or None if it is missing or was built from other model files.
+    """
+    try:
+        with open(path) as f:
+            bundle = json.load(f)
+    except (OSError, ValueError):
+        return None
+    key = bundle_key(model_file, model_eval)
+    if any(bundle.get(name) != value for name, value in key.items()):
+        return None
+    return bundle
+
+
+if __name__ == "__main__":
+    bundle = build_bundle()
+    print(f"Saved {EVAL_BUNDLE} for model {bundle['model_sha256'][:12]}")
@@ -0,0 +1,117 @@
+"""
+Per-patient SHAP explanations for the deployed SVC.
+
+The notebook's `shap.KernelExplainer` over the whole training set is far too slow to run per
+request. Here the explainer is built once per model version, with:
+
+- a `shap.kmeans` summary of the training rows as background, computed when the explainer of a
+  model version is built (about 0.1 s, once per version and process);
+- `SVCScorer` as the model function, so each explanation scores all of its coalition samples in
+  one batched call, with one kernel evaluation per sample;
+- a fixed number of coalition samples, which bounds the latency (see benchmarks/bench_explainer.py);
+- a cache of explanations keyed on the canonical validated record, like predictions.
+"""
+
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Setting directory to be parent root directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import DATA_FILE, SHAP_BACKGROUND_SIZE, SHAP_NSAMPLES
+from helper.artifacts import registry
+from helper.metrics import metrics
+from helper.predictor import PredictionCache
+
+
+def training_features(artifacts) -> np.ndarray:
+    """The notebook's training rows (same stratified split) through the app's preprocessing."""
+    from sklearn.model_selection import train_test_split
+    from helper.scoring import reference_features
+
+    data = pd.read_csv(DATA_FILE, na_values=[], keep_default_na=False)
+    train, _ = train_test_split(np.arange(len(data)), stratify=data['Sleep Disorder'],
+                                test_size=0.15, random_state=42)
+    return reference_features(artifacts)[np.sort(train)]
+
+
+def background(artifacts, k=SHAP_BACKGROUND_SIZE):
+    """The training rows of `artifacts` summarised into `k` weighted centroids (`shap.kmeans`)."""
+    import shap
+
+    return shap.kmeans(training_features(artifacts), k)
+
+
+class Explainer:
+    """
+    Explains the predictions of one model version.
+
+    Arguments:
+        artifacts : ModelArtifacts
+            The model snapshot to explain.
+        nsamples : int
+            Coalition samples per explanation; bounds the cost of each explanation.
+    """
+
+    def __init__(self, artifacts, nsamples: int = SHAP_NSAMPLES):
+        import shap
+
+        scorer = artifacts.scorer
+        self.explainer = shap.KernelExplainer(lambda X: scorer.probabilities(scorer.decision_values(X)),
+                                              background(artifacts))
+        self.nsamples = nsamples
+        self.version = artifacts.version
+        self.feature_names = list(artifacts.compiled_pipeline.feature_names)
+        self.class_names = list(artifacts.t_encoder.inverse_transform(artifacts.model.classes_))
+        self.expected_value = pd.Series(np.asarray(self.explainer.expected_value), index=self.class_names)
+
+    def explain_features(self, X: np.ndarray) -> np.ndarray:
+        """SHAP values of preprocessed rows, shape (n_rows, n_features, n_classes)."""
+        return np.asarray(self.explainer.shap_values(X, nsamples=self.nsamples, silent=True))
+
+
+class ExplanationService:
+    """
+    Process-wide explanations: one `Explainer` per model version and an LRU/TTL cache of results.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.cache = PredictionCache(maxsize=maxsize, ttl=ttl)
+        self._explainer = None
+        self._lock = threading.Lock()
+
+    def explainer(self, artifacts) -> Explainer:
+        with self._lock:
+            if self._explainer is None or self._explainer.version != artifacts.version:
+                self._explainer = Explainer(artifacts)
+            return self._explainer
+
+    def explain(self, record: pd.DataFrame, artifacts=None) -> pd.DataFrame:
+        """
+        Explains the prediction of one validated record (the output of `UserDataCollector.validate`).
+
+        Returns:
+            DataFrame of SHAP values, one row per model feature and one column per class: how much
+            each feature moved the probability of each class away from `expected_value`.
+        """
+        artifacts = artifacts or registry.artifacts()
+        key = self.cache.key(record)
+        cached = self.cache.get(key, artifacts.version)
+        if cached is not None:
+            return cached
+
+        explainer = self.explainer(artifacts)
+        with metrics.timer('model.explain'):
+            values = explainer.explain_features(artifacts.compiled_pipeline.transform(record))[0]
+        result = pd.DataFrame(values, index=explainer.feature_names, columns=explainer.class_names)
+
+        self.cache.put(key, artifacts.version, result)
+        return result
+
+
+# Shared by every Streamlit session in the process
+explanation_service = ExplanationService()
@@ -1,52 +1,62 @@
 import streamlit as st
 import re
-from streamlit_gsheets import GSheetsConnection
-import pandas as pd
+import threading
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
+from helper.metrics import metrics
+
 
 # ------- Connecting to Google Sheet ----------
-conn = st.connection("gsheets", type=GSheetsConnection)
+# The connection (gspread, google-auth, ...) and the writer thread are only set up on the first
+# read or write, so a page with a form does not import them just to render. Rows left in the
+# outbox by a previous process are sent along with the first write of this one.
+def get_connection():
+    """The Google Sheet connection (st.connection keeps one per process)."""
+    from streamlit_gsheets import GSheetsConnection
+    return st.connection("gsheets", type=GSheetsConnection)
 
 @st.cache_data  # Cache the data fetching process
 def fetch_data_from_sheet(worksheet_name):
     """Fetch the data from Google Sheet."""
-    return conn.read(worksheet=worksheet_name)
+    return get_connection().read(worksheet=worksheet_name)
+
+def open_spreadsheet():
+    """The gspread Spreadsheet of the "gsheets" connection, opened with the same secrets."""
+    import gspread
+
+    secrets = st.secrets["connections"]["gsheets"].to_dict()
+    spreadsheet = secrets.pop("spreadsheet")
+    secrets.pop("worksheet", None)
+    client = gspread.service_account_from_dict(secrets)
+    if spreadsheet.startswith(("http://", "https://")):
+        return client.open_by_url(spreadsheet)
+    return client.open(spreadsheet)
+
+_sheet_writer = None
+_sheet_writer_lock = threading.Lock()
+
+def get_sheet_writer():
+    """Appends rows on a background thread (shared by every session in the process)."""
+    global _sheet_writer
+    with _sheet_writer_lock:
+        if _sheet_writer is None:
+            from helper.sheet_writer import BackgroundSheetWriter, SheetWriter
+            _sheet_writer = BackgroundSheetWriter(SheetWriter(get_connection(), spreadsheet=open_spreadsheet),
+                                                  on_written=fetch_data_from_sheet.clear)
+        return _sheet_writer
 
 def update_or_create_sheet(worksheet_name: str, new_data: dict):
     """
-    Check if worksheet exists in Google Sheet.
-    - If it doesn't, create it and add the first row.
-    - If it does, append a new row.
+    Append new row(s) to a worksheet in Google Sheet, without waiting for the write.
+    - The rows are queued and written by a background thread; a missing worksheet is created.
+    - Rows are kept in a local outbox and retried if Google Sheet is unreachable.
     """
-    if isinstance(new_data, dict):
-        new_df = pd.DataFrame([new_data])
-    else:
-        new_df = new_data.copy()
-
-
-    
     try:
-        # Fetch the latest data from the sheet
-        existing_data = fetch_data_from_sheet(worksheet_name)
-
-        # If the worksheet is empty (None), just write the new data
-        if existing_data is None:
-            df = new_df.copy()
-        else:
-            df = pd.DataFrame(existing_data)
-            df = pd.concat([df, new_df], ignore_index=True)
-
-        # Update the worksheet
-        conn.update(worksheet=worksheet_name, data=df)
-
-        # Clear the cache to force the app to fetch fresh data next time
-        st.cache_data.clear()
-
+        with metrics.timer('sheets.submit', 1 if isinstance(new_data, dict) else len(new_data)):
+            get_sheet_writer().submit(worksheet_name, new_data)
     except Exception as e:
-        st.error(f"Error updating sheet: {e}")
-        return
+        st.error(f"Error saving data: {e}")
 
 
 
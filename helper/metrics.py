@@ -0,0 +1,217 @@
+"""
+Per-stage timing of the inference path: validation, each preprocessing step, the model calls and
+the Google Sheet writes.
+
+Code on the inference path wraps each stage in `metrics.timer(stage, rows)` (or decorates it with
+`metrics.timed`). Every stage keeps, in memory:
+
+- its number of calls, rows and errors (calls that raised), and the total time;
+- a histogram of call durations over `METRICS_BUCKETS`, cumulative since start or `reset()`;
+- the durations of its last `METRICS_WINDOW` calls, for the percentiles of the admin panel.
+
+`metrics.prometheus()` renders everything in the Prometheus text format (served on /metrics by
+helper/service.py), and `metrics.snapshot()` gives one summary row per stage (the Admin page).
+
+Stage names are dotted: 'pipeline.<step>' for the steps of the sklearn Pipeline,
+'compiled_pipeline.<part>' for the parts of `CompiledPipeline.transform` (numeric_copy,
+bmi_category, bp_category, encode_categories, standardise), 'model.*' for the model calls and
+'sheets.*' for the Google Sheet writes. The transformers get `metrics.timer` injected by
+helper/artifacts.py rather than importing this module.
+
+Metrics are on unless the SLEEPDISORDER_METRICS environment variable is 0, and can be switched at
+runtime with `metrics.enabled`. When off, `timer` returns a shared no-op object and nothing is
+measured or locked.
+"""
+
+import bisect
+import functools
+import threading
+import time
+from collections import deque
+
+from config import METRICS_BUCKETS, METRICS_ENABLED, METRICS_WINDOW
+
+
+class StageStats:
+    """Counters, histogram and recent durations of one stage."""
+
+    __slots__ = ('calls', 'rows', 'errors', 'seconds', 'buckets', 'recent')
+
+    def __init__(self, n_buckets: int, window: int):
+        self.calls = 0
+        self.rows = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (n_buckets + 1)  # the last one is +Inf
+        self.recent = deque(maxlen=window)
+
+
+class _Timer:
+    """Times one call of a stage; `lap` records the part of it since the previous lap as a sub-stage."""
+
+    __slots__ = ('metrics', 'stage', 'rows', 'start', 'last')
+
+    def __init__(self, metrics, stage, rows):
+        self.metrics = metrics
+        self.stage = stage
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = self.last = time.perf_counter()
+        return self
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        self.metrics.observe(f"{self.stage}.{name}", now - self.last, self.rows)
+        self.last = now
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start, self.rows, exc_type is not None)
+        return False
+
+
+class _NullTimer:
+    """What `timer` returns while metrics are off."""
+
+    __slots__ = ('rows',)
+
+    def __enter__(self):
+        return self
+
+    def lap(self, name: str):
+        pass
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Process-wide registry of stage timings.
+
+    Arguments:
+        enabled : bool
+            Whether anything is recorded.
+        buckets : sequence of float
+            Upper bounds of the histogram buckets, in seconds, increasing.
+        window : int
+            Number of recent durations kept per stage.
+    """
+
+    PREFIX = 'sleepdisorder'
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, buckets=METRICS_BUCKETS, window: int = METRICS_WINDOW):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.window = window
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._since = time.time()
+
+    def timer(self, stage: str, rows: int = 1):
+        """Context manager recording the wall time of its block (an error if it raises)."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage, rows)
+
+    def timed(self, stage: str, rows=None):
+        """
+        Decorator recording every call of a function as `stage`.
+
+        Arguments:
+            rows : callable, optional
+                Gets the call's arguments and returns its number of rows (1 by default).
+        """
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Timer(self, stage, rows(*args, **kwargs) if rows is not None else 1):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, stage: str, seconds: float, rows: int = 1, error: bool = False):
+        """Records one call of `stage` directly."""
+        if not self.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats(len(self.buckets), self.window)
+            stats.calls += 1
+            stats.rows += rows
+            stats.errors += error
+            stats.seconds += seconds
+            stats.buckets[index] += 1
+            stats.recent.append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._since = time.time()
+
+    def snapshot(self) -> list:
+        """One dict per stage: counters, mean, and percentiles of the recent calls (in ms)."""
+        with self._lock:
+            stages = {name: (s.calls, s.rows, s.errors, s.seconds, sorted(s.recent))
+                      for name, s in self._stages.items()}
+
+        def percentile(values, q):
+            return values[min(int(q * len(values)), len(values) - 1)] * 1e3
+
+        rows = []
+        for name in sorted(stages):
+            calls, n_rows, errors, seconds, recent = stages[name]
+            rows.append({
+                'stage': name,
+                'calls': calls,
+                'rows': n_rows,
+                'errors': errors,
+                'total_s': seconds,
+                'mean_ms': seconds / calls * 1e3,
+                'p50_ms': percentile(recent, 0.50),
+                'p95_ms': percentile(recent, 0.95),
+                'p99_ms': percentile(recent, 0.99),
+                'max_ms': recent[-1] * 1e3,
+            })
+        return rows
+
+    def prometheus(self) -> str:
+        """Every stage in the Prometheus text exposition format."""
+        with self._lock:
+            stages = {name: (s.calls, s.rows, s.errors, s.seconds, list(s.buckets))
+                      for name, s in self._stages.items()}
+
+        name = f"{self.PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Wall time of each inference stage.", f"# TYPE {name} histogram"]
+        bounds = [repr(float(b)) for b in self.buckets] + ['+Inf']
+        for stage in sorted(stages):
+            calls, _, _, seconds, counts = stages[stage]
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {seconds!r}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {calls}')
+
+        for metric, index, help_text in (('rows_total', 1, 'Rows processed by each inference stage.'),
+                                          ('errors_total', 2, 'Calls of each inference stage that raised.')):
+            lines += [f"# HELP {self.PREFIX}_stage_{metric} {help_text}",
+                      f"# TYPE {self.PREFIX}_stage_{metric} counter"]
+            lines += [f'{self.PREFIX}_stage_{metric}{{stage="{stage}"}} {stages[stage][index]}'
+                      for stage in sorted(stages)]
+
+        lines += [f"# HELP {self.PREFIX}_metrics_enabled Whether stage timings are being recorded.",
+                  f"# TYPE {self.PREFIX}_metrics_enabled gauge",
+                  f"{self.PREFIX}_metrics_enabled {int(self.enabled)}"]
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every Streamlit session (and service thread) in the process
+metrics = Metrics()
@@ -0,0 +1,358 @@
+"""
+Single-file-set model bundle: everything needed to serve predictions, without pickle.
+
+Layout of models/bundle/:
+    manifest.json          format version, model hyperparameters, class and feature names,
+                           the dtype/shape/offset of every array, the sha256 (and mtime/size at
+                           export) of the pickles it was exported from, and a content hash of the
+                           whole bundle
+    arrays-<hash>.bin      the raw arrays, each 64-byte aligned: SVC support vectors, dual
+                           coefficients, intercepts and Platt parameters, scaler mean/scale and
+                           one fixed-width string table of categories per encoder
+
+The arrays are memory-mapped read-only, so loading costs a JSON parse and an mmap, and every
+process serving the same bundle shares the same pages of the OS page cache. The arrays file is
+named after its content and the manifest is replaced last, so a reader never sees a manifest
+pointing at a half-written file.
+
+Export after retraining (from the project root):
+    python -m helper.model_bundle
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+# Setting directory to be parent root directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import FEATURE_ENCODER, MODEL_BUNDLE_DIR, MODEL_FILE, SCALER_FILE, TARGET_ENCODER
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "sleep-disorder-model-bundle"
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+ALIGNMENT = 64
+
+# The pickles a bundle is exported from, in `ArtifactRegistry.MODEL_FILES` order
+SOURCES = {'model': MODEL_FILE, 't_encoder': TARGET_ENCODER, 'f_encoder': FEATURE_ENCODER, 'scaler': SCALER_FILE}
+
+# libsvm's arrays, as passed by sklearn's SVC to sklearn.svm._libsvm
+SVC_ARRAYS = {
+    'support': 'support_',
+    'support_vectors': 'support_vectors_',
+    'n_support': '_n_support',
+    'dual_coef': '_dual_coef_',
+    'intercept': '_intercept_',
+    'probA': '_probA',
+    'probB': '_probB',
+    'classes': 'classes_',
+}
+
+
+def _content_hash(manifest: dict, raw: bytes) -> str:
+    """sha256 of the arrays and of every manifest field except the hash itself."""
+    meta = {k: v for k, v in manifest.items() if k != 'bundle_sha256'}
+    digest = hashlib.sha256(json.dumps(meta, sort_keys=True).encode())
+    digest.update(raw)
+    return digest.hexdigest()
+
+
+def export_bundle(output_dir=MODEL_BUNDLE_DIR, sources=SOURCES) -> dict:
+    """
+    Exports the pickled model, encoders and scaler to a bundle in `output_dir`.
+
+    Returns:
+        the manifest.
+    """
+    raw_sources, source_stats = {}, {}
+    for name, path in sources.items():
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            raw_sources[name] = f.read()
+        source_stats[name] = [stat.st_mtime_ns, stat.st_size]
+    objects = {name: pickle.loads(raw) for name, raw in raw_sources.items()}
+    model, t_encoder, f_encoder, scaler = (objects[name] for name in ('model', 't_encoder', 'f_encoder', 'scaler'))
+
+    if type(model).__name__ != 'SVC' or model._sparse or callable(model.kernel):
+        raise ValueError("Only dense SVC models with a built-in kernel can be bundled")
+
+    arrays = {name: np.ascontiguousarray(getattr(model, attr)) for name, attr in SVC_ARRAYS.items()}
+    arrays['scaler_mean'] = np.asarray(scaler.mean_, dtype=np.float64)
+    arrays['scaler_scale'] = np.asarray(scaler.scale_, dtype=np.float64)
+    encoders = {}
+    for col, encoder in f_encoder.items():
+        arrays[f'categories/{col}'] = np.asarray(encoder.categories_[0]).astype(str)  # fixed-width unicode
+        encoders[col] = {'unknown_value': float(encoder.unknown_value)}
+
+    # Lay the arrays out back to back, each aligned for mmap
+    entries, chunks, offset = {}, [], 0
+    for name, array in arrays.items():
+        padding = -offset % ALIGNMENT
+        chunks.append(b'\0' * padding)
+        offset += padding
+        entries[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        chunks.append(array.tobytes())
+        offset += array.nbytes
+    raw = b''.join(chunks)
+
+    manifest = {
+        'format': FORMAT,
+        'format_version': FORMAT_VERSION,
+        'sources': {name: hashlib.sha256(data).hexdigest() for name, data in raw_sources.items()},
+        'source_stats': source_stats,
+        'model': {
+            'kernel': model.kernel,
+            'degree': int(model.degree),
+            'gamma': float(model._gamma),
+            'coef0': float(model.coef0),
+            'svm_type': 0,  # c_svc
+            'cache_size': float(model.cache_size),
+            'decision_function_shape': model.decision_function_shape,
+            'probability': bool(model.probability),
+        },
+        'target_classes': [str(cls) for cls in t_encoder.classes_],
+        'feature_names': [str(name) for name in scaler.feature_names_in_],
+        'encoders': encoders,
+        'arrays': entries,
+    }
+    manifest['arrays_file'] = f"arrays-{hashlib.sha256(raw).hexdigest()[:16]}.bin"
+    manifest['bundle_sha256'] = _content_hash(manifest, raw)
+
+    os.makedirs(output_dir, exist_ok=True)
+    arrays_path = os.path.join(output_dir, manifest['arrays_file'])
+    if not os.path.exists(arrays_path):
+        with open(arrays_path + '.tmp', 'wb') as f:
+            f.write(raw)
+        os.replace(arrays_path + '.tmp', arrays_path)
+
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    # Older arrays files are no longer referenced (processes that mapped them keep their mapping)
+    for name in os.listdir(output_dir):
+        if name.startswith('arrays-') and name.endswith('.bin') and name != manifest['arrays_file']:
+            os.remove(os.path.join(output_dir, name))
+    return manifest
+
+
+def _private_libsvm():
+    """sklearn's private libsvm binding (the one `SVC` calls), or None if it is not importable."""
+    try:
+        from sklearn.svm import _libsvm
+    except ImportError:
+        return None
+    return _libsvm
+
+
+class BundledSVC:
+    """
+    The part of sklearn's `SVC` API the app uses, on top of the bundle's memory-mapped arrays.
+
+    Predictions go through the same libsvm routines as `SVC`, with the same arrays, so they are
+    identical to the exported model's. Those routines are private to scikit-learn (pinned in
+    requirements.txt): if they cannot be imported or called as expected, the decision values are
+    computed with numpy instead (the same formula, equal up to floating-point rounding), and the
+    labels and probabilities derived from them as libsvm does (`helper.scoring.SVCScorer`).
+    """
+
+    def __init__(self, params: dict, arrays: dict):
+        self.kernel = params['kernel']
+        self.degree = params['degree']
+        self._gamma = params['gamma']
+        self.coef0 = params['coef0']
+        self.cache_size = params['cache_size']
+        self.decision_function_shape = params['decision_function_shape']
+        self.probability = params['probability']
+        self._svm_type = params['svm_type']
+
+        self.classes_ = arrays['classes']
+        self.support_ = arrays['support']
+        self.support_vectors_ = arrays['support_vectors']
+        self.n_support_ = arrays['n_support']
+        # libsvm's predict_proba wants writable coefficient buffers: these few hundred floats are
+        # copied, the support vectors stay mapped
+        self._dual_coef_ = np.array(arrays['dual_coef'])
+        self._intercept_ = np.array(arrays['intercept'])
+        self.probA_ = np.array(arrays['probA'])
+        self.probB_ = np.array(arrays['probB'])
+        # sklearn exposes the binary coefficients with the opposite sign
+        binary = len(self.classes_) == 2
+        self.dual_coef_ = -self._dual_coef_ if binary else self._dual_coef_
+        self.intercept_ = -self._intercept_ if binary else self._intercept_
+
+        self._libsvm = _private_libsvm()
+        if self._libsvm is not None:
+            args, kwargs = self._libsvm_args(self.support_vectors_[:1])
+            try:
+                self._libsvm.decision_function(*args, **kwargs)
+            except (TypeError, ValueError, AttributeError):
+                self._libsvm = None
+        if self._libsvm is None:
+            logger.warning("sklearn.svm._libsvm is unavailable or has changed; scoring the bundle with numpy")
+            from helper.scoring import SVCScorer
+            self._scorer = SVCScorer(self)
+
+    def _libsvm_args(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.support_vectors_.shape[1]:
+            raise ValueError(f"X must have shape (n_samples, {self.support_vectors_.shape[1]})")
+        args = (X, self.support_, self.support_vectors_, self.n_support_, self._dual_coef_,
+                self._intercept_, self.probA_, self.probB_)
+        kwargs = dict(svm_type=self._svm_type, kernel=self.kernel, degree=self.degree,
+                      coef0=self.coef0, gamma=self._gamma, cache_size=self.cache_size)
+        return args, kwargs
+
+    def _kernel(self, X) -> np.ndarray:
+        """K[i, s] = kernel(X[i], support vector s), with libsvm's definitions."""
+        dot = X @ self.support_vectors_.T
+        if self.kernel == 'linear':
+            return dot
+        if self.kernel == 'poly':
+            return (self._gamma * dot + self.coef0) ** self.degree
+        if self.kernel == 'sigmoid':
+            return np.tanh(self._gamma * dot + self.coef0)
+        sv = self.support_vectors_
+        distances = (X * X).sum(axis=1)[:, None] + (sv * sv).sum(axis=1)[None, :] - 2 * dot
+        return np.exp(-self._gamma * np.maximum(distances, 0, out=distances))
+
+    def _decision_numpy(self, X) -> np.ndarray:
+        # libsvm's svm_predict_values: for the pair (i, j), the support vectors of class i weighted
+        # by row j - 1 of the coefficients, those of class j by row i, minus rho (= -intercept)
+        K = self._kernel(X)
+        bounds = np.concatenate([[0], np.cumsum(self.n_support_)])
+        n_classes = len(self.classes_)
+        dec = np.empty((len(X), n_classes * (n_classes - 1) // 2))
+        p = 0
+        for i in range(n_classes):
+            for j in range(i + 1, n_classes):
+                si, sj = slice(bounds[i], bounds[i + 1]), slice(bounds[j], bounds[j + 1])
+                dec[:, p] = (K[:, si] @ self._dual_coef_[j - 1, si] + K[:, sj] @ self._dual_coef_[i, sj]
+                             + self._intercept_[p])
+                p += 1
+        return dec
+
+    def decision_function(self, X) -> np.ndarray:
+        """One-vs-one decision values, as `SVC.decision_function` with decision_function_shape='ovo'."""
+        args, kwargs = self._libsvm_args(X)
+        dec = self._libsvm.decision_function(*args, **kwargs) if self._libsvm else self._decision_numpy(args[0])
+        if len(self.classes_) == 2:
+            return -dec.ravel()
+        return dec
+
+    def predict(self, X) -> np.ndarray:
+        args, kwargs = self._libsvm_args(X)
+        if self._libsvm is None:
+            return self.classes_.take(self._scorer.votes(self._scorer.decision_values(args[0])))
+        return self.classes_.take(np.asarray(self._libsvm.predict(*args, **kwargs), dtype=np.intp))
+
+    def predict_proba(self, X) -> np.ndarray:
+        args, kwargs = self._libsvm_args(X)
+        if self._libsvm is None:
+            return self._scorer.probabilities(self._scorer.decision_values(args[0]))
+        return self._libsvm.predict_proba(*args, **kwargs)
+
+
+class BundledScaler:
+    """
+    The part of sklearn's `StandardScaler` API the app uses, on the bundle's mean and scale.
+
+    `transform` does the same operations as `StandardScaler.transform`, so the values are identical.
+    """
+
+    def __init__(self, feature_names, mean, scale):
+        self.feature_names_in_ = feature_names
+        self.n_features_in_ = len(feature_names)
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X) -> np.ndarray:
+        if hasattr(X, 'columns') and list(X.columns) != list(self.feature_names_in_):
+            raise ValueError("The feature names should match those that were passed during fit")
+        X = np.array(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X must have shape (n_samples, {self.n_features_in_})")
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+class ModelBundle:
+    """
+    A loaded bundle.
+
+    Attributes:
+    -----------
+    manifest : dict
+    arrays : dict of read-only memory-mapped arrays
+    model : BundledSVC
+    t_encoder : LabelEncoder with the target classes
+    f_encoder : dict of category tables per categorical column (`categories_`, `unknown_value`)
+    scaler : BundledScaler
+    sources : sha256 of the pickles the bundle was exported from
+    source_stats : their [mtime_ns, size] at export (absent from bundles exported before it was recorded)
+    """
+
+    def __init__(self, manifest: dict, arrays: dict):
+        from sklearn.preprocessing import LabelEncoder
+
+        self.manifest = manifest
+        self.arrays = arrays
+        self.sources = manifest['sources']
+        self.source_stats = manifest.get('source_stats', {})
+        self.model = BundledSVC(manifest['model'], arrays)
+
+        self.t_encoder = LabelEncoder()
+        self.t_encoder.classes_ = np.array(manifest['target_classes'], dtype=object)
+
+        self.f_encoder = {
+            col: SimpleNamespace(categories_=[arrays[f'categories/{col}'].astype(object)],
+                                 unknown_value=spec['unknown_value'])
+            for col, spec in manifest['encoders'].items()
+        }
+        self.scaler = BundledScaler(np.array(manifest['feature_names'], dtype=object),
+                                    arrays['scaler_mean'], arrays['scaler_scale'])
+
+
+def load_model_bundle(directory=MODEL_BUNDLE_DIR, verify: bool = True) -> ModelBundle:
+    """
+    Memory-maps the bundle in `directory`.
+
+    Arguments:
+        verify : bool
+            Recompute the content hash and compare it with the manifest (reads the arrays once).
+
+    Raises:
+        ValueError if the bundle has an unknown format or does not match its hash.
+    """
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT or manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model bundle format: {manifest.get('format')} "
+                         f"v{manifest.get('format_version')}")
+
+    path = os.path.join(directory, manifest['arrays_file'])
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    if verify and _content_hash(manifest, mapped.tobytes()) != manifest['bundle_sha256']:
+        raise ValueError(f"Model bundle {directory} does not match its content hash")
+
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=entry['offset']).reshape(entry['shape'])
+    return ModelBundle(manifest, arrays)
+
+
+if __name__ == "__main__":
+    manifest = export_bundle()
+    print(f"Saved {MODEL_BUNDLE_DIR}: {manifest['arrays_file']} (bundle {manifest['bundle_sha256'][:12]})")
@@ -0,0 +1,157 @@
+"""
+Prediction service shared by the app pages.
+
+Predictions for a validated record are memoised in a process-wide LRU cache with a TTL,
+so identical inputs submitted from any session (e.g. the defaults of the demo page) only
+run the pipeline and the model once. Entries are keyed on the record after unit
+conversion, so 85 kg and 187.39 lbs hit the same entry, and the whole cache is dropped
+as soon as the model artifacts change.
+
+Cache misses are scored through the process-wide micro-batcher (helper/batching.py), so the
+records of concurrent sessions share one pass of the pipeline and the model.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from helper.artifacts import registry
+from helper.batching import micro_batcher
+from helper.metrics import metrics
+
+# Order of the fields in the cache key (the output schema of `UserDataCollector.validate`)
+KEY_FIELDS = ["Gender", "Age", "Occupation", "Sleep Duration", "Quality of Sleep", "Physical Activity Level",
+              "Stress Level", "Weight", "Height", "Heart Rate", "Daily Steps"]
+
+
+class PredictionCache:
+    """
+    A thread-safe LRU cache with a time-to-live, tied to one model version at a time.
+
+    Arguments:
+        maxsize : int
+            Maximum number of entries; the least recently used entry is evicted beyond it.
+        ttl : float
+            Seconds an entry stays valid.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expiry time, value)
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(record: pd.DataFrame) -> str:
+        """
+        Canonical hash of one validated record.
+
+        Floats are rounded to absorb conversion noise, and the blood pressure is reduced to
+        its (systolic, diastolic) pair whether it was given as a string or as two numbers.
+        """
+        row = record.iloc[0]
+        values = []
+        for field in KEY_FIELDS:
+            value = row[field]
+            values.append(round(float(value), 6) if not isinstance(value, str) else value.strip().title())
+
+        if "Blood Pressure" in record.columns and isinstance(row["Blood Pressure"], str):
+            systolic, diastolic = row["Blood Pressure"].split("/")
+        else:
+            systolic, diastolic = row["Systolic BP"], row["Diastolic BP"]
+        values += [int(systolic), int(diastolic)]
+
+        return hashlib.sha1(repr(values).encode()).hexdigest()
+
+    def _check_version(self, version):
+        # Called with the lock held
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: str, version: str):
+        """Returns the cached value for `key` under model `version`, or None."""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, version: str, value):
+        """Stores `value` for `key` under model `version`, evicting the oldest entries if full."""
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Counters and current size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "model_version": self._version,
+            }
+
+
+# Shared by every Streamlit session in the process
+prediction_cache = PredictionCache()
+
+
+@metrics.timed('predict')
+def predict(record: pd.DataFrame, artifacts=None, probabilities: bool = False) -> tuple:
+    """
+    Predicts the sleep disorder of one validated record (the output of `UserDataCollector.validate`).
+
+    Argument:
+        record : pd.DataFrame
+            A single validated row.
+        artifacts : ModelArtifacts, optional
+            Model snapshot to use; defaults to the current one from the registry.
+        probabilities : bool
+            Whether to also return the probability of every class.
+
+    Returns:
+        (predicted label, confidence), plus a dict of class label -> probability with `probabilities`
+    """
+    artifacts = artifacts or registry.artifacts()
+    key = prediction_cache.key(record)
+
+    result = prediction_cache.get(key, artifacts.version)
+    if result is None:
+        result = micro_batcher.predict(record, artifacts)
+        prediction_cache.put(key, artifacts.version, result)
+    return result if probabilities else result[:2]
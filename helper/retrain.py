@@ -0,0 +1,630 @@
+"""
+Retraining from the clinicians' evaluations.
+
+Every evaluation submitted on the Clinician Portal is appended to the "Sleep Data" worksheet,
+with the validated inputs and the diagnosis the clinician confirmed or corrected. A run:
+
+1. pulls the rows added to the worksheet since the previous pull (the number of rows already
+   pulled is kept in models/retrain/state.json) into models/retrain/feedback.csv, validating
+   them like the app does and skipping those it would reject;
+2. retrains the SVC on data/data.csv merged with every feedback row pulled so far, with the
+   deployed model's hyperparameters and the notebook's preprocessing (OrdinalEncoders,
+   LabelEncoder and StandardScaler fitted on the training rows), within a CPU time budget;
+3. scores the candidate and the deployed model on the same held-out rows, which no model is ever
+   trained on: the notebook's test split of data.csv and the feedback rows held out when they were
+   pulled (`TEST_SIZE` of them, chosen by a hash of their position in feedback.csv, which is
+   append-only);
+4. promotes the candidate only if its macro-F1 is not lower than the deployed model's: the
+   pickles are replaced in one journalled swap (`helper.artifacts.swap_files`), then the model
+   and evaluation bundles are re-exported. Running processes pick the new model up on their
+   next registry check.
+
+Every promoted model, and the one it replaced, is kept in models/retrain/history/ (the last
+RETRAIN_HISTORY versions besides the deployed one), so a promotion can be rolled back.
+
+`retrain_job` runs this in the background for the app: the feedback is pulled through the app's
+Google Sheets connection, and the training runs in a child process, where the CPU budget is
+enforced by the kernel and which does not compete with the app for the GIL.
+
+Usage (from the project root):
+    python -m helper.retrain [--force] [--cpu-budget 120] [--sheets DIR]
+    python -m helper.retrain --history
+    python -m helper.retrain --rollback [VERSION]
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import pickle
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# Setting directory to be parent root directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import (CAT_FEATURES, DATA_FILE, FEATURE_ENCODER, FEEDBACK_FILE, FEEDBACK_WORKSHEET, MODEL_EVAL,
+                    MODEL_FEATURES, MODEL_FILE, MODEL_HISTORY_DIR, NUM_FEATURES, RETRAIN_CPU_BUDGET, RETRAIN_DIR,
+                    RETRAIN_HISTORY, RETRAIN_INTERVAL, RETRAIN_MIN_ROWS, RETRAIN_STATE, ROOT_DIR, SCALER_FILE,
+                    TARGET_ENCODER)
+from helper.artifacts import model_version, registry, swap_files
+
+logger = logging.getLogger(__name__)
+
+# The files a model version is made of, as kept in the history
+MODEL_FILES = [MODEL_FILE, TARGET_ENCODER, FEATURE_ENCODER, SCALER_FILE, MODEL_EVAL]
+
+# The labels of data.csv, and the Clinician Portal's wording of the ones it words differently
+LABELS = ('Insomnia', 'None', 'Sleep Apnea')
+PORTAL_LABELS = {'No sleep disorder': 'None'}
+
+# Validated inputs saved with each evaluation, and the label taken from it
+FEEDBACK_COLUMNS = ["Gender", "Age", "Occupation", "Sleep Duration", "Quality of Sleep", "Physical Activity Level",
+                    "Stress Level", "Weight", "Height", "Heart Rate", "Daily Steps", "Systolic BP", "Diastolic BP",
+                    "Sleep Disorder"]
+
+# The form's Physical Activity Level is a 1-10 scale; data.csv records minutes per day, about ten
+# per step of the scale (the mapping helper/synthetic_data.py uses)
+ACTIVITY_MINUTES_PER_STEP = 10
+
+TEST_SIZE = 0.15
+RANDOM_STATE = 42
+
+
+class BudgetExceeded(RuntimeError):
+    """The run used more CPU time than it was given."""
+
+
+# ------------- State and feedback --------------
+def load_state(path=RETRAIN_STATE) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'rows_pulled': 0, 'rows_trained': 0}
+
+
+def save_state(state: dict, path=RETRAIN_STATE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(state, f, indent=1, default=str)
+    os.replace(f"{path}.tmp", path)
+
+
+@contextmanager
+def exclusive(directory=RETRAIN_DIR):
+    """Held for the whole of a pull, a run or a rollback, so that two never overlap (across processes)."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError("Another retraining run is in progress") from None
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def feedback_rows(sheet: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rows of the "Sleep Data" worksheet in the FEEDBACK_COLUMNS schema.
+
+    The inputs are validated again (the worksheet can be edited by hand); rows the app would
+    reject, and rows without a known diagnosis, are left out. Physical Activity Level is converted
+    from the form's 1-10 scale to minutes per day, as in data.csv.
+    """
+    from helper.utils import UserDataCollector
+
+    raw = sheet.replace('', np.nan).assign(**{'Weight Unit': 'kg', 'Height Unit': 'm'})
+    # Worksheet cells may come back as text ('122.0'); what is not a number is reported as missing
+    for col in NUM_FEATURES + ['Weight', 'Height', 'Systolic BP', 'Diastolic BP']:
+        if col in raw.columns:
+            raw[col] = pd.to_numeric(raw[col], errors='coerce')
+    clean, invalid, errors = UserDataCollector().validate_frame(raw)
+
+    label = sheet.get('Correct_Diagnosis', pd.Series(index=sheet.index, dtype=object))
+    # The portal always saves a diagnosis; a missing one is the label 'None', read as NA by pandas
+    answered = sheet.get('Prediction_Correct', pd.Series(index=sheet.index, dtype=object)).isin(['Yes', 'No'])
+    label = label.where(label.notna() | ~answered, 'None')
+    label = label.astype(str).str.strip().replace(PORTAL_LABELS)
+    unlabelled = ~label.isin(LABELS)
+    keep = ~(invalid | unlabelled)
+    if not keep.all():
+        reasons = errors[invalid].str.split('; ').str[0].value_counts().to_dict()
+        logger.warning("Skipped %d of %d feedback rows (%d without a known diagnosis, invalid inputs: %s)",
+                       (~keep).sum(), len(sheet), (unlabelled & ~invalid).sum(), reasons)
+
+    rows = clean.loc[keep].copy()
+    rows['Physical Activity Level'] = rows['Physical Activity Level'] * ACTIVITY_MINUTES_PER_STEP
+    rows['Sleep Disorder'] = label[keep]
+    return rows.reindex(columns=FEEDBACK_COLUMNS)
+
+
+def pull_feedback(connection, state_path=RETRAIN_STATE, feedback_path=FEEDBACK_FILE) -> int:
+    """
+    Appends the rows added to the feedback worksheet since the previous pull to `feedback_path`.
+
+    Arguments:
+        connection : GSheetsConnection or LocalSheetsConnection
+
+    Returns:
+        the number of rows kept.
+    """
+    with exclusive():
+        sheet = connection.read(worksheet=FEEDBACK_WORKSHEET, ttl=0)
+        sheet = pd.DataFrame() if sheet is None else sheet.dropna(how='all').reset_index(drop=True)
+        state = load_state(state_path)
+        start = state.get('rows_pulled', 0)
+        if len(sheet) < start:
+            # The worksheet is append-only for the app; rows were deleted by hand
+            logger.warning("%r has %d rows but %d were already pulled; pulling the rows added from now on",
+                           FEEDBACK_WORKSHEET, len(sheet), start)
+            start = len(sheet)
+
+        rows = feedback_rows(sheet.iloc[start:]) if len(sheet) > start else pd.DataFrame(columns=FEEDBACK_COLUMNS)
+        if len(rows):
+            os.makedirs(os.path.dirname(feedback_path), exist_ok=True)
+            rows.to_csv(feedback_path, mode='a', header=not os.path.exists(feedback_path), index=False)
+
+        state['rows_pulled'] = len(sheet)
+        state['last_pull'] = {'at': _now(), 'sheet_rows': len(sheet), 'new_rows': len(sheet) - start,
+                              'kept': len(rows)}
+        save_state(state, state_path)
+        return len(rows)
+
+
+def load_feedback(path=FEEDBACK_FILE) -> pd.DataFrame:
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=FEEDBACK_COLUMNS)
+    # Same as data.csv: 'None' (no sleep disorder) stays a label
+    return pd.read_csv(path, na_values=[], keep_default_na=False)
+
+
+# ------------- Training --------------
+def model_features(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    The model's features (MODEL_FEATURES, categories as strings) of rows in the data.csv schema
+    or the feedback schema, through the app's own transformers.
+    """
+    from transformers import BMICategorizer, BPClassifier, FeatureCorrecter
+
+    X = frame.drop(columns=['Person ID', 'Sleep Disorder'], errors='ignore')
+    if 'BMI Category' in X.columns:
+        # data.csv uses both 'Normal' and 'Normal Weight' (see the notebook)
+        X['BMI Category'] = X['BMI Category'].replace('Normal', 'Normal Weight')
+    else:
+        X = BMICategorizer().transform(X)
+    return FeatureCorrecter().transform(BPClassifier().transform(X))
+
+
+def feedback_holdout(n_rows: int) -> np.ndarray:
+    """
+    Whether each feedback row, by its position in feedback.csv, is held out. A row's assignment
+    never changes once it is pulled, so no retrained model is trained on a held-out row.
+    """
+    draws = [int.from_bytes(hashlib.sha256(f"feedback-{i}".encode()).digest()[:8], 'big') for i in range(n_rows)]
+    return np.array(draws, dtype=np.float64) / 2.0 ** 64 < TEST_SIZE
+
+
+def split(data: pd.DataFrame, feedback: pd.DataFrame):
+    """
+    (X_train, X_test, y_train, y_test): data.csv split as in the notebook, and the feedback split
+    by `feedback_holdout`.
+    """
+    from sklearn.model_selection import train_test_split
+
+    train, test = train_test_split(data, stratify=data['Sleep Disorder'], test_size=TEST_SIZE,
+                                   random_state=RANDOM_STATE)
+    holdout = feedback_holdout(len(feedback))
+    trains, tests = [train, feedback[~holdout]], [test, feedback[holdout]]
+
+    def features(parts):
+        return pd.concat([model_features(part) for part in parts if len(part)], ignore_index=True)
+
+    def labels(parts):
+        return pd.concat([part['Sleep Disorder'] for part in parts if len(part)], ignore_index=True).astype(str)
+
+    return features(trains), features(tests), labels(trains), labels(tests)
+
+
+def fit_model(X: pd.DataFrame, y: pd.Series, template) -> dict:
+    """Fits new encoders, scaler and a clone of `template` (the deployed SVC) as in the notebook."""
+    from sklearn.base import clone
+    from sklearn.preprocessing import LabelEncoder
+    from helper.train import Preprocessor
+
+    preprocessor = Preprocessor(CAT_FEATURES)
+    X = preprocessor.fit_transform(X)
+    t_encoder = LabelEncoder()
+    y = t_encoder.fit_transform(y)
+    model = clone(template).fit(X, y)
+    return {'model': model, 't_encoder': t_encoder, 'f_encoder': preprocessor.encoders_,
+            'scaler': preprocessor.scaler_}
+
+
+def scaled_features(X: pd.DataFrame, objects: dict) -> np.ndarray:
+    X = X.copy()
+    for col, encoder in objects['f_encoder'].items():
+        X[col] = encoder.transform(X[[col]])
+    return objects['scaler'].transform(X)
+
+
+def macro_f1(X: pd.DataFrame, y: pd.Series, objects: dict) -> float:
+    from sklearn.metrics import f1_score
+
+    predicted = objects['t_encoder'].inverse_transform(objects['model'].predict(scaled_features(X, objects)))
+    return float(f1_score(y, predicted, average='macro'))
+
+
+def evaluation_metrics(objects: dict, X_train, y_train, X_test, y_test) -> dict:
+    """The notebook's models/model_evaluation.pkl for a retrained model."""
+    from sklearn import metrics
+
+    model, t_encoder = objects['model'], objects['t_encoder']
+    X_scaled_test = scaled_features(X_test, objects)
+    y_test, y_train = t_encoder.transform(y_test), t_encoder.transform(y_train)
+    y_test_preds = model.predict(X_scaled_test)
+    train_preds = model.predict(scaled_features(X_train, objects))
+    return {
+        'test_metrics': {
+            'f1_score': metrics.f1_score(y_test, y_test_preds, average="macro"),
+            'confusion_matrix': metrics.confusion_matrix(y_test, y_test_preds),
+            'classification_report': metrics.classification_report(y_test, y_test_preds, output_dict=True),
+            'X_test': X_scaled_test,
+            'y_test': y_test,
+            'y_pred': y_test_preds,
+            'feature_names': pd.Index(MODEL_FEATURES),
+            'class_names': t_encoder.inverse_transform(model.classes_),
+        },
+        'train_metrics': {
+            'f1_score': metrics.f1_score(y_train, train_preds, average="macro"),
+            'confusion_matrix': metrics.confusion_matrix(y_train, train_preds),
+            'classification_report': metrics.classification_report(y_train, train_preds, output_dict=True),
+        },
+    }
+
+
+def deployed_objects() -> dict:
+    """The deployed model, encoders and scaler, as unpickled sklearn objects."""
+    return {'model': registry.load(MODEL_FILE), 't_encoder': registry.load(TARGET_ENCODER),
+            'f_encoder': registry.load(FEATURE_ENCODER), 'scaler': registry.load(SCALER_FILE)}
+
+
+# ------------- History and promotion --------------
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+
+def history() -> list:
+    """The versions kept in the history, newest first, each with its info and whether it is deployed."""
+    entries = []
+    if os.path.isdir(MODEL_HISTORY_DIR):
+        deployed = model_version()
+        for name in os.listdir(MODEL_HISTORY_DIR):
+            try:
+                with open(os.path.join(MODEL_HISTORY_DIR, name, 'info.json')) as f:
+                    info = json.load(f)
+            except (OSError, ValueError):
+                continue  # incomplete: being written or left by a failed run
+            entries.append({**info, 'deployed': info['version'] == deployed})
+    return sorted(entries, key=lambda info: info['created'], reverse=True)
+
+
+def archive(source_dir, info: dict) -> str:
+    """Copies the model files in `source_dir` to the history (once per version). Returns the version."""
+    version = model_version(source_dir)
+    target = os.path.join(MODEL_HISTORY_DIR, version)
+    if not os.path.exists(os.path.join(target, 'info.json')):
+        os.makedirs(target, exist_ok=True)
+        for path in MODEL_FILES:
+            shutil.copyfile(os.path.join(source_dir, os.path.basename(path)), os.path.join(target, os.path.basename(path)))
+        with open(os.path.join(target, 'info.json'), 'w') as f:
+            json.dump({'version': version, 'created': _now(), **info}, f, indent=1)
+    return version
+
+
+def prune_history(keep: int = RETRAIN_HISTORY):
+    """Removes all but the `keep` newest versions besides the deployed one."""
+    previous = [info for info in history() if not info['deployed']]
+    for info in previous[keep:]:
+        shutil.rmtree(os.path.join(MODEL_HISTORY_DIR, info['version']), ignore_errors=True)
+
+
+def deploy(version: str):
+    """Swaps the files of a version of the history in, then re-exports the bundles."""
+    from helper.evaluation_bundle import build_bundle
+    from helper.model_bundle import export_bundle
+
+    source = os.path.join(MODEL_HISTORY_DIR, version)
+    swap_files({path: os.path.join(source, os.path.basename(path)) for path in MODEL_FILES})
+    # Until these are rebuilt, the registry serves the pickles and the evaluation page recomputes
+    for build in (export_bundle, build_bundle):
+        try:
+            build()
+        except Exception:
+            logger.warning("Could not rebuild with %s after deploying %s", build.__name__, version, exc_info=True)
+    registry.reload()
+
+
+def promote(objects: dict, evaluation: dict, info: dict) -> str:
+    """Saves a retrained model to the history, keeps the deployed one there too, and deploys it."""
+    archive(os.path.dirname(MODEL_FILE), {'origin': 'deployed before retraining'})
+
+    staging = os.path.join(MODEL_HISTORY_DIR, '.staging')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    files = dict(zip(MODEL_FILES, (objects['model'], objects['t_encoder'], objects['f_encoder'],
+                                   objects['scaler'], evaluation)))
+    for path, obj in files.items():
+        with open(os.path.join(staging, os.path.basename(path)), 'wb') as f:
+            pickle.dump(obj, f)
+    version = archive(staging, {'origin': 'retrained', **info})
+    shutil.rmtree(staging, ignore_errors=True)
+
+    deploy(version)
+    prune_history()
+    return version
+
+
+def rollback(version: str = None) -> str:
+    """
+    Deploys `version` from the history, by default the newest version other than the deployed one.
+
+    Returns:
+        the version deployed.
+    """
+    with exclusive():
+        candidates = [info['version'] for info in history() if not info['deployed']]
+        if version is None:
+            if not candidates:
+                raise ValueError("No previous model version in the history")
+            version = candidates[0]
+        elif version not in candidates:
+            raise ValueError(f"Version {version!r} is not in the history or is already deployed")
+        deploy(version)
+        state = load_state()
+        state['last_rollback'] = {'at': _now(), 'version': version}
+        save_state(state)
+        return version
+
+
+# ------------- Runs --------------
+def _check_budget(start: float, budget: float, stage: str):
+    used = time.process_time() - start
+    if used > budget:
+        raise BudgetExceeded(f"Used {used:.1f} s of CPU time ({stage}), over the budget of {budget:g} s")
+
+
+def retrain(force: bool = False, cpu_budget: float = RETRAIN_CPU_BUDGET, min_rows: int = RETRAIN_MIN_ROWS) -> dict:
+    """
+    Retrains on data.csv and the feedback pulled so far, and promotes the result if it is not worse.
+
+    Arguments:
+        force : bool
+            Retrain even if fewer than `min_rows` feedback rows were pulled since the last run.
+        cpu_budget : float
+            CPU seconds the run may use before anything is promoted; it is given up beyond that.
+
+    Returns:
+        the report of the run (also saved as 'last_run' in models/retrain/state.json), whose
+        'status' is 'skipped', 'promoted', 'rejected', 'over_budget' or 'failed'.
+    """
+    start = time.process_time()
+    report = {'started': _now(), 'status': 'failed', 'previous_version': model_version()}
+    with exclusive():
+        state = load_state()
+        try:
+            feedback = load_feedback()
+            new_rows = len(feedback) - state.get('rows_trained', 0)
+            report.update(feedback_rows=len(feedback), new_rows=new_rows)
+            if new_rows < min_rows and not force:
+                report.update(status='skipped', message=f"{new_rows} new feedback rows, {min_rows} needed")
+                return report
+
+            data = pd.read_csv(DATA_FILE, na_values=[], keep_default_na=False)
+            X_train, X_test, y_train, y_test = split(data, feedback)
+            report.update(train_rows=len(X_train), holdout_rows=len(X_test))
+            deployed = deployed_objects()
+            candidate = fit_model(X_train, y_train, deployed['model'])
+            _check_budget(start, cpu_budget, "after training")
+
+            report['deployed_f1'] = macro_f1(X_test, y_test, deployed)
+            report['candidate_f1'] = macro_f1(X_test, y_test, candidate)
+            evaluation = evaluation_metrics(candidate, X_train, y_train, X_test, y_test)
+            _check_budget(start, cpu_budget, "after evaluation")
+
+            state['rows_trained'] = len(feedback)
+            if report['candidate_f1'] < report['deployed_f1']:
+                report.update(status='rejected', message="Macro-F1 on the held-out rows would drop")
+                return report
+            info = {key: report[key] for key in ('feedback_rows', 'train_rows', 'holdout_rows', 'candidate_f1')}
+            report['version'] = promote(candidate, evaluation, info)
+            report.update(status='promoted', message=f"{report['previous_version']} -> {report['version']}")
+            return report
+        except BudgetExceeded as e:
+            report.update(status='over_budget', message=str(e))
+            return report
+        except Exception as e:
+            logger.exception("Retraining failed")
+            report['message'] = f"{type(e).__name__}: {e}"
+            return report
+        finally:
+            report.update(finished=_now(), cpu_s=round(time.process_time() - start, 3))
+            state['last_run'] = report
+            save_state(state)
+
+
+def limit_cpu(budget: float, margin: float = 30.0):
+    """
+    Makes the kernel stop this process once it has used `budget` more CPU seconds (plus `margin`
+    for a promotion already under way), and lowers its priority below the app's. Only for a
+    process of its own: the limit applies to every thread of the process.
+    """
+    def over_budget(signum, frame):
+        raise BudgetExceeded(f"Stopped by the kernel after the CPU budget of {budget:g} s")
+
+    soft = int(time.process_time() + budget + margin) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    # SIGXCPU at the soft limit, SIGKILL at the hard one
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 10 if hard == resource.RLIM_INFINITY else hard))
+    signal.signal(signal.SIGXCPU, over_budget)
+    os.nice(10)
+
+
+class RetrainJob:
+    """
+    Pulls the feedback and retrains in the background: once (`trigger`) or periodically (`schedule`).
+
+    The training runs as `python -m helper.retrain --no-pull` in a child process.
+
+    Arguments:
+        connection_factory : callable, optional
+            Returns the Google Sheets connection to pull from; the app's by default.
+        cpu_budget : float
+    """
+
+    def __init__(self, connection_factory=None, cpu_budget: float = RETRAIN_CPU_BUDGET):
+        self.connection_factory = connection_factory
+        self.cpu_budget = cpu_budget
+        self._lock = threading.Lock()
+        self._running = False
+        self._wake = threading.Event()
+        self._scheduler = None
+        self.interval = None
+        self.error = None
+
+    def _connection(self):
+        if self.connection_factory is not None:
+            return self.connection_factory()
+        from helper.forms import get_connection
+        return get_connection()
+
+    def run(self, force: bool = False) -> dict:
+        """Pulls, then retrains in a child process. Returns the report of the run."""
+        self.error = None
+        try:
+            pull_feedback(self._connection())
+            command = [sys.executable, '-m', 'helper.retrain', '--no-pull', '--cpu-budget', str(self.cpu_budget)]
+            result = subprocess.run(command + (['--force'] if force else []), cwd=ROOT_DIR,
+                                    capture_output=True, text=True)
+            # 1 is a failed run, reported in the state like any other; anything else is a crash
+            if result.returncode not in (0, 1):
+                raise RuntimeError(f"Retraining exited with status {result.returncode}: {result.stderr[-2000:]}")
+        except Exception as e:
+            logger.exception("Retraining job failed")
+            self.error = f"{type(e).__name__}: {e}"
+        # The child's report, or the previous one if it never got to write it
+        registry.reload()
+        return load_state().get('last_run', {})
+
+    def trigger(self, force: bool = False) -> bool:
+        """Starts a run on a background thread. Returns False if one is already running."""
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+
+        def target():
+            try:
+                self.run(force)
+            finally:
+                with self._lock:
+                    self._running = False
+
+        threading.Thread(target=target, name="retrain", daemon=True).start()
+        return True
+
+    def schedule(self, interval: float = RETRAIN_INTERVAL):
+        """Runs every `interval` seconds from now on (the first run after one interval)."""
+        self.interval = interval
+        with self._lock:
+            if self._scheduler is not None and self._scheduler.is_alive():
+                self._wake.set()  # picks up the new interval
+                return
+
+            def loop():
+                while self.interval is not None:
+                    self._wake.clear()
+                    if not self._wake.wait(self.interval) and self.interval is not None:
+                        self.trigger()
+
+            self._scheduler = threading.Thread(target=loop, name="retrain-scheduler", daemon=True)
+            self._scheduler.start()
+
+    def unschedule(self):
+        self.interval = None
+        self._wake.set()
+
+    def status(self) -> dict:
+        state = load_state()
+        return {
+            'running': self._running,
+            'scheduled_every_s': self.interval,
+            'error': self.error,
+            'deployed_version': model_version(),
+            'rows_pulled': state.get('rows_pulled', 0),
+            'last_pull': state.get('last_pull'),
+            'last_run': state.get('last_run'),
+            'last_rollback': state.get('last_rollback'),
+        }
+
+
+# Shared by every Streamlit session in the process
+retrain_job = RetrainJob()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain the model from the clinicians' evaluations.")
+    parser.add_argument("--force", action="store_true", help=f"Retrain even with fewer than {RETRAIN_MIN_ROWS} new rows")
+    parser.add_argument("--cpu-budget", type=float, default=RETRAIN_CPU_BUDGET, help="CPU seconds for the run")
+    parser.add_argument("--sheets", help="Pull from the CSV worksheets in this directory (LocalSheetsConnection) "
+                                         "instead of Google Sheets")
+    parser.add_argument("--no-pull", action="store_true", help="Only train on the feedback already pulled")
+    parser.add_argument("--history", action="store_true", help="List the model versions kept for rollback")
+    parser.add_argument("--rollback", nargs="?", const="", metavar="VERSION",
+                        help="Deploy VERSION from the history (default: the previous one)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    if args.history:
+        for info in history():
+            f1 = f"{info['candidate_f1']:.4f}" if 'candidate_f1' in info else "-"
+            print(f"{info['version']}  {info['created']}  F1 {f1:>6}  {'deployed' if info['deployed'] else '':<8}  "
+                  f"{info['origin']}")
+        return 0
+    if args.rollback is not None:
+        print(f"Deployed {rollback(args.rollback or None)}")
+        return 0
+
+    limit_cpu(args.cpu_budget)
+    if not args.no_pull:
+        if args.sheets:
+            from helper.sheet_writer import LocalSheetsConnection
+            connection = LocalSheetsConnection(args.sheets)
+        else:
+            from helper.forms import get_connection
+            connection = get_connection()
+        print(f"Pulled {pull_feedback(connection)} new feedback rows")
+
+    report = retrain(force=args.force, cpu_budget=args.cpu_budget)
+    print(json.dumps(report, indent=1))
+    return 0 if report['status'] in ('promoted', 'skipped', 'rejected') else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+Scoring for the probability SVC: predicted labels and class probabilities from one kernel pass.
+
+`model.predict` followed by `model.predict_proba` evaluates the kernel against every support
+vector twice. `SVCScorer` calls `decision_function` once and derives both from its one-vs-one
+decision values, the way libsvm does internally:
+
+- the label is the one-vs-one vote, exactly as `predict`;
+- the probabilities are the Platt-scaled pairwise probabilities combined by pairwise coupling,
+  exactly as `predict_proba`.
+
+`ApproximateSVCScorer` replaces the kernel evaluation itself with a precomputed low-rank
+(Nystroem) feature map for large batches. It is only built if its labels agree with the exact
+model on data/data.csv at least as often as the configured threshold.
+"""
+
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+
+from config import DATA_FILE, FAST_SCORING_COMPONENTS, FAST_SCORING_MIN_AGREEMENT
+from helper.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# libsvm clips pairwise probabilities to [MIN_PROB, 1 - MIN_PROB] before coupling them
+MIN_PROB = 1e-7
+
+# Batches up to this many rows are scored row by row in plain Python
+SMALL_BATCH = 16
+
+
+class SVCScorer:
+    """
+    Exact single-pass scoring of a fitted `SVC(probability=True, decision_function_shape='ovo')`.
+
+    Arguments:
+        model : SVC
+            The fitted model.
+    """
+    STAGE = 'model.score'  # name of `score` in helper/metrics.py
+
+    def __init__(self, model):
+        if not getattr(model, "probability", False):
+            raise ValueError("The model was not trained with probability=True")
+        if len(model.classes_) > 2 and model.decision_function_shape != "ovo":
+            raise ValueError("Single-pass scoring needs decision_function_shape='ovo'")
+
+        self.model = model
+        self.classes_ = model.classes_
+        self.n_classes = len(model.classes_)
+        # Class pairs in libsvm order: (0, 1), (0, 2), ..., (1, 2), ...
+        self.pairs = [(i, j) for i in range(self.n_classes) for j in range(i + 1, self.n_classes)]
+        self.probA = model.probA_
+        self.probB = model.probB_
+
+    def decision_values(self, X) -> np.ndarray:
+        """One-vs-one decision values with libsvm's sign, shape (n_samples, n_pairs)."""
+        dec = self.model.decision_function(X)
+        if self.n_classes == 2:
+            # sklearn flips the sign of binary decision values
+            return -dec.reshape(-1, 1)
+        return dec
+
+    def votes(self, dec: np.ndarray) -> np.ndarray:
+        """Index of the winning class of the one-vs-one vote (ties go to the lower index)."""
+        votes = np.zeros((len(dec), self.n_classes), dtype=np.int64)
+        rows = np.arange(len(dec))
+        for k, (i, j) in enumerate(self.pairs):
+            votes[rows, np.where(dec[:, k] > 0, i, j)] += 1
+        return votes.argmax(axis=1)
+
+    def probabilities(self, dec: np.ndarray) -> np.ndarray:
+        """Class probabilities from the decision values (Platt scaling + pairwise coupling)."""
+        n, k = len(dec), self.n_classes
+        fApB = dec * self.probA + self.probB
+        # Numerically stable sigmoid, as in libsvm's sigmoid_predict
+        with np.errstate(over="ignore"):
+            pairwise = np.where(fApB >= 0, np.exp(-fApB) / (1.0 + np.exp(-fApB)), 1.0 / (1.0 + np.exp(fApB)))
+        pairwise = np.clip(pairwise, MIN_PROB, 1 - MIN_PROB)
+
+        r = np.zeros((k, k, n))  # r[i][j] = P(class i | class i or j)
+        for p, (i, j) in enumerate(self.pairs):
+            r[i, j] = pairwise[:, p]
+            r[j, i] = 1 - pairwise[:, p]
+
+        if k == 2:
+            return np.column_stack([r[0, 1], r[1, 0]])
+        return self._couple(r)
+
+    def _score_row(self, dec: list) -> tuple[int, list]:
+        """`votes` and `probabilities` for a single row, on Python floats."""
+        k = self.n_classes
+        votes = [0] * k
+        r = [[0.0] * k for _ in range(k)]
+        for p, (i, j) in enumerate(self.pairs):
+            votes[i if dec[p] > 0 else j] += 1
+            fApB = dec[p] * self.probA[p] + self.probB[p]
+            prob = math.exp(-fApB) / (1.0 + math.exp(-fApB)) if fApB >= 0 else 1.0 / (1.0 + math.exp(fApB))
+            r[i][j] = min(max(prob, MIN_PROB), 1 - MIN_PROB)
+            r[j][i] = 1 - r[i][j]
+        label = votes.index(max(votes))
+        if k == 2:
+            return label, [r[0][1], r[1][0]]
+        return label, self._couple_row(r)
+
+    @staticmethod
+    def _couple_row(r: list) -> list:
+        """`_couple` for a single row, on Python floats."""
+        k = len(r)
+        Q = [[0.0] * k for _ in range(k)]
+        for t in range(k):
+            for j in range(t):
+                Q[t][t] += r[j][t] * r[j][t]
+                Q[t][j] = Q[j][t]
+            for j in range(t + 1, k):
+                Q[t][t] += r[j][t] * r[j][t]
+                Q[t][j] = -r[j][t] * r[t][j]
+
+        p = [1.0 / k] * k
+        Qp = [0.0] * k
+        eps = 0.005 / k
+        for _ in range(max(100, k)):
+            pQp = 0.0
+            for t in range(k):
+                Qp[t] = 0.0
+                for j in range(k):
+                    Qp[t] += Q[t][j] * p[j]
+                pQp += p[t] * Qp[t]
+            if max(abs(Qp[t] - pQp) for t in range(k)) < eps:
+                break
+            for t in range(k):
+                diff = (-Qp[t] + pQp) / Q[t][t]
+                p[t] += diff
+                pQp = (pQp + diff * (diff * Q[t][t] + 2 * Qp[t])) / (1 + diff) / (1 + diff)
+                for j in range(k):
+                    Qp[j] = (Qp[j] + diff * Q[t][j]) / (1 + diff)
+                    p[j] /= (1 + diff)
+        return p
+
+    @staticmethod
+    def _couple(r: np.ndarray) -> np.ndarray:
+        """
+        libsvm's `multiclass_probability` (Wu, Lin and Weng, method 2), run on every row at once.
+
+        Rows stop being updated as soon as they converge, so each row goes through the same
+        iterations (and the same floating-point operations) as in libsvm.
+        """
+        k, n = r.shape[0], r.shape[2]
+        Q = np.zeros((k, k, n))
+        for t in range(k):
+            for j in range(t):
+                Q[t, t] += r[j, t] * r[j, t]
+                Q[t, j] = Q[j, t]
+            for j in range(t + 1, k):
+                Q[t, t] += r[j, t] * r[j, t]
+                Q[t, j] = -r[j, t] * r[t, j]
+
+        p = np.full((k, n), 1.0 / k)
+        Qp = np.zeros((k, n))
+        eps = 0.005 / k
+        active = np.ones(n, dtype=bool)
+
+        for _ in range(max(100, k)):
+            pQp = np.zeros(n)
+            for t in range(k):
+                Qp[t] = 0
+                for j in range(k):
+                    Qp[t] += Q[t, j] * p[j]
+                pQp += p[t] * Qp[t]
+            max_error = np.abs(Qp - pQp).max(axis=0)
+            active &= max_error >= eps
+            if not active.any():
+                break
+
+            for t in range(k):
+                diff = np.where(active, (-Qp[t] + pQp) / Q[t, t], 0.0)
+                p[t] += diff
+                pQp = (pQp + diff * (diff * Q[t, t] + 2 * Qp[t])) / (1 + diff) / (1 + diff)
+                for j in range(k):
+                    Qp[j] = (Qp[j] + diff * Q[t, j]) / (1 + diff)
+                    p[j] /= (1 + diff)
+        return p.T
+
+    def score(self, X) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Scores `X` (the output of the preprocessing pipeline) with one kernel evaluation.
+
+        Returns:
+            (predicted classes as in `model.predict`, probabilities as in `model.predict_proba`)
+        """
+        with metrics.timer(self.STAGE, len(X)):
+            dec = self.decision_values(X)
+            if len(dec) <= SMALL_BATCH:
+                # Python floats beat numpy's per-call overhead on a handful of rows (e.g. the app pages)
+                labels, proba = zip(*(self._score_row(row) for row in dec.tolist())) if len(dec) else ((), ())
+                return self.classes_[list(labels)], np.array(proba, dtype=float).reshape(len(dec), self.n_classes)
+            return self.classes_[self.votes(dec)], self.probabilities(dec)
+
+
+class ApproximateSVCScorer(SVCScorer):
+    """
+    Approximate scoring through a Nystroem feature map of the model's kernel.
+
+    The map is fitted on `n_components` of the support vectors, and the dual coefficients are
+    folded into it once, so scoring a row costs `n_components` kernel evaluations instead of
+    one per support vector. Build it with `build_fast_scorer`, which checks its agreement first.
+
+    Arguments:
+        model : SVC
+            The fitted model.
+        n_components : int
+            Rank of the approximation (number of landmark support vectors).
+        random_state : int
+            Seed for the choice of landmarks.
+    """
+    STAGE = 'model.score_approximate'
+
+    def __init__(self, model, n_components: int = FAST_SCORING_COMPONENTS, random_state: int = 42):
+        # Only the --fast batch path needs it
+        from sklearn.kernel_approximation import Nystroem
+
+        super().__init__(model)
+        if model.kernel not in ("rbf", "poly", "sigmoid", "linear"):
+            raise ValueError(f"Cannot approximate kernel {model.kernel!r}")
+
+        sv = model.support_vectors_
+        self.kernel, self.gamma, self.degree, self.coef0 = model.kernel, model._gamma, model.degree, model.coef0
+        self.feature_map = Nystroem(kernel=model.kernel, gamma=model._gamma, degree=model.degree,
+                                    coef0=model.coef0, n_components=min(n_components, len(sv)),
+                                    random_state=random_state).fit(sv)
+        self.landmarks = self.feature_map.components_
+        self.landmarks_sq = (self.landmarks ** 2).sum(axis=1)
+
+        # Pairwise dual coefficients, shape (n_support_vectors, n_pairs), as in libsvm
+        starts = np.concatenate([[0], np.cumsum(model.n_support_)])
+        coef = np.zeros((len(sv), len(self.pairs)))
+        for p, (i, j) in enumerate(self.pairs):
+            coef[starts[i]:starts[i + 1], p] = model.dual_coef_[j - 1, starts[i]:starts[i + 1]]
+            coef[starts[j]:starts[j + 1], p] = model.dual_coef_[i, starts[j]:starts[j + 1]]
+
+        # K(X, sv) @ coef ~ phi(X) @ phi(sv).T @ coef, with phi(X) = K(X, landmarks) @ normalization.T
+        self.weights = self.feature_map.normalization_.T @ self.feature_map.transform(sv).T @ coef
+        self.intercept = model.intercept_
+        if self.n_classes == 2:
+            # Stored with sklearn's sign for binary models
+            self.weights, self.intercept = -self.weights, -self.intercept
+
+    def _kernel(self, X: np.ndarray) -> np.ndarray:
+        """K(X, landmarks) with libsvm's kernel definitions, as BLAS products."""
+        K = X @ self.landmarks.T
+        if self.kernel == "linear":
+            return K
+        if self.kernel == "rbf":
+            K *= -2
+            K += (X ** 2).sum(axis=1)[:, None]
+            K += self.landmarks_sq
+            K *= -self.gamma
+            return np.exp(K, out=K)
+        K *= self.gamma
+        K += self.coef0
+        if self.kernel == "sigmoid":
+            return np.tanh(K, out=K)
+        # Repeated products: much faster than a float power for small integer degrees
+        base = K.copy()
+        for _ in range(int(self.degree) - 1):
+            K *= base
+        return K
+
+    def decision_values(self, X) -> np.ndarray:
+        return self._kernel(np.asarray(X, dtype=float)) @ self.weights + self.intercept
+
+    def agreement(self, X, exact: SVCScorer = None) -> float:
+        """Share of the rows of `X` whose approximate label equals the exact one."""
+        exact = exact or SVCScorer(self.model)
+        return float((self.score(X)[0] == exact.score(X)[0]).mean())
+
+
+def reference_features(artifacts) -> np.ndarray:
+    """data/data.csv through the preprocessing pipeline, for the agreement check."""
+    data = pd.read_csv(DATA_FILE, na_values=[], keep_default_na=False)
+    # data.csv uses both 'Normal' and 'Normal Weight' (see the notebook)
+    data["BMI Category"] = data["BMI Category"].replace("Normal", "Normal Weight")
+    return artifacts.compiled_pipeline.transform(data.drop(columns=["Person ID", "Sleep Disorder"]))
+
+
+def build_fast_scorer(artifacts, min_agreement: float = FAST_SCORING_MIN_AGREEMENT,
+                      n_components: int = FAST_SCORING_COMPONENTS) -> ApproximateSVCScorer:
+    """
+    Builds an `ApproximateSVCScorer` for `artifacts.model`, checking it on data/data.csv first.
+
+    Raises:
+        ValueError if its labels agree with the exact model on fewer than `min_agreement` of the rows.
+    """
+    scorer = ApproximateSVCScorer(artifacts.model, n_components=n_components)
+    agreement = scorer.agreement(reference_features(artifacts), artifacts.scorer)
+    if agreement < min_agreement:
+        raise ValueError(f"Approximate scoring agrees with the model on {agreement:.2%} of data.csv, "
+                         f"below the required {min_agreement:.2%}; use exact scoring or more components")
+    logger.info("Approximate scoring enabled: %d components, %.2f%% agreement on data.csv",
+                scorer.feature_map.n_components, agreement * 100)
+    scorer.agreement_ = agreement
+    return scorer
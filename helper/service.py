@@ -0,0 +1,293 @@
+"""
+HTTP JSON inference service, for integrations that cannot go through the Streamlit pages.
+
+Endpoints:
+    GET  /health          the worker is up; reports whether its model is loaded
+    GET  /ready           200 once the model is loaded, 503 before
+    GET  /metrics         per-stage timings of this worker in the Prometheus text format
+    POST /predict         one form record, as accepted by `UserDataCollector.validate`
+                          -> {"prediction", "confidence", "probabilities", "error", "model_version"}
+    POST /predict/batch   {"records": [...]} (or a bare list) of form records or data.csv rows
+                          -> {"model_version", "predictions": [{"prediction", "confidence",
+                              "probabilities", "error"}, ...]} in the order of the records
+
+Records go through the same code as the app: `validate` and the shared, cached `predict` for
+single records, `validate_frame` and the batch scorer (`helper.batch_score.score_chunk`) for
+batches. Invalid input is answered with 400 and the validation message.
+
+Every worker loads the artifacts once, through the process-wide registry (which also picks up
+retrained models). With --workers N the listening socket is opened first and N worker processes
+are forked to serve it (Unix only); each loads its own snapshot, and the memory-mapped model
+bundle is shared between them by the OS.
+
+Usage (from the project root):
+    python -m helper.service [--host 127.0.0.1] [--port 8000] [--workers 4]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+# Setting directory to be parent root directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import SERVICE_HOST, SERVICE_MAX_BATCH, SERVICE_MAX_BODY, SERVICE_PORT
+from helper.artifacts import registry
+from helper.batch_score import score_chunk
+from helper.metrics import metrics
+from helper.predictor import predict
+from helper.utils import UserDataCollector
+
+logger = logging.getLogger(__name__)
+
+
+class RequestError(Exception):
+    """A request that cannot be served, with the HTTP status to answer it with."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ModelState:
+    """Loads the artifacts of this worker in the background, so /health answers straight away."""
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.error = None
+
+    def load(self):
+        try:
+            artifacts = registry.artifacts()
+            logger.info("Worker %d loaded model %s (%s)", os.getpid(), artifacts.version, artifacts.source)
+            self.ready.set()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception("Worker %d could not load the model", os.getpid())
+
+    def start(self):
+        threading.Thread(target=self.load, name="model-loader", daemon=True).start()
+
+    def artifacts(self):
+        if not self.ready.is_set():
+            raise RequestError(503, self.error or "The model is still loading")
+        return registry.artifacts()
+
+
+def _json_value(value):
+    """NaN (e.g. the confidence of an invalid row) is not valid JSON."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _prediction(label, confidence, probabilities, error=None) -> dict:
+    """One prediction as both /predict and /predict/batch return it, rounded like the batch scorer."""
+    return {
+        'prediction': label,
+        'confidence': _json_value(round(confidence, 6)),
+        'probabilities': None if probabilities is None else {name: round(p, 6) for name, p in probabilities.items()},
+        'error': error,
+    }
+
+
+def predict_one(record, artifacts) -> dict:
+    if not isinstance(record, dict):
+        raise RequestError(400, "Expected a JSON object with the fields of one patient")
+    try:
+        validated = UserDataCollector().validate(record)
+    except ValueError as e:
+        raise RequestError(400, str(e))
+    label, confidence, probabilities = predict(validated, artifacts, probabilities=True)
+    return {**_prediction(label, confidence, probabilities), 'model_version': artifacts.version}
+
+
+def predict_batch(body, artifacts) -> dict:
+    records = body.get('records') if isinstance(body, dict) else body
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise RequestError(400, 'Expected {"records": [...]} with one JSON object per patient')
+    if len(records) > SERVICE_MAX_BATCH:
+        raise RequestError(413, f"At most {SERVICE_MAX_BATCH} records per batch")
+    if not records:
+        return {'model_version': artifacts.version, 'predictions': []}
+
+    try:
+        result = score_chunk(pd.DataFrame.from_records(records), artifacts)
+    except (KeyError, ValueError) as e:
+        # Records without "Weight" are read as data.csv rows, which must have every column
+        raise RequestError(400, f"{e} (send form records, or data.csv rows with every column)")
+    classes = [col for col in result.columns if col.startswith('P(')]
+    predictions = [
+        _prediction(row['Prediction'], row['Confidence'],
+                    None if row['Error'] else {col[2:-1]: row[col] for col in classes}, row['Error'] or None)
+        for row in result.to_dict('records')
+    ]
+    return {'model_version': artifacts.version, 'predictions': predictions}
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients do not reconnect for every request
+    server_version = "SleepDisorderService/1.0"
+    # Headers and body are two writes: without TCP_NODELAY, Nagle's algorithm holds the body
+    # back until the client's delayed ACK (~40 ms per request)
+    disable_nagle_algorithm = True
+
+    def _send(self, status: int, body: dict):
+        self._send_bytes(status, json.dumps(body).encode(), "application/json")
+
+    def _send_bytes(self, status: int, payload: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > SERVICE_MAX_BODY:
+            self.close_connection = True  # the body is left unread
+            raise RequestError(413, f"Request body over {SERVICE_MAX_BODY} bytes")
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            raise RequestError(400, "Request body is not valid JSON")
+
+    def _handle(self, route):
+        try:
+            self._send(200, route())
+        except RequestError as e:
+            self._send(e.status, {'error': str(e)})
+        except Exception:
+            logger.exception("Error while serving %s", self.path)
+            self._send(500, {'error': "Internal error"})
+
+    def do_GET(self):
+        state = self.server.state
+        if self.path == "/health":
+            self._send(200, {'status': 'ok', 'model_loaded': state.ready.is_set(), 'pid': os.getpid()})
+        elif self.path == "/ready":
+            if state.ready.is_set():
+                artifacts = registry.artifacts()
+                self._send(200, {'ready': True, 'model_version': artifacts.version, 'source': artifacts.source})
+            else:
+                self._send(503, {'ready': False, 'error': state.error})
+        elif self.path == "/metrics":
+            # Metrics are per process: with --workers, a scrape gets the worker that accepted it
+            self._send_bytes(200, metrics.prometheus().encode(), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send(404, {'error': f"No route for GET {self.path}"})
+
+    def do_POST(self):
+        state = self.server.state
+        if self.path == "/predict":
+            self._handle(lambda: predict_one(self._read_json(), state.artifacts()))
+        elif self.path == "/predict/batch":
+            self._handle(lambda: predict_batch(self._read_json(), state.artifacts()))
+        else:
+            # The body must still be consumed to keep the connection usable
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self._send(404, {'error': f"No route for POST {self.path}"})
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; socketserver's default of 5 drops bursts of connections
+
+    def handle_error(self, request, client_address):
+        # A client closing its keep-alive connection is not an error
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            logger.debug("Connection from %s closed by the client", client_address)
+        else:
+            logger.exception("Error while serving %s", client_address)
+
+
+def run_worker(server: InferenceServer):
+    """Loads the model and serves requests on `server` until interrupted."""
+    server.state = ModelState()
+    server.state.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT, workers: int = 1):
+    """
+    Serves on (host, port) with `workers` processes.
+
+    The socket is bound before forking, so all the workers accept connections from it.
+    """
+    server = InferenceServer((host, port), InferenceHandler)
+    logger.info("Serving on http://%s:%d with %d worker(s)", host, server.server_port, workers)
+    if workers <= 1:
+        return run_worker(server)
+    if not hasattr(os, "fork"):
+        raise RuntimeError("--workers needs a platform with fork(); run one process per port instead")
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                run_worker(server)
+            finally:
+                os._exit(0)
+        return pid
+
+    children = {spawn() for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except KeyboardInterrupt:
+                stop(signal.SIGINT, None)
+                continue
+            children.discard(pid)
+            if not stopping:
+                logger.warning("Worker %d exited (status %d); starting a new one", pid, status)
+                children.add(spawn())
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (forked, Unix only)")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""
+Append-only writer for the Google Sheets worksheets used by the app.
+
+`update_or_create_sheet` used to read the whole worksheet, add one row and write everything
+back, so every submission cost O(rows already stored) and concurrent submissions could
+overwrite each other. `SheetWriter` appends instead:
+
+1. each submission is first written to a local outbox (a JSON-lines write-ahead log,
+   fsync'ed), so it survives a crash or an unreachable Google Sheets. The outbox is shared by
+   every process of the app: writes to it hold a file lock, and a flush sends every row in it
+   and keeps the rows other processes added meanwhile;
+2. queued rows are then flushed in batches with one append call per worksheet, whose cost
+   does not depend on the size of the sheet.
+
+`BackgroundSheetWriter` does the flushing on a worker thread, so the Streamlit script thread
+only pays for putting the row on a queue.
+
+`LocalSheetsConnection` is a file-backed stand-in for `GSheetsConnection` (one CSV per
+worksheet) so the writer can be used and tested offline.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import OUTBOX_FILE
+from helper.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSheetsConnection:
+    """
+    File-backed stand-in for `GSheetsConnection`: each worksheet is a CSV file in `directory`.
+
+    Supports the calls the app makes (`read`, `update`, `create`) plus a native `append`.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, worksheet):
+        return self.directory / f"{worksheet}.csv"
+
+    def read(self, worksheet, **kwargs):
+        path = self._path(worksheet)
+        if not path.exists():
+            return None
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+    def update(self, worksheet, data, **kwargs):
+        with self._lock:
+            pd.DataFrame(data).to_csv(self._path(worksheet), index=False)
+        return data
+
+    create = update
+
+    def append(self, worksheet, data, **kwargs):
+        """Appends rows, adding any new columns to the header. Cost is O(new rows) unless the header grows."""
+        data = pd.DataFrame(data)
+        path = self._path(worksheet)
+        with self._lock:
+            if not path.exists():
+                data.to_csv(path, index=False)
+                return data
+            header = list(pd.read_csv(path, nrows=0).columns)
+            new_columns = [col for col in data.columns if col not in header]
+            if new_columns:
+                # Rare: rewrite once with the wider header
+                existing = pd.read_csv(path, dtype=str, keep_default_na=False)
+                pd.concat([existing, data], ignore_index=True).to_csv(path, index=False)
+            else:
+                data.reindex(columns=header).to_csv(path, mode="a", header=False, index=False)
+        return data
+
+
+def _to_cell(value):
+    """Converts a value to something both JSON and Google Sheets accept."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)  # datetimes and anything else
+
+
+class SheetWriter:
+    """
+    Durable, batched appends to worksheets.
+
+    Arguments:
+        conn : GSheetsConnection or LocalSheetsConnection
+            Where rows end up.
+        outbox : path
+            Write-ahead log holding the rows not yet appended (shared by the app's processes).
+        batch_size : int
+            Number of queued rows that triggers a flush on `append`. 1 flushes every submission.
+        spreadsheet : gspread.Spreadsheet or callable, optional
+            The spreadsheet behind `conn`, or a function opening it (called on the first flush).
+            Needed when `conn` has no `append` (a `GSheetsConnection`).
+    """
+
+    def __init__(self, conn, outbox=OUTBOX_FILE, batch_size: int = 1, spreadsheet=None):
+        self.conn = conn
+        self.outbox = Path(outbox)
+        self.outbox.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.spreadsheet = spreadsheet
+        self._lock = threading.RLock()
+        self._headers = {}  # worksheet -> header row, to avoid re-reading it on every flush
+        with self._locked():
+            self._pending = len(self._read_outbox()[0])
+
+    @contextmanager
+    def _locked(self, suffix=".lock"):
+        # Held across processes: ".lock" for any change to the outbox, ".flush.lock" for a whole
+        # flush, so that two processes never send the same rows
+        with open(self.outbox.with_name(self.outbox.name + suffix), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_outbox(self, offset: int = 0):
+        """(entries from byte `offset` on, size of the file). Call with the outbox lock held."""
+        if not self.outbox.exists():
+            return [], 0
+        entries = []
+        with open(self.outbox, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write; everything before it is intact
+                    logger.warning("Skipping unreadable outbox line: %r", line)
+            return entries, f.tell()
+
+    def _rewrite_outbox(self, entries):
+        tmp = self.outbox.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.outbox)
+
+    @property
+    def pending(self) -> int:
+        """Number of rows waiting in the outbox, as of this writer's last read or write of it."""
+        return self._pending
+
+    def enqueue(self, worksheet: str, data) -> int:
+        """
+        Durably queues `data` (a dict or a DataFrame) for `worksheet`, without contacting the sheet.
+
+        Returns:
+            number of rows now pending.
+        """
+        frame = pd.DataFrame([data]) if isinstance(data, dict) else pd.DataFrame(data)
+        entries = [{"worksheet": worksheet, "row": {str(k): _to_cell(v) for k, v in row.items()}}
+                   for row in frame.to_dict("records")]
+        with self._lock, self._locked():
+            with open(self.outbox, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending += len(entries)
+            return self._pending
+
+    def append(self, worksheet: str, data) -> bool:
+        """
+        Queues `data` and flushes once `batch_size` rows are pending.
+
+        Returns:
+            True if nothing is left pending, False if rows are still waiting in the outbox.
+        """
+        if self.enqueue(worksheet, data) >= self.batch_size:
+            return self.flush()
+        return False
+
+    def flush(self) -> bool:
+        """
+        Appends every row of the outbox (whichever process queued it), one call per worksheet,
+        and removes them from the outbox.
+
+        Worksheets that fail keep their rows queued for the next flush, and rows queued while
+        the flush runs stay in the outbox.
+
+        Returns:
+            True if everything was written.
+        """
+        with self._lock, self._locked(".flush.lock"):
+            with self._locked():
+                pending, offset = self._read_outbox()
+            if not pending:
+                self._pending = 0
+                return True
+
+            by_sheet = {}
+            for entry in pending:
+                by_sheet.setdefault(entry["worksheet"], []).append(entry)
+
+            failed = []
+            for worksheet, entries in by_sheet.items():
+                try:
+                    self._append_rows(worksheet, [entry["row"] for entry in entries])
+                except Exception:
+                    logger.warning("Could not append %d rows to %r; keeping them queued",
+                                   len(entries), worksheet, exc_info=True)
+                    failed.extend(entries)
+
+            with self._locked():
+                queued = self._read_outbox(offset)[0]
+                self._rewrite_outbox(failed + queued)
+                self._pending = len(failed) + len(queued)
+            return not failed
+
+    def _append_rows(self, worksheet, rows):
+        frame = pd.DataFrame(rows)
+        if hasattr(self.conn, "append"):
+            self.conn.append(worksheet=worksheet, data=frame)
+        else:
+            self._append_gspread(worksheet, frame)
+
+    def _append_gspread(self, worksheet, frame):
+        """Appends through the gspread worksheet behind a `GSheetsConnection`."""
+        from gspread.exceptions import WorksheetNotFound
+
+        if self.spreadsheet is None:
+            raise ValueError("A spreadsheet is needed to append through a connection without `append`")
+        if callable(self.spreadsheet):
+            self.spreadsheet = self.spreadsheet()
+        try:
+            sheet = self.spreadsheet.worksheet(worksheet)
+        except WorksheetNotFound:
+            # First row ever for this worksheet: create it with the header and the rows
+            self.conn.create(worksheet=worksheet, data=frame)
+            self._headers[worksheet] = list(frame.columns)
+            return
+
+        header = self._headers.get(worksheet)
+        if header is None:
+            header = sheet.row_values(1)
+        new_columns = [col for col in frame.columns if col not in header]
+        if new_columns or not header:
+            header = header + new_columns
+            if len(header) > sheet.col_count:
+                sheet.add_cols(len(header) - sheet.col_count)
+            sheet.update(range_name="A1", values=[header])
+        self._headers[worksheet] = header
+
+        values = frame.reindex(columns=header).fillna("").values.tolist()
+        sheet.append_rows(values, value_input_option="USER_ENTERED")
+
+
+class BackgroundSheetWriter:
+    """
+    Runs a `SheetWriter` on a background thread so submitting a row never waits on Google Sheets.
+
+    `submit` only puts the row on a bounded in-memory queue. The worker moves queued rows into
+    the outbox and flushes them, retrying failed flushes with exponential backoff. When the
+    queue is full, rows go straight to the outbox (a local write) instead of being dropped.
+    On interpreter shutdown the queue is drained and a last flush is attempted; anything that
+    still fails stays in the outbox for the next start.
+
+    Arguments:
+        writer : SheetWriter
+            Does the actual writing.
+        maxsize : int
+            Capacity of the in-memory queue.
+        backoff : float
+            Seconds before the first retry; doubled after each consecutive failure.
+        max_backoff : float
+            Upper bound on the delay between retries.
+        on_written : callable, optional
+            Called (without arguments) after rows have been written, e.g. to clear a read cache.
+    """
+
+    _STOP = object()
+
+    def __init__(self, writer: SheetWriter, maxsize: int = 1000, backoff: float = 0.5,
+                 max_backoff: float = 60.0, on_written=None):
+        self.writer = writer
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_written = on_written
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._waiting = [time.monotonic()] * writer.pending  # submit times of rows in the outbox
+        self._failures = 0  # consecutive failed flushes
+        self._closed = False
+
+        self.submitted = 0
+        self.written = 0
+        self.overflowed = 0
+        self.retries = 0
+        self.last_error = None
+        self._latencies = deque(maxlen=1000)  # seconds from submit to written
+
+        self._thread = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, worksheet: str, data) -> bool:
+        """
+        Queues `data` (a dict or a DataFrame) for `worksheet` and returns immediately.
+
+        Returns:
+            True if the row went on the queue, False if the queue was full and it was saved
+            directly to the outbox instead (it is still written, just later).
+        """
+        data = dict(data) if isinstance(data, dict) else pd.DataFrame(data).copy()
+        now = time.monotonic()
+        with self._lock:
+            self.submitted += 1
+        try:
+            if self._closed:
+                raise queue.Full
+            self._queue.put_nowait((worksheet, data, now))
+            return True
+        except queue.Full:
+            self._spill(worksheet, data, now)
+            with self._lock:
+                self.overflowed += 1
+            return False
+
+    def _spill(self, worksheet, data, submitted_at):
+        self.writer.enqueue(worksheet, data)
+        with self._lock:
+            self._waiting.extend([submitted_at] * (1 if isinstance(data, dict) else len(data)))
+
+    def _run(self):
+        # Rows left in the outbox by a previous run go out right away
+        retry_at = time.monotonic() if self.writer.pending else None
+        while True:
+            timeout = None if retry_at is None else max(retry_at - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            # Take whatever else is already queued so it goes out in the same flush
+            while item is not None and item is not self._STOP:
+                self._spill(*item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if item is self._STOP:
+                return  # `close` flushes what is left
+
+            if retry_at is not None and time.monotonic() < retry_at:
+                continue  # Backing off: the new rows wait in the outbox for the retry
+            if self._flush():
+                retry_at = None
+            else:
+                retry_at = time.monotonic() + min(self.backoff * 2 ** (self._failures - 1), self.max_backoff)
+
+    def _flush(self) -> bool:
+        error = None
+        n_pending, start = self.writer.pending, time.perf_counter()
+        try:
+            ok = self.writer.flush()
+        except Exception as e:  # e.g. the outbox could not be rewritten
+            logger.warning("Sheet flush failed", exc_info=True)
+            ok, error = False, e
+        metrics.observe('sheets.write', time.perf_counter() - start, n_pending, error=not ok)
+
+        now = time.monotonic()
+        with self._lock:
+            # Failed worksheets keep their rows; count the others as written (oldest first)
+            n_written = len(self._waiting) if ok else max(len(self._waiting) - self.writer.pending, 0)
+            self.written += n_written
+            self._latencies.extend(now - t for t in self._waiting[:n_written])
+            del self._waiting[:n_written]
+            if ok:
+                self._failures = 0
+            else:
+                self._failures += 1
+                self.retries += 1
+                self.last_error = repr(error) if error else "append failed, see the log"
+
+        if n_written and self.on_written is not None:
+            try:
+                self.on_written()
+            except Exception:
+                logger.warning("on_written callback failed", exc_info=True)
+        return ok
+
+    def close(self, timeout: float = 10.0):
+        """Stops the worker, moves every queued row to the outbox and attempts a last flush."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                self._spill(*item)
+        if self.writer.pending:
+            self._flush()
+
+    def stats(self) -> dict:
+        """Queue depth, outbox size, counters and write latency (seconds from submit to written)."""
+        with self._lock:
+            latencies = np.array(self._latencies)
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "outbox_pending": self.writer.pending,
+                "submitted": self.submitted,
+                "written": self.written,
+                "overflowed": self.overflowed,
+                "retries": self.retries,
+                "consecutive_failures": self._failures,
+                "last_error": self.last_error,
+                "latency_p50": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                "latency_p99": float(np.percentile(latencies, 99)) if len(latencies) else None,
+                "latency_max": float(latencies.max()) if len(latencies) else None,
+            }
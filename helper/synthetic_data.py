@@ -0,0 +1,214 @@
+"""
+Synthetic patients for scale and load testing, learned from data/data.csv.
+
+`PatientGenerator` is a smoothed bootstrap (a kernel density estimate) of data.csv:
+
+- each synthetic patient starts from a real row, which keeps the joint distribution of Gender,
+  Occupation, BMI Category and Sleep Disorder, and how they go with the numeric columns;
+- the numeric columns, including the systolic and diastolic readings of "Blood Pressure", are
+  then moved by correlated Gaussian noise: the pooled within-disorder covariance of data.csv,
+  scaled by Scott's bandwidth. So new values keep the correlations of the data (e.g. Daily Steps
+  with Physical Activity Level, Quality of Sleep with Sleep Duration and Stress Level);
+- values are rounded like the data and kept within its observed range.
+
+Rows are drawn in fixed blocks of `BLOCK_SIZE`, each from its own generator seeded with
+(seed, block number). The output therefore depends only on the seed, not on the chunk size,
+and any number of rows can be streamed in chunks with constant memory.
+
+Two schemas:
+    'data'  the columns of data.csv, with "Blood Pressure" strings such as "126/83"
+    'raw'   the form record `UserDataCollector.validate` expects (as sent by the Demo page):
+            weight and height in mixed units instead of BMI Category, systolic and diastolic
+            readings, and the form's 1-10 Physical Activity Level
+
+Write a file (from the project root); .gz output is compressed:
+    python -m helper.synthetic_data --rows 100000000 --schema raw --output patients.csv.gz
+"""
+
+import argparse
+import gzip
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Setting directory to be parent root directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import DATA_FILE
+
+BLOCK_SIZE = 65_536
+
+# Numeric columns and the number of decimals they are recorded with in data.csv
+NUMERIC = {
+    'Age': 0,
+    'Sleep Duration': 1,
+    'Quality of Sleep': 0,
+    'Physical Activity Level': 0,
+    'Stress Level': 0,
+    'Systolic BP': 0,
+    'Diastolic BP': 0,
+    'Heart Rate': 0,
+    'Daily Steps': -2,  # whole hundreds
+}
+CATEGORICAL = ['Gender', 'Occupation', 'BMI Category', 'Sleep Disorder']
+
+DATA_COLUMNS = ['Person ID', 'Gender', 'Age', 'Occupation', 'Sleep Duration', 'Quality of Sleep',
+                'Physical Activity Level', 'Stress Level', 'BMI Category', 'Blood Pressure', 'Heart Rate',
+                'Daily Steps', 'Sleep Disorder']
+RAW_COLUMNS = ['Gender', 'Age', 'Occupation', 'Sleep Duration', 'Quality of Sleep', 'Physical Activity Level',
+               'Stress Level', 'Weight', 'Weight Unit', 'Height', 'Height Unit', 'Heart Rate', 'Daily Steps',
+               'Systolic BP', 'Diastolic BP']
+
+# data.csv has no weights or heights: adult heights in metres (mean, standard deviation) and the
+# BMI range drawn from for each category, inside `BMICategorizer.THRESHOLDS`
+HEIGHT = {'Male': (1.75, 0.07), 'Female': (1.62, 0.065)}
+BMI_RANGE = {
+    'Male': {'Normal Weight': (18.5, 24.7), 'Overweight': (25.3, 29.7), 'Obese': (30.3, 40.0)},
+    'Female': {'Normal Weight': (18.5, 23.7), 'Overweight': (24.3, 38.7), 'Obese': (39.3, 45.0)},
+}
+
+# Units picked in the form
+WEIGHT_UNITS = {'kg': 0.7, 'lbs': 0.3}
+HEIGHT_UNITS = {'m': 0.6, 'cm': 0.3, 'ft': 0.1}
+
+
+class PatientGenerator:
+    """
+    Draws realistic synthetic patients.
+
+    Arguments:
+        data : DataFrame
+            Rows in the data.csv schema to learn from (see `from_csv`).
+        bandwidth : float, optional
+            Scale of the noise relative to the within-disorder covariance. Defaults to Scott's
+            factor, n ** (-1 / (d + 4)).
+    """
+
+    def __init__(self, data: pd.DataFrame, bandwidth: float = None):
+        bp = data['Blood Pressure'].str.split('/', expand=True).astype(float)
+        numeric = data.assign(**{'Systolic BP': bp[0], 'Diastolic BP': bp[1]})[list(NUMERIC)].to_numpy(float)
+
+        self.categorical = {col: data[col].to_numpy(dtype=object) for col in CATEGORICAL}
+        self.numeric = numeric
+        self.low, self.high = numeric.min(axis=0), numeric.max(axis=0)
+
+        # Pooled within-disorder covariance, so the noise does not blur the disorders together
+        groups = pd.Series(self.categorical['Sleep Disorder'])
+        residuals = numeric - pd.DataFrame(numeric).groupby(groups.to_numpy()).transform('mean').to_numpy()
+        covariance = residuals.T @ residuals / (len(numeric) - groups.nunique())
+        n, d = numeric.shape
+        self.bandwidth = n ** (-1 / (d + 4)) if bandwidth is None else bandwidth
+        # A small ridge keeps the factorisation valid if a column is constant within every group
+        self._noise = np.linalg.cholesky(covariance + 1e-9 * np.eye(d)).T * self.bandwidth
+        self._last_block = (None, None)
+
+    @classmethod
+    def from_csv(cls, path=DATA_FILE, **kwargs) -> "PatientGenerator":
+        """Learns from data.csv (read as the notebook does, so "None" stays a label)."""
+        return cls(pd.read_csv(path, na_values=[], keep_default_na=False), **kwargs)
+
+    def _block(self, seed: int, index: int) -> pd.DataFrame:
+        """The `index`-th block of BLOCK_SIZE rows for `seed`, with the columns of both schemas."""
+        rng = np.random.default_rng([seed, index])
+        anchors = rng.integers(0, len(self.numeric), BLOCK_SIZE)
+
+        values = self.numeric[anchors] + rng.standard_normal((BLOCK_SIZE, len(NUMERIC))) @ self._noise
+        # Reflect at the observed range rather than clip, which would pile values up on its edges
+        values = np.where(values > self.high, 2 * self.high - values, values)
+        values = np.clip(np.where(values < self.low, 2 * self.low - values, values), self.low, self.high)
+        block = pd.DataFrame({col: self.categorical[col][anchors] for col in CATEGORICAL})
+        for i, (col, decimals) in enumerate(NUMERIC.items()):
+            rounded = np.round(values[:, i], decimals)
+            block[col] = rounded if decimals > 0 else rounded.astype(np.int64)
+        block['Diastolic BP'] = np.minimum(block['Diastolic BP'], block['Systolic BP'] - 20)
+
+        # Raw form: a weight and height that give the row's BMI category, in the units a user picked
+        gender = block['Gender'].to_numpy(dtype=object)
+        category = block['BMI Category'].replace({'Normal': 'Normal Weight'}).to_numpy(dtype=object)
+        height = np.empty(BLOCK_SIZE)
+        bmi_low, bmi_high = np.empty(BLOCK_SIZE), np.empty(BLOCK_SIZE)
+        for sex, (mean, std) in HEIGHT.items():
+            mask = gender == sex
+            height[mask] = rng.normal(mean, std, mask.sum())
+            for name, (low, high) in BMI_RANGE[sex].items():
+                rows = mask & (category == name)
+                bmi_low[rows], bmi_high[rows] = low, high
+        height = np.clip(height, 1.4, 2.1)
+        weight = rng.uniform(bmi_low, bmi_high) * height ** 2
+
+        weight_unit = rng.choice(list(WEIGHT_UNITS), BLOCK_SIZE, p=list(WEIGHT_UNITS.values()))
+        height_unit = rng.choice(list(HEIGHT_UNITS), BLOCK_SIZE, p=list(HEIGHT_UNITS.values()))
+        block['Weight'] = np.where(weight_unit == 'lbs', (weight / 0.453592).round(1), weight.round(1))
+        block['Weight Unit'] = weight_unit
+        block['Height'] = np.select([height_unit == 'cm', height_unit == 'ft'],
+                                    [(height * 100).round(0), (height / 0.3048).round(2)], height.round(2))
+        block['Height Unit'] = height_unit
+        # The form asks for activity on a 1-10 scale; data.csv records minutes per day
+        block['Activity Scale'] = np.clip(np.round(block['Physical Activity Level'] / 10), 1, 10).astype(np.int64)
+        return block
+
+    def rows(self, first: int, last: int, seed: int = 42, schema: str = 'data') -> pd.DataFrame:
+        """Rows `first` to `last` (excluded) of the stream for `seed`, in `schema`."""
+        if schema not in ('data', 'raw'):
+            raise ValueError("schema must be 'data' or 'raw'")
+        blocks = [self._cached_block(seed, index) for index in range(first // BLOCK_SIZE, -(-last // BLOCK_SIZE))]
+        offset = first // BLOCK_SIZE * BLOCK_SIZE
+        frame = pd.concat(blocks, ignore_index=True).iloc[first - offset:last - offset].reset_index(drop=True)
+
+        if schema == 'raw':
+            return frame.assign(**{'Physical Activity Level': frame['Activity Scale']})[RAW_COLUMNS]
+        frame['Person ID'] = np.arange(first + 1, last + 1)
+        frame['Blood Pressure'] = frame['Systolic BP'].astype(str) + '/' + frame['Diastolic BP'].astype(str)
+        return frame[DATA_COLUMNS]
+
+    def _cached_block(self, seed, index):
+        # Consecutive chunks mostly fall in the same block: keep the last one only
+        if self._last_block[0] != (seed, index):
+            self._last_block = ((seed, index), self._block(seed, index))
+        return self._last_block[1]
+
+    def chunks(self, n_rows: int, seed: int = 42, schema: str = 'data', chunk_size: int = 100_000, start: int = 0):
+        """
+        Yields `n_rows` rows in DataFrames of at most `chunk_size` rows.
+
+        Arguments:
+            start : int
+                Index of the first row, so that ranges of one stream can be generated separately.
+        """
+        for first in range(start, start + n_rows, chunk_size):
+            yield self.rows(first, min(first + chunk_size, start + n_rows), seed, schema)
+
+    def sample(self, n_rows: int, seed: int = 42, schema: str = 'data') -> pd.DataFrame:
+        """The first `n_rows` rows for `seed` in one DataFrame."""
+        return self.rows(0, n_rows, seed, schema)
+
+
+def write_csv(path, n_rows: int, seed: int = 42, schema: str = 'data', chunk_size: int = 100_000,
+              generator: PatientGenerator = None):
+    """Streams `n_rows` rows to a CSV file (gzip-compressed if `path` ends with .gz, stdout if '-')."""
+    generator = generator or PatientGenerator.from_csv()
+    if path == '-':
+        handle = sys.stdout
+    elif str(path).endswith('.gz'):
+        handle = gzip.open(path, 'wt', newline='')
+    else:
+        handle = open(path, 'w', newline='')
+    try:
+        for i, chunk in enumerate(generator.chunks(n_rows, seed, schema, chunk_size)):
+            chunk.to_csv(handle, header=i == 0, index=False)
+    finally:
+        if handle is not sys.stdout:
+            handle.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--schema", choices=['data', 'raw'], default='data')
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--output", default='-', help="CSV file to write ('-' for stdout)")
+    args = parser.parse_args()
+    write_csv(args.output, args.rows, args.seed, args.schema, args.chunk_size)
@@ -0,0 +1,456 @@
+"""
+Reproducible training: the notebook's model selection and final fit as one command.
+
+Same data, split, preprocessing, cross-validation and grid as data/notebook.ipynb, but searched
+on the full feature set (see below), so it does not reproduce the deployed model:
+
+- data/data.csv split 85/15, stratified (random_state 42), through the app's transformers;
+- an OrdinalEncoder per categorical column, then a StandardScaler (`Preprocessor`);
+- StratifiedKFold(10, shuffle=True, random_state=42), scored with macro-F1;
+- the base models (Logistic Regression, SVM, Random Forest, KNN), then the SVC grid
+  (C x kernel x gamma x degree);
+- the best SVC refitted on the whole training split with probability=True and random_state=42,
+  and evaluated on the test split. Nothing is saved unless --deploy is given; the new model is
+  then deployed as models/model.pkl, target_encoder.pkl, feature_encoder.pkl, scaler.pkl and
+  model_evaluation.pkl (through the journalled swap and history of helper/retrain.py, so it can
+  be rolled back) only if its macro-F1 on the test split is not lower than the deployed model's
+  (--force to deploy it anyway).
+
+The preprocessing is fitted on the training part of each fold, as a Pipeline in GridSearchCV
+would, but only once per fold: the fold matrices are cached in .cache/training/ (keyed on
+data.csv and the CV settings) and shared by every candidate. Candidates run in a process pool
+(--jobs), each seeded from its position in the grid. A grid candidate is stopped as soon as it
+can no longer reach the best mean score found so far: every fold scores at most 1, so
+(sum of its fold scores + 1 per remaining fold) / n_folds bounds its mean. The selected
+candidate and its score are therefore exactly those of an exhaustive search, whatever the
+order in which the workers finish. Grid candidates that differ only in parameters their kernel
+ignores (`degree` but for 'poly', `gamma` for 'linear') are the same model and are fitted once:
+104 of the grid's 240. The SVC grid is fitted without probability=True: the
+predictions the F1 is computed from do not depend on it.
+
+With --precomputed-kernels, the SVC candidates sharing a kernel (kernel, gamma, degree) go to
+one worker, which computes each fold's kernel matrix once, keeps it in a cache bounded by
+KERNEL_CACHE_BYTES, and fits every C on it with kernel='precomputed'. The kernels are computed
+with libsvm's definitions (gamma 'scale' resolved on each fold's training rows, as SVC.fit does),
+so the fold scores and the selection are those of the normal search; the winner is reported and
+deployed with its grid parameters, as an ordinary SVC.
+
+The notebook's RFE experiment is not repeated. The notebook fits both of its grid searches on
+the RFE-selected features, then trains its final model on the full feature set with the
+parameters found there: the deployed poly kernel, C=1, degree=3, gamma='scale'. This search runs
+on the full feature set the final model is trained on, and selects different hyperparameters
+(rbf, C=100, gamma=0.01, CV macro-F1 0.8776): it is a model selection of its own, not a rebuild of
+the deployed model. The test-split gate of --deploy compares the two.
+
+Usage (from the project root):
+    python -m helper.train [--jobs 4] [--no-prune] [--no-cache] [--precomputed-kernels] [--deploy [--force]]
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin, clone
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.preprocessing import LabelEncoder, OrdinalEncoder, StandardScaler
+
+# Setting directory to be parent root directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import CAT_FEATURES, DATA_FILE, KERNEL_CACHE_BYTES, TRAINING_CACHE_DIR
+
+RANDOM_STATE = 42
+N_SPLITS = 10
+
+# The notebook's SVC grid
+PARAM_GRID = {
+    'C': [0.1, 1, 10, 100],
+    'kernel': ['linear', 'rbf', 'poly', 'sigmoid'],
+    'gamma': ['scale', 'auto', 0.01, .1, 1],
+    'degree': [2, 3, 4],
+}
+
+# Bump when the cached fold matrices change meaning
+CACHE_VERSION = 1
+
+
+class Preprocessor(BaseEstimator, TransformerMixin):
+    """
+    The notebook's preprocessing: an OrdinalEncoder per categorical column (unknown categories
+    encoded as -1), then a StandardScaler over every column.
+
+    Arguments:
+        cat_features : list
+    """
+    def __init__(self, cat_features=CAT_FEATURES):
+        self.cat_features = cat_features
+
+    def fit(self, X, y=None):
+        X = X.copy()
+        self.encoders_ = {}
+        for col in self.cat_features:
+            encoder = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1)
+            X[col] = encoder.fit_transform(X[[col]])
+            self.encoders_[col] = encoder
+        self.scaler_ = StandardScaler().fit(X)
+        return self
+
+    def transform(self, X) -> np.ndarray:
+        X = X.copy()
+        for col, encoder in self.encoders_.items():
+            X[col] = encoder.transform(X[[col]])
+        return self.scaler_.transform(X)
+
+
+def base_models() -> dict:
+    """The models the notebook compares before tuning the SVC."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.svm import SVC
+
+    return {
+        "Logistic Regression": LogisticRegression(),
+        "SVM": SVC(decision_function_shape='ovo'),
+        "Random Forest": RandomForestClassifier(),
+        "KNN": KNeighborsClassifier(),
+    }
+
+
+def training_data():
+    """(X_train, X_test, y_train, y_test) of data.csv, split as in the notebook."""
+    from helper.retrain import split
+
+    data = pd.read_csv(DATA_FILE, na_values=[], keep_default_na=False)
+    return split(data, data.iloc[:0])
+
+
+# ------------- Fold cache --------------
+def fold_matrices(X: pd.DataFrame, y: np.ndarray, cache_dir=TRAINING_CACHE_DIR, use_cache: bool = True) -> str:
+    """
+    Preprocesses each cross-validation fold once and saves the matrices to an .npz file.
+
+    The preprocessing of each fold is fitted on its training part only. The file is named after
+    the training rows, the labels and the CV settings, so a second run (or the benchmark) reuses it.
+
+    Returns:
+        the path of the .npz file: `X_train_<i>`, `X_valid_<i>`, `y_train_<i>`, `y_valid_<i>` per fold.
+    """
+    key = hashlib.sha256()
+    key.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    key.update(np.asarray(y).tobytes())
+    key.update(json.dumps([CACHE_VERSION, N_SPLITS, RANDOM_STATE, list(X.columns)]).encode())
+    path = os.path.join(cache_dir, f"folds-{key.hexdigest()[:16]}.npz")
+    if use_cache and os.path.exists(path):
+        return path
+
+    arrays = {}
+    folds = StratifiedKFold(n_splits=N_SPLITS, shuffle=True, random_state=RANDOM_STATE)
+    for i, (train, valid) in enumerate(folds.split(X, y)):
+        preprocessor = Preprocessor().fit(X.iloc[train])
+        arrays[f'X_train_{i}'] = preprocessor.transform(X.iloc[train])
+        arrays[f'X_valid_{i}'] = preprocessor.transform(X.iloc[valid])
+        arrays[f'y_train_{i}'], arrays[f'y_valid_{i}'] = y[train], y[valid]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+# ------------- Kernel matrices --------------
+def kernel_matrix(A: np.ndarray, B: np.ndarray, kernel: str, gamma: float, degree: int, coef0: float) -> np.ndarray:
+    """K[i, j] = kernel(A[i], B[j]), with libsvm's definitions of the SVC kernels."""
+    dot = A @ B.T
+    if kernel == 'linear':
+        return dot
+    if kernel == 'poly':
+        return (gamma * dot + coef0) ** degree
+    if kernel == 'sigmoid':
+        return np.tanh(gamma * dot + coef0)
+    if kernel == 'rbf':
+        distances = (A * A).sum(axis=1)[:, None] + (B * B).sum(axis=1)[None, :] - 2 * dot
+        return np.exp(-gamma * np.maximum(distances, 0, out=distances))
+    raise ValueError(f"Unsupported kernel {kernel!r}")
+
+
+def kernel_key(estimator) -> tuple:
+    """The parameters an SVC's kernel matrix depends on: (kernel, gamma, degree, coef0)."""
+    params = estimator.get_params()
+    kernel = params['kernel']
+    return (kernel,
+            None if kernel == 'linear' else params['gamma'],
+            params['degree'] if kernel == 'poly' else None,
+            params['coef0'] if kernel in ('poly', 'sigmoid') else None)
+
+
+class KernelCache:
+    """
+    Kernel matrices of the cross-validation folds, computed on first use and kept up to
+    `max_bytes`.
+
+    Candidates read the folds of their kernel in turn, so plain LRU eviction would drop each
+    matrix just before it is needed again whenever a kernel's folds do not all fit. Only matrices
+    of other kernels (least recently used first) are dropped to make room; once a kernel's own
+    matrices fill the cache, further folds are computed on every use.
+
+    Arguments:
+        max_bytes : int
+    """
+    def __init__(self, max_bytes: int = KERNEL_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+
+    def fold(self, i: int, key: tuple, X_train: np.ndarray, X_valid: np.ndarray):
+        """(K_train, K_valid) of fold `i` for the kernel `key` (see `kernel_key`)."""
+        entry = self._entries.get((i, key))
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end((i, key))
+            return entry
+
+        self.misses += 1
+        kernel, gamma, degree, coef0 = key
+        # As SVC.fit resolves them, on the fold's training rows
+        if gamma == 'scale':
+            gamma = 1.0 / (X_train.shape[1] * X_train.var())
+        elif gamma == 'auto':
+            gamma = 1.0 / X_train.shape[1]
+        entry = tuple(kernel_matrix(X, X_train, kernel, gamma, degree, coef0) for X in (X_train, X_valid))
+
+        size = sum(K.nbytes for K in entry)
+        while self.nbytes + size > self.max_bytes and self._entries and next(iter(self._entries))[1] != key:
+            self.nbytes -= sum(K.nbytes for K in self._entries.popitem(last=False)[1])
+        if self.nbytes + size <= self.max_bytes:
+            self._entries[(i, key)] = entry
+            self.nbytes += size
+        return entry
+
+
+# ------------- Candidates --------------
+# Set in each worker by `_init_worker` (and in this process for --jobs 1)
+_folds = None
+_best = None
+_kernels = None
+
+
+def _init_worker(path, best, kernel_cache_bytes=KERNEL_CACHE_BYTES):
+    global _folds, _best, _kernels
+    with np.load(path) as saved:
+        _folds = [tuple(saved[f'{name}_{i}'] for name in ('X_train', 'X_valid', 'y_train', 'y_valid'))
+                  for i in range(len(saved.files) // 4)]
+    _best = best
+    _kernels = KernelCache(kernel_cache_bytes)
+
+
+def _precomputed_folds(key):
+    # Generated fold by fold, so that a pruned candidate does not compute the rest
+    for i, (X_train, X_valid, y_train, y_valid) in enumerate(_folds):
+        yield _kernels.fold(i, key, X_train, X_valid) + (y_train, y_valid)
+
+
+def _cross_validate(index, estimator, prune, folds):
+    from sklearn.metrics import f1_score
+
+    start = time.perf_counter()
+    scores = []
+    for X_train, X_valid, y_train, y_valid in folds:
+        model = clone(estimator).fit(X_train, y_train)
+        scores.append(f1_score(y_valid, model.predict(X_valid), average='macro'))
+        # The best mean this candidate could still reach, with every remaining fold at 1
+        bound = (sum(scores) + len(_folds) - len(scores)) / len(_folds)
+        if prune and len(scores) < len(_folds) and bound < _best.value - 1e-12:
+            return index, scores, True, time.perf_counter() - start
+
+    mean = float(np.average(scores))
+    if prune:
+        with _best.get_lock():
+            _best.value = max(_best.value, mean)
+    return index, scores, False, time.perf_counter() - start
+
+
+def _evaluate(task):
+    """
+    Cross-validates a group of candidates on the cached folds. With `precomputed`, the group
+    shares one kernel (see `kernel_key`) and is fitted on its kernel matrices.
+
+    Returns:
+        (index, fold scores, pruned, seconds) per candidate.
+    """
+    members, prune, precomputed = task
+    if not precomputed:
+        return [_cross_validate(index, estimator, prune, _folds) for index, estimator in members]
+    key = kernel_key(members[0][1])
+    return [_cross_validate(index, clone(estimator).set_params(kernel='precomputed'), prune, _precomputed_folds(key))
+            for index, estimator in members]
+
+
+def seeded(estimator, index: int):
+    """`estimator` with a random_state derived from its position, if it takes one and has none."""
+    if 'random_state' in estimator.get_params() and estimator.get_params()['random_state'] is None:
+        estimator = clone(estimator).set_params(random_state=RANDOM_STATE + index)
+    return estimator
+
+
+def evaluate(candidates: list, folds_path: str, jobs: int = None, prune: bool = True,
+             precomputed: bool = False) -> pd.DataFrame:
+    """
+    Cross-validates `candidates` (estimators) on the cached folds, in a pool of `jobs` processes.
+
+    With `precomputed` (SVCs only), candidates sharing a kernel are sent to the same worker, which
+    computes each fold's kernel matrix once (`KernelCache`) and fits them all with
+    kernel='precomputed'.
+
+    Returns:
+        one row per candidate, in the order given: 'mean_test_score' (NaN if it was pruned),
+        'std_test_score', 'fits' (folds scored), 'pruned' and 'seconds'.
+    """
+    jobs = jobs or os.cpu_count()
+    best = multiprocessing.Value('d', -np.inf)
+    groups = {}
+    for i, estimator in enumerate(candidates):
+        groups.setdefault(kernel_key(estimator) if precomputed else i, []).append((i, seeded(estimator, i)))
+    tasks = [(members, prune, precomputed) for members in groups.values()]
+    if jobs == 1:
+        _init_worker(folds_path, best)
+        results = list(map(_evaluate, tasks))
+    else:
+        with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(folds_path, best)) as pool:
+            results = list(pool.imap_unordered(_evaluate, tasks))
+
+    rows = {}
+    for index, scores, pruned, seconds in (result for group in results for result in group):
+        rows[index] = {
+            'mean_test_score': np.nan if pruned else float(np.average(scores)),
+            'std_test_score': np.nan if pruned else float(np.std(scores)),
+            'fits': len(scores),
+            'pruned': pruned,
+            'seconds': seconds,
+        }
+    return pd.DataFrame([rows[i] for i in range(len(candidates))])
+
+
+def best_candidate(results: pd.DataFrame) -> int:
+    """Index of the highest mean score; the first one in grid order on ties, like GridSearchCV."""
+    return int(results['mean_test_score'].fillna(-np.inf).to_numpy().argmax())
+
+
+def effective_params(params: dict) -> tuple:
+    """
+    The SVC parameters that change the fitted model: `degree` only matters to the 'poly' kernel
+    and `gamma` to every kernel but 'linear'.
+    """
+    kernel = params.get('kernel', 'rbf')
+    ignored = {'degree'} if kernel in ('rbf', 'sigmoid') else {'degree', 'gamma'} if kernel == 'linear' else set()
+    return tuple(sorted((key, value) for key, value in params.items() if key not in ignored))
+
+
+def search_svc(folds_path: str, jobs: int = None, prune: bool = True, param_grid: dict = PARAM_GRID,
+               precomputed: bool = False):
+    """
+    The notebook's SVC grid search, on the cached folds (on their kernel matrices with `precomputed`,
+    see `evaluate`; the parameters returned are still those of the grid, e.g. kernel='rbf').
+
+    Returns:
+        (best_params, best_score, results): `results` has one row per candidate of
+        `ParameterGrid(param_grid)` (GridSearchCV's order) with its 'params'.
+    """
+    from sklearn.svm import SVC
+
+    grid = list(ParameterGrid(param_grid))
+    # Candidates differing only in parameters their kernel ignores are fitted once
+    distinct = {}
+    for params in grid:
+        distinct.setdefault(effective_params(params), params)
+    candidates = [SVC(decision_function_shape='ovo', **params) for params in distinct.values()]
+    scored = evaluate(candidates, folds_path, jobs, prune, precomputed)
+    position = {key: i for i, key in enumerate(distinct)}
+    keys = pd.Series([position[effective_params(params)] for params in grid])
+    results = scored.iloc[keys].reset_index(drop=True)
+    # A fit shared by several candidates is counted once
+    results.loc[keys.duplicated(), ['fits', 'seconds']] = 0
+    results.insert(0, 'params', grid)
+    best = best_candidate(results)
+    return grid[best], float(results['mean_test_score'][best]), results
+
+
+# ------------- Final model --------------
+def fit_final(X_train, X_test, y_train, y_test, params: dict):
+    """The selected SVC, fitted as in the notebook. Returns (objects, evaluation metrics)."""
+    from sklearn.svm import SVC
+    from helper.retrain import evaluation_metrics, fit_model
+
+    template = SVC(**params, decision_function_shape='ovo', probability=True, random_state=RANDOM_STATE)
+    objects = fit_model(X_train, y_train, template)
+    return objects, evaluation_metrics(objects, X_train, y_train, X_test, y_test)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Select, train and save the model (the notebook's search).")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--no-prune", action="store_true", help="Score every grid candidate on every fold")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute the fold matrices")
+    parser.add_argument("--precomputed-kernels", action="store_true",
+                        help="Fit the SVC grid on kernel matrices computed once per fold and kernel")
+    parser.add_argument("--deploy", action="store_true",
+                        help="Deploy the new model if its test macro-F1 is not lower than the deployed model's")
+    parser.add_argument("--force", action="store_true", help="With --deploy, deploy whatever its test macro-F1")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    X_train, X_test, y_train, y_test = training_data()
+    y = LabelEncoder().fit_transform(y_train)
+    folds_path = fold_matrices(X_train, y, use_cache=not args.no_cache)
+    print(f"Fold matrices: {folds_path} ({time.perf_counter() - start:.1f} s)")
+
+    started = time.perf_counter()
+    models = base_models()
+    results = evaluate(list(models.values()), folds_path, args.jobs, prune=False)
+    for name, score in zip(models, results['mean_test_score']):
+        print(f"{name}: Mean F1-score = {score:.4f}")
+    print(f"Base models: {time.perf_counter() - started:.1f} s")
+
+    started = time.perf_counter()
+    best_params, best_score, results = search_svc(folds_path, args.jobs, prune=not args.no_prune,
+                                                    precomputed=args.precomputed_kernels)
+    print(f"SVC grid: {len(results)} candidates, {results['pruned'].sum()} stopped early, "
+          f"{results['fits'].sum()} of {len(results) * N_SPLITS} fits, {time.perf_counter() - started:.1f} s")
+    print(f"Best Parameters: {best_params}")
+    print(f"Best F1-macro Score: {best_score:.4f}")
+
+    objects, evaluation = fit_final(X_train, X_test, y_train, y_test, best_params)
+    print(f"Test F1-macro Score: {evaluation['test_metrics']['f1_score']:.4f}")
+    print(f"Total: {time.perf_counter() - start:.1f} s")
+
+    if not args.deploy:
+        print("Nothing saved (--deploy to deploy the new model)")
+        return 0
+
+    from helper.retrain import deployed_objects, exclusive, macro_f1, promote
+    test_f1 = float(evaluation['test_metrics']['f1_score'])
+    with exclusive():
+        # The deployed model was not trained on the test split either
+        deployed_f1 = macro_f1(X_test, y_test, deployed_objects())
+        print(f"Deployed model's test F1-macro Score: {deployed_f1:.4f}")
+        if test_f1 < deployed_f1 and not args.force:
+            print("Not deployed: the test F1-macro Score would drop (--force to deploy anyway)")
+            return 1
+        info = {'origin': 'trained', 'params': best_params, 'cv_f1': best_score, 'test_f1': test_f1,
+                'deployed_f1': deployed_f1}
+        version = promote(objects, evaluation, info)
+    print(f"Saved the artifacts as version {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
+import numpy as np
 import pandas as pd
 import re
 
+from helper.metrics import metrics
+
 def validate_bp(bp: str | list):
     """
     Validates blood pressure string and Systolic and Diastolic Blood Pressure
@@ -40,6 +43,41 @@ def validate_bp(bp: str | list):
         raise TypeError ("This function only accepts str and list")
 
 
+def _map_uniques(values, func, missing):
+    """
+    Applies `func` to each distinct value once and broadcasts the results back to the rows.
+    Missing values (None/NaN) become `missing`.
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    table = np.array([func(v) for v in uniques] + [missing], dtype=object)
+    return table[codes]
+
+
+def _to_number(values, cast):
+    """
+    Converts a column with `cast` (float or int), exactly as `validate` does value by value.
+
+    Returns:
+        (numbers as a float array, mask of the values that are missing or could not be converted)
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        numbers = values.to_numpy(dtype=float)
+        bad = np.isnan(numbers)
+        return (np.trunc(numbers) if cast is int else numbers), bad
+
+    codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+    table = np.full(len(uniques) + 1, np.nan)
+    failed = np.ones(len(uniques) + 1, dtype=bool)
+    for i, value in enumerate(uniques):
+        try:
+            table[i] = cast(value)
+            failed[i] = False
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return table[codes], failed[codes]
+
+
 
 class UserDataCollector:
     """
@@ -62,6 +100,7 @@ class UserDataCollector:
     def __init__(self):
         self.data = {}
 
+    @metrics.timed('validate')
     def validate(self, raw: dict) -> pd.DataFrame:
 
         # # Validate each key in the key-value pair
@@ -219,6 +258,152 @@ class UserDataCollector:
         return pd.DataFrame([data])
 
 
+    # Numeric fields checked by `validate`: (column, minimum, maximum, not-a-number message, out-of-range message)
+    NUMERIC_RULES = [
+        ("Age", 0, 120, "Age must be a number", "Age should be in the range of 0 to 120"),
+        ("Sleep Duration", 0, 24, "âŒ Please enter a valid number for sleep duration.",
+         "âŒ Sleep duration must be between 0 and 24 hours."),
+        ("Quality of Sleep", 1, 10, "âŒ Quality of Sleep must be a number", "âŒ Please enter a number between 1 and 10."),
+        ("Physical Activity Level", 1, 10, "âŒ Please enter a valid number for physical activity level.",
+         "âŒ Please enter a number between 1 and 10."),
+        ("Stress Level", 1, 10, "âŒ Please enter a valid number for stress level.",
+         "âŒ Please enter a number between 1 and 10."),
+        ("Heart Rate", 30, 220, "âŒ Invalid input. Please enter a valid number for heart rate (bpm).",
+         "âŒ Please enter a plausible human heart rate."),
+        ("Daily Steps", 0, float("inf"), "âŒ Invalid input. Please enter a valid number for daily steps.",
+         "âŒ Daily Steps canot be negative"),
+    ]
+
+    @metrics.timed('validate_frame', rows=lambda self, raw: len(raw))
+    def validate_frame(self, raw: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series, pd.Series]:
+        """
+        Validates many records at once, applying the rules of `validate` column by column.
+
+        Unlike `validate`, nothing is raised: every problem in every row is reported.
+        An empty cell is treated like a missing key, so a row may give its blood pressure
+        either as a "Blood Pressure" string or as "Systolic BP" and "Diastolic BP".
+
+        Argument:
+            raw : pd.DataFrame
+                One record per row, with the keys `validate` accepts.
+
+        Returns:
+            clean : pd.DataFrame
+                Converted values (kg, m) in the output schema of `validate`, for every row.
+                Rows that use the Systolic/Diastolic pair get a "Blood Pressure" string when
+                the frame also has that column.
+            invalid : pd.Series of bool
+                True for the rows that failed validation.
+            errors : pd.Series of str
+                The error messages of each row joined by "; " ("" for valid rows).
+        """
+        n_rows = len(raw)
+        problems = []  # (field, row mask, message)
+        data = {}
+
+        def column(name):
+            if name in raw.columns:
+                return raw[name]
+            return pd.Series([None] * n_rows, index=raw.index, dtype=object)
+
+        # Gender
+        gender = _map_uniques(column("Gender"), lambda g: str(g).strip().capitalize(), missing="None")
+        problems.append(("Gender", ~np.isin(gender, ["Male", "Female"]),
+                         "Gender should be your assigned birth gender ('Male' or 'Female')."))
+        data["Gender"] = gender
+
+        # Occupation
+        data["Occupation"] = _map_uniques(column("Occupation"), lambda o: str(o).strip(), missing="None")
+
+        # Numeric fields
+        for name, low, high, type_msg, range_msg in self.NUMERIC_RULES:
+            values, bad = _to_number(column(name), float)
+            problems.append((name, bad, type_msg))
+            problems.append((name, ~bad & ~((low <= values) & (values <= high)), range_msg))
+            data[name] = values
+
+        # Weight, converting pounds (lbs) to kg
+        weight, bad = _to_number(column("Weight"), float)
+        weight = np.where(column("Weight Unit").to_numpy(dtype=object) == "lbs", weight * 0.453592, weight)
+        problems.append(("Weight", bad, "âŒ Please enter a valid number for weight."))
+        problems.append(("Weight", ~bad & ~((2 <= weight) & (weight <= 450)),
+                         "âŒ Please enter a plausible human weight"))
+        data["Weight"] = np.round(weight, 2)
+
+        # Height, converting cm and ft to metres
+        height, bad = _to_number(column("Height"), float)
+        height_unit = column("Height Unit").to_numpy(dtype=object)
+        height = np.select([height_unit == "cm", height_unit == "ft"], [height / 100, height * 0.3048], height)
+        problems.append(("Height", bad, "âŒ Please enter a valid number for height."))
+        problems.append(("Height", ~bad & ~((0.5 <= height) & (height <= 2.5)),
+                         "âŒ Please enter a plausible human height."))
+        data["Height"] = height
+
+        # Blood pressure: a "120/80" string takes precedence over the Systolic/Diastolic pair
+        bp = column("Blood Pressure")
+        has_bp = bp.notna().to_numpy()
+        bp = _map_uniques(bp, lambda b: str(b).strip(), missing="")
+        has_bp &= bp != ""
+        well_formed = _map_uniques(bp, lambda b: re.match(r"^\d{2,3}/\d{2,3}$", b) is not None, missing=False)
+        well_formed = has_bp & well_formed.astype(bool)
+        problems.append(("Blood Pressure", has_bp & ~well_formed, "Blood Pressure must look like 120/80"))
+        bp = np.where(well_formed, bp, None)
+        bp_sbp = _map_uniques(bp, lambda b: int(b.split("/")[0]), missing=np.nan).astype(float)
+        bp_dbp = _map_uniques(bp, lambda b: int(b.split("/")[1]), missing=np.nan).astype(float)
+
+        pair_sbp, bad_sbp = _to_number(column("Systolic BP"), int)
+        pair_dbp, bad_dbp = _to_number(column("Diastolic BP"), int)
+        given_sbp = column("Systolic BP").notna().to_numpy()
+        given_dbp = column("Diastolic BP").notna().to_numpy()
+        use_pair = ~has_bp & given_sbp & given_dbp
+        problems.append(("Blood Pressure", use_pair & (bad_sbp | bad_dbp),
+                         "âŒ Systolic/Diastolic BP must be integers"))
+        problems.append(("Blood Pressure", ~has_bp & (given_sbp ^ given_dbp),
+                         "Both Systolic BP and Diastolic BP must be provided"))
+        problems.append(("Blood Pressure", ~has_bp & ~given_sbp & ~given_dbp,
+                         "âš ï¸ Warning: No blood pressure information provided. Prediction will fail."))
+
+        # Plausible ranges, as in `validate_bp`
+        sbp = np.where(has_bp, bp_sbp, pair_sbp)
+        dbp = np.where(has_bp, bp_dbp, pair_dbp)
+        checked = well_formed | (use_pair & ~bad_sbp & ~bad_dbp)
+        for label, values, low, high, span in [("Systolic", sbp, 50, 250, "50â€“250"),
+                                               ("Diastolic", dbp, 30, 150, "30â€“150")]:
+            out_of_range = checked & ~((low <= values) & (values <= high))
+            messages = np.full(n_rows, "", dtype=object)
+            messages[out_of_range] = [f"âŒ {label} BP {v:.0f} is outside plausible human range ({span} mmHg)."
+                                      for v in values[out_of_range]]
+            problems.append(("Blood Pressure", out_of_range, messages))
+
+        if "Blood Pressure" in raw.columns:
+            blood_pressure = bp.copy()
+            valid_pair = use_pair & ~bad_sbp & ~bad_dbp
+            pairs = pd.MultiIndex.from_arrays([sbp[valid_pair], dbp[valid_pair]])
+            blood_pressure[valid_pair] = _map_uniques(pairs, lambda p: f"{p[0]:.0f}/{p[1]:.0f}", missing=None)
+            data["Blood Pressure"] = blood_pressure
+        else:
+            data["Systolic BP"] = sbp
+            data["Diastolic BP"] = dbp
+
+        # Same column order as `validate`
+        order = ["Gender", "Age", "Occupation", "Sleep Duration", "Quality of Sleep", "Physical Activity Level",
+                 "Stress Level", "Weight", "Height", "Heart Rate", "Daily Steps"]
+        clean = pd.DataFrame({col: data[col] for col in order + [col for col in data if col not in order]},
+                             index=raw.index)
+
+        # Messages are listed in the order `validate` checks the fields, so the first one is what it would raise
+        problems.sort(key=lambda problem: (order + ["Blood Pressure"]).index(problem[0]))
+        errors = np.full(n_rows, "", dtype=object)
+        for _, mask, message in problems:
+            if not mask.any():
+                continue
+            new = message[mask] if isinstance(message, np.ndarray) else message
+            previous = errors[mask]
+            errors[mask] = np.where(previous == "", new, previous + "; " + new)
+
+        invalid = pd.Series(errors != "", index=raw.index)
+        return clean, invalid, pd.Series(errors, index=raw.index)
+
     def get_data(self):
         df = pd.DataFrame([self.data])
         return df
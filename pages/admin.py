@@ -0,0 +1,114 @@
+import streamlit as st
+import sys, os
+import pandas as pd
+
+# Setting directory to be parent root directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from helper.metrics import metrics
+from helper.batching import micro_batcher
+from helper.predictor import prediction_cache
+
+
+def login():
+    st.title("Admin Access")
+    password = st.text_input("Enter the admin password to continue:", type="password")
+    if not password:
+        return False
+    if password == st.secrets.get("admin_password"):
+        st.session_state["admin_logged_in"] = True
+        st.rerun()
+    st.error("Incorrect password! Not Authorized!!")
+    return False
+
+
+def main():
+    st.title("Inference Metrics")
+    st.caption("Timings of this app process since it started or since the last reset: validation, "
+               "each preprocessing step, the model calls and the Google Sheet writes.")
+
+    col1, col2, col3 = st.columns([2, 1, 1], vertical_alignment='center')
+    with col1:
+        metrics.enabled = st.toggle("Record stage timings", value=metrics.enabled,
+                                    help="Applies to every session of this process")
+    with col2:
+        st.button("Refresh", use_container_width=True)
+    with col3:
+        if st.button("Reset", use_container_width=True):
+            metrics.reset()
+            micro_batcher.reset_stats()
+
+    stages = pd.DataFrame(metrics.snapshot())
+    if stages.empty:
+        st.info("Nothing recorded yet. Make a prediction on the Demo or Clinician Portal page.")
+    else:
+        stages = stages.set_index('stage')
+        st.dataframe(stages.style.format({'total_s': "{:.3f}", 'mean_ms': "{:.3f}", 'p50_ms': "{:.3f}",
+                                          'p95_ms': "{:.3f}", 'p99_ms': "{:.3f}", 'max_ms': "{:.3f}"}),
+                     use_container_width=True)
+        st.caption("Percentiles and max are over the last calls of each stage; counts and totals are cumulative. "
+                   "'compiled_pipeline.*' are the parts of the single-pass pipeline the app runs: copying the "
+                   "numeric inputs, the BMI and BP categories, encoding the categories and standardising.")
+        st.bar_chart(stages['p95_ms'].rename("p95 (ms)"), horizontal=True, y_label="", x_label="p95 (ms)")
+
+    with st.expander("Micro-batching", icon=":material/stacks:"):
+        st.json(micro_batcher.stats())
+
+    with st.expander("Prediction cache", icon=":material/cached:"):
+        st.json(prediction_cache.stats())
+
+    with st.expander("Google Sheet writes", icon=":material/table:"):
+        from helper import forms
+        if forms._sheet_writer is None:
+            st.write("No row has been written by this process yet.")
+        else:
+            st.json(forms._sheet_writer.stats())
+
+    with st.expander("Retraining", icon=":material/model_training:"):
+        retraining()
+
+    with st.expander("Prometheus", icon=":material/monitoring:"):
+        text = metrics.prometheus()
+        st.download_button("Download", text, file_name="metrics.txt", mime="text/plain")
+        st.code(text, language=None)
+
+
+def retraining():
+    from config import RETRAIN_INTERVAL, RETRAIN_MIN_ROWS
+    from helper.retrain import history, retrain_job, rollback
+
+    st.caption("Retrains the model on data.csv and the clinicians' evaluations (\"Sleep Data\" worksheet), "
+               "and deploys it only if its macro-F1 on held-out rows does not drop.")
+    col1, col2 = st.columns([2, 1], vertical_alignment='center')
+    with col1:
+        force = st.checkbox(f"Even with fewer than {RETRAIN_MIN_ROWS} new evaluations")
+        scheduled = st.toggle(f"Retrain every {RETRAIN_INTERVAL / 3600:g} h", value=retrain_job.interval is not None)
+        if scheduled and retrain_job.interval is None:
+            retrain_job.schedule(RETRAIN_INTERVAL)
+        elif not scheduled and retrain_job.interval is not None:
+            retrain_job.unschedule()
+    with col2:
+        if st.button("Retrain now", use_container_width=True, disabled=retrain_job.status()['running']):
+            retrain_job.trigger(force=force)
+    st.json(retrain_job.status())
+
+    versions = history()
+    if versions:
+        st.dataframe(pd.DataFrame(versions).set_index('version'), use_container_width=True)
+        previous = [info['version'] for info in versions if not info['deployed']]
+        col1, col2 = st.columns([2, 1], vertical_alignment='bottom')
+        with col1:
+            version = st.selectbox("Version", previous, disabled=not previous)
+        with col2:
+            if st.button("Roll back", use_container_width=True, disabled=not previous):
+                try:
+                    st.success(f"Deployed {rollback(version)}")
+                except (RuntimeError, ValueError) as e:
+                    st.error(str(e))
+
+
+if not st.session_state.get("admin_logged_in", False):
+    login()
+    st.stop()
+
+main()
@@ -3,34 +3,22 @@ Demo App
 """
 
 import streamlit as st
-import pickle, sys, os, warnings
+import sys, os
 from helper.utils import UserDataCollector
 import pandas as pd
 
 # Setting directory to be parent root directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from transformers import BMICategorizer, pipeline, BPClassifier, SavedEncoderTransformer, SavedScalerTransformer, FeatureCorrecter
-from config import MODEL_FILE, FEATURE_ENCODER, TARGET_ENCODER, BANNER_IMAGE, LOGO_IMAGE, SCALER_FILE
-
-
-def load_model_and_encoders():
-    """Fetches the neccessary files and load them"""
-    with open(MODEL_FILE, 'rb') as f:
-        model = pickle.load(f)
-
-    with open(TARGET_ENCODER, 'rb') as f:
-        t_encoder = pickle.load(f)
-
-    with open(FEATURE_ENCODER, 'rb') as f:
-        f_encoder = pickle.load(f)
-    
-    return model, t_encoder, f_encoder
+from transformers import BMICategorizer, BPClassifier
+from config import BANNER_IMAGE
+from helper.artifacts import registry
+from helper.predictor import predict
 
 
 def main():
-    # Loading my models
-    model, t_encoder, f_encoder = load_model_and_encoders()
+    # Loading my models (shared across sessions; only reloaded when the files change)
+    artifacts = registry.artifacts()
 
 
     # Streamlit App Header
@@ -169,17 +157,12 @@ def main():
     col1, col2, col3 = st.columns([1, 3, 1], vertical_alignment='center', gap= 'small')
     with col2:
         if st.button("Predict", disabled= is_incomplete, type = 'primary', use_container_width=True):
-                # Preprocessing
+                # Preprocessing and prediction (cached across sessions for identical inputs)
             try:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", category=FutureWarning)
-                    trans_data = pipeline.transform(df)
+                result, proba = predict(df, artifacts)
             except Exception as e:
                 st.error(f"🚨 An error occurred: {e}")
-
-            pred = model.predict(trans_data)
-            proba = model.predict_proba(trans_data).max()
-            result = t_encoder.inverse_transform(pred)
+                st.stop()
 
             st.success(f"🧠 Sleep disorder prediction: **{result}** with **{proba:.2%}** confidence")
             st.session_state.predicted = True
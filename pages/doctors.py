@@ -1,38 +1,26 @@
 import streamlit as st
-import pickle, sys, os, warnings
+import sys, os
 from helper.utils import UserDataCollector
 import pandas as pd
 
 # Setting directory to be parent root directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from transformers import BMICategorizer, pipeline, BPClassifier, SavedEncoderTransformer, SavedScalerTransformer, FeatureCorrecter
-from config import MODEL_FILE, FEATURE_ENCODER, TARGET_ENCODER, BANNER_IMAGE, LOGO_IMAGE, SCALER_FILE
+from config import BANNER_IMAGE, LOGO_IMAGE
+from helper.artifacts import registry
+from helper.predictor import predict
+from helper.explainer import explanation_service
 from helper.forms import doctor_form, update_or_create_sheet
 
 
 
-def load_model_and_encoders():
-    """Fetches the neccessary files and load them"""
-    with open(MODEL_FILE, 'rb') as f:
-        model = pickle.load(f)
-
-    with open(TARGET_ENCODER, 'rb') as f:
-        t_encoder = pickle.load(f)
-
-    with open(FEATURE_ENCODER, 'rb') as f:
-        f_encoder = pickle.load(f)
-    
-    return model, t_encoder, f_encoder
-
-
 @st.dialog("Feedback Form")
 def show_feedback_form():
     doctor_form()
 
 def main():
-    # Loading my models
-    model, t_encoder, f_encoder = load_model_and_encoders()
+    # Loading my models (shared across sessions; only reloaded when the files change)
+    artifacts = registry.artifacts()
 
 
     # Streamlit App Header
@@ -183,18 +171,13 @@ def main():
     col1, col2, col3 = st.columns([1,3,1], vertical_alignment='center', gap= 'small')
     with col2:
         if st.button("Predict", disabled= is_incomplete, type = 'primary', use_container_width=True):
-                # Preprocessing
+                # Preprocessing and prediction (cached across sessions for identical inputs)
             try:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", category=FutureWarning)
-                    trans_data = pipeline.transform(df)
+                result, proba = predict(df, artifacts)
             except Exception as e:
                 st.error(f"An error occurred: {e}")
                 st.stop()
 
-            pred = model.predict(trans_data)
-            proba = model.predict_proba(trans_data).max()
-            result = t_encoder.inverse_transform(pred)[0]
             st.session_state.predicted_value = result
             st.session_state.probability = f"{proba:.2%}"
 
@@ -204,6 +187,20 @@ def main():
  
     # After Prediction - Collect Doctor Feedback
     if st.session_state.predicted:
+        # Why the model made this prediction (SHAP values, cached per patient)
+        with st.expander("Why this prediction?", icon=":material/insights:"):
+            try:
+                with st.spinner("Explaining the prediction..."):
+                    contributions = explanation_service.explain(st.session_state.df, artifacts)
+            except Exception as e:
+                st.error(f"Could not explain this prediction: {e}")
+            else:
+                predicted = st.session_state.predicted_value
+                impact = contributions[predicted].sort_values(key=abs, ascending=False)
+                st.bar_chart(impact.rename("Impact"), horizontal=True, y_label="", x_label=f"Impact on P({predicted})")
+                st.caption(f"Features with positive values made **{predicted}** more likely for this patient; "
+                           "negative values made it less likely.")
+
         st.markdown("---")
         st.expander("Prediction Evaluation", expanded=True)
 
@@ -224,6 +221,7 @@ def main():
             data_to_save["Prediction_Correct"] = feedback_correct
             data_to_save["Correct_Diagnosis"] = correct_diagnosis if correct_diagnosis else st.session_state.predicted_value
             update_or_create_sheet("Sleep Data", data_to_save)
+            st.success("Thank you! Your evaluation has been saved.")
 
 
         
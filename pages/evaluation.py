@@ -1,94 +1,95 @@
-import matplotlib.pyplot as plt
+import io
 import streamlit as st
-import seaborn as sns
-import pickle 
 import pandas as pd
-import numpy as np
 
 
-from sklearn.metrics import (
-    average_precision_score,
-    precision_recall_curve,
-    log_loss
-)
-from sklearn.preprocessing import label_binarize
+from helper.evaluation_bundle import build_bundle, load_bundle
 
 
-# Setting the path to root __dir__
-#sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-# from config import MODEL_EVAL
+@st.cache_data(show_spinner=False)
+def rebuild_bundle(model_sha256, evaluation_sha256):
+    """Slow path, once per model version: the saved bundle is missing or out of date."""
+    return build_bundle()
 
-# Load the evaluation metrics and model pickle files
-with open('models/model_evaluation.pkl', 'rb') as f:
-    full_metrics = pickle.load(f)
 
-with open('models/model.pkl', 'rb') as f:
-    model = pickle.load(f)
+# Everything on this page is precomputed for the current model (see helper/evaluation_bundle.py)
+bundle = load_bundle()
+if bundle is None:
+    from helper.evaluation_bundle import bundle_key
+    with st.spinner("Preparing the evaluation of the current model..."):
+        key = bundle_key()
+        bundle = rebuild_bundle(key['model_sha256'], key['evaluation_sha256'])
 
 
 # Extracting test and train metrics
-evaluation_metrics = full_metrics['test_metrics']
-train_metrics = full_metrics['train_metrics']
+evaluation_metrics = bundle['test']
+train_metrics = bundle['train']
 
 # Extracting test metrics
 report = evaluation_metrics['classification_report']
-matrix= evaluation_metrics['confusion_matrix']
-class_names = evaluation_metrics['class_names']
+matrix = evaluation_metrics['confusion_matrix']
+class_names = bundle['class_names']
+pr_curves = evaluation_metrics['pr_curves']
 
 
-# ----- Extracting values needed for ROC-AUC, Log Loss and PR AUC --------
-y_true= evaluation_metrics["y_test"]
-X_test= evaluation_metrics["X_test"]
-y_pred_proba = model.predict_proba(X_test) # For log loss, roc auc
-y_true_bin = label_binarize(y_true, classes=range(3)) # Label binarisation for One-vs-Rest evaluation
+def figure_to_png(fig) -> bytes:
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    return buffer.getvalue()
 
 
+# Figures are only drawn when asked for, once per model version (matplotlib is imported then too)
+@st.cache_data(show_spinner=False)
+def confusion_matrix_png(model_sha256, matrix, class_names) -> bytes:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
-# Function to display confusion matrix
-def plot_confusion_matrix(matrix, class_names):
     fig, ax = plt.subplots(figsize=(8, 6))
     sns.heatmap(matrix, annot=True, fmt="d", cmap="Blues", xticklabels=class_names, yticklabels=class_names, cbar=False, ax=ax)
     ax.set_xlabel('Predicted')
     ax.set_ylabel('True')
     ax.set_title('Confusion Matrix')
-    st.pyplot(fig)
+    png = figure_to_png(fig)
+    plt.close(fig)
+    return png
+
+@st.cache_data(show_spinner=False)
+def pr_curve_png(model_sha256, cls, precision, recall, pr_auc) -> bytes:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.plot(recall, precision, label=f'PR AUC = {pr_auc:.2f}')
+    ax.set_xlabel("Recall")
+    ax.set_ylabel("Precision")
+    ax.set_title(f"Precision-Recall Curve – {cls}")
+    ax.legend(loc='lower left')
+    png = figure_to_png(fig)
+    plt.close(fig)
+    return png
+
+# Function to display confusion matrix
+def plot_confusion_matrix(matrix, class_names):
+    st.image(confusion_matrix_png(bundle['model_sha256'], matrix, class_names))
 
 # Function to display classification report as a table
 def display_classification_report(report):
     df = pd.DataFrame(report).transpose()
     st.dataframe(df)
 
-@st.cache_resource
-def compute_auc_pr_summary():
-    summary_data = []
-    fig_dict = {}
-
-    for i, cls in enumerate(class_names):
-        precision, recall, _ = precision_recall_curve(y_true_bin[:, i], y_pred_proba[:, i])
-        pr_auc = average_precision_score(y_true_bin[:, i], y_pred_proba[:, i])
-        summary_data.append((cls, pr_auc))
-
-        # Plot
-        fig, ax = plt.subplots()
-        ax.plot(recall, precision, label=f'PR AUC = {pr_auc:.2f}')
-        ax.set_xlabel("Recall")
-        ax.set_ylabel("Precision")
-        ax.set_title(f"Precision-Recall Curve – {cls}")
-        ax.legend(loc='lower left')
-        fig_dict[cls] = fig
-
-    return summary_data, fig_dict
-
 
 def auc_pr():
-    summary_data, pr_figures = compute_auc_pr_summary()
-
     # Summary section
     st.subheader("Precision-Recall AUC Summary")
-    for cls, auc_score in summary_data:
-        st.markdown(f"- **{cls}**: PR AUC = `{auc_score:.4f}`")
     for cls in class_names:
-        st.pyplot(pr_figures[cls])
+        st.markdown(f"- **{cls}**: PR AUC = `{pr_curves[cls]['average_precision']:.4f}`")
+    if st.toggle("Show precision-recall curves", key="show_pr_curves"):
+        for cls in class_names:
+            curve = pr_curves[cls]
+            st.image(pr_curve_png(bundle['model_sha256'], cls, curve['precision'], curve['recall'], curve['average_precision']))
 
 text = """
 This page offers a transparent overview of the modelling process behind the **Sleep Disorder Classifier**. It contains key insights into my thought process, model selection (SVC with `probability=True`), and hyperparameters used. I’ve also included evaluation metrics that reflect how the model performs across the three sleep disorder categories: **None**, **Sleep Apnea**, and **Insomnia**.
@@ -145,7 +146,9 @@ with st.expander("Classification Report"):
 
 # Show Confusion Matrix
 with st.expander("Confusion Matrix"):
-    plot_confusion_matrix(matrix, class_names)
+    st.dataframe(pd.DataFrame(matrix, index=class_names, columns=class_names))
+    if st.toggle("Show heatmap", key="show_confusion_matrix"):
+        plot_confusion_matrix(matrix, class_names)
 
 # Show SHAP Values Plot
 with st.expander("SHAP Values Summary"):
@@ -159,8 +162,7 @@ with st.expander("Precision-Recall AUC (PR AUC)"):
 
 # --- Log Loss ---
 with st.expander(" Log Loss (Cross-Entropy)"):
-    loss = log_loss(y_true, y_pred_proba)
-    st.metric("Log Loss", f"{loss:.3f}")
+    st.metric("Log Loss", f"{evaluation_metrics['log_loss']:.3f}")
 
 
 # # Allow users to download the classification report and other details as a CSV or text file
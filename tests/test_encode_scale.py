@@ -0,0 +1,60 @@
+"""
+EncodeScaleTransformer against the saved_encoder and saved_scaler steps it fuses.
+
+Run from the project root: `python -m pytest tests`.
+"""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks._common import synthetic_frame
+from config import CAT_FEATURES, FEATURE_ENCODER, SCALER_FILE
+from transformers import (BMICategorizer, BPClassifier, EncodeScaleTransformer, FeatureCorrecter,
+                          SavedEncoderTransformer, SavedScalerTransformer)
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    with open(FEATURE_ENCODER, 'rb') as f:
+        f_encoder = pickle.load(f)
+    with open(SCALER_FILE, 'rb') as f:
+        scaler = pickle.load(f)
+    return f_encoder, scaler
+
+
+def stage_input(n_rows):
+    """The output of FeatureCorrecter, with an unknown and a missing value in every categorical column."""
+    frame = FeatureCorrecter().transform(BPClassifier().transform(BMICategorizer().transform(synthetic_frame(n_rows))))
+    rng = np.random.default_rng(n_rows)
+    for col in CAT_FEATURES:
+        rows = rng.choice(n_rows, size=min(3, n_rows), replace=False)
+        frame.loc[rows, col] = pd.Series(['Others', None, np.nan][:len(rows)], index=rows, dtype=object)
+    return frame
+
+
+# Single rows, the value-by-value path, the block path and more than one block
+@pytest.mark.parametrize('n_rows', [1, 3, EncodeScaleTransformer.SMALL + 1, EncodeScaleTransformer.BLOCK + 3])
+@pytest.mark.parametrize('dtype, tolerance', [(np.float64, 1e-12), (np.float32, 1e-6)])
+def test_matches_encoder_and_scaler(fitted, n_rows, dtype, tolerance):
+    f_encoder, scaler = fitted
+    frame = stage_input(n_rows)
+    expected = SavedScalerTransformer(scaler).transform(SavedEncoderTransformer(f_encoder, CAT_FEATURES).transform(frame))
+
+    out = np.empty(expected.shape, dtype=dtype)
+    result = EncodeScaleTransformer(f_encoder, scaler, CAT_FEATURES).transform(frame, out=out)
+
+    assert result is out
+    np.testing.assert_allclose(result, expected, rtol=tolerance, atol=tolerance)
+
+
+def test_rejects_wrong_out(fitted):
+    f_encoder, scaler = fitted
+    frame = stage_input(3)
+    stage = EncodeScaleTransformer(f_encoder, scaler, CAT_FEATURES)
+    with pytest.raises(ValueError):
+        stage.transform(frame, out=np.empty((3, len(scaler.feature_names_in_)), dtype=np.int64))
+    with pytest.raises(ValueError):
+        stage.transform(frame, out=np.empty((2, len(scaler.feature_names_in_))))
@@ -0,0 +1,48 @@
+"""
+The sklearn pipeline and CompiledPipeline accept and reject the same input columns.
+
+Run from the project root: `python -m pytest tests`.
+"""
+
+import numpy as np
+import pytest
+
+from benchmarks._common import synthetic_frame
+from transformers.pipeline import default_compiled_pipeline, default_pipeline
+
+# The app's pipeline is never fitted (its steps are)
+pytestmark = pytest.mark.filterwarnings("ignore::FutureWarning")
+
+
+@pytest.fixture
+def frame():
+    """Validated-style rows with a "Blood Pressure" string."""
+    return synthetic_frame(5)
+
+
+def pairs(frame):
+    """The same rows with "Systolic BP" and "Diastolic BP", as the app pages send them."""
+    systolic, diastolic = frame.pop('Blood Pressure').str.split('/', expand=True).astype(float).T.to_numpy()
+    return frame.assign(**{'Systolic BP': systolic, 'Diastolic BP': diastolic})
+
+
+@pytest.mark.parametrize('layout', [lambda f: f, pairs])
+def test_valid_input_is_accepted_by_both(frame, layout):
+    frame = layout(frame)
+    assert np.array_equal(default_compiled_pipeline.transform(frame), default_pipeline.transform(frame))
+
+
+@pytest.mark.parametrize('column', ['Weight Unit', 'Person ID'])
+def test_extra_column_is_rejected_by_both(frame, column):
+    frame[column] = 1
+    for transform in (default_pipeline.transform, default_compiled_pipeline.transform):
+        with pytest.raises(ValueError, match="unexpected columns"):
+            transform(frame)
+
+
+@pytest.mark.parametrize('column', ['Daily Steps', 'Occupation'])
+def test_missing_column_is_rejected_by_both(frame, column):
+    frame = frame.drop(columns=[column])
+    for transform in (default_pipeline.transform, default_compiled_pipeline.transform):
+        with pytest.raises(ValueError):
+            transform(frame)
@@ -0,0 +1,66 @@
+"""
+Predictions of the exported bundle against the pickled SVC it was exported from, through
+sklearn's libsvm binding and through the numpy fallback.
+
+Run from the project root: `python -m pytest tests`.
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+import helper.model_bundle as model_bundle
+from benchmarks._common import synthetic_frame
+from config import MODEL_FILE
+from transformers.pipeline import default_compiled_pipeline
+
+
+@pytest.fixture(scope='module')
+def model():
+    with open(MODEL_FILE, 'rb') as f:
+        return pickle.load(f)
+
+
+@pytest.fixture(scope='module')
+def X():
+    return default_compiled_pipeline.transform(synthetic_frame(500))
+
+
+@pytest.fixture(scope='module')
+def bundle_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('bundle')
+    model_bundle.export_bundle(directory)
+    return directory
+
+
+def test_libsvm_predictions_equal_the_pickle(bundle_dir, model, X):
+    bundled = model_bundle.load_model_bundle(bundle_dir).model
+    assert bundled._libsvm is not None
+
+    assert np.array_equal(bundled.predict(X), model.predict(X))
+    assert np.array_equal(bundled.predict_proba(X), model.predict_proba(X))
+    assert np.array_equal(bundled.decision_function(X), model.decision_function(X))
+
+
+def test_numpy_fallback_matches_the_pickle(bundle_dir, model, X, monkeypatch):
+    # As if sklearn.svm._libsvm could not be imported
+    monkeypatch.setattr(model_bundle, '_private_libsvm', lambda: None)
+    bundled = model_bundle.load_model_bundle(bundle_dir).model
+    assert bundled._libsvm is None
+
+    assert np.array_equal(bundled.predict(X), model.predict(X))
+    np.testing.assert_allclose(bundled.predict_proba(X), model.predict_proba(X), rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(bundled.decision_function(X), model.decision_function(X), rtol=1e-9, atol=1e-12)
+
+
+def test_changed_bundle_fails_its_hash_check(bundle_dir, tmp_path):
+    for path in bundle_dir.iterdir():
+        (tmp_path / path.name).write_bytes(path.read_bytes())
+    arrays = next(tmp_path.glob('arrays-*.bin'))
+    raw = bytearray(arrays.read_bytes())
+    raw[-1] ^= 1
+    arrays.write_bytes(bytes(raw))
+
+    with pytest.raises(ValueError, match="content hash"):
+        model_bundle.load_model_bundle(tmp_path)
@@ -0,0 +1,176 @@
+"""
+The journalled model swap and its crash recovery (helper/artifacts.py), and promotion, rollback
+and pruning of the model history (helper/retrain.py), on a copy of models/ in a temporary directory.
+
+Run from the project root: `python -m pytest tests`.
+"""
+
+import copy
+import functools
+import json
+import os
+import pickle
+import shutil
+import time
+import types
+
+import pytest
+
+import helper.artifacts as artifacts
+import helper.evaluation_bundle as evaluation_bundle
+import helper.model_bundle as model_bundle
+import helper.retrain as retrain
+from config import RETRAIN_HISTORY
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+# ------------- Swap and recovery --------------
+@pytest.fixture
+def staged(tmp_path):
+    """Two files with their new content staged, and the journal of a swap that died before its renames."""
+    files = {}
+    for name in ('a.pkl', 'b.pkl'):
+        destination = tmp_path / name
+        write(destination, 'old')
+        write(f"{destination}.swap", 'new')
+        files[str(destination)] = f"{destination}.swap"
+    journal = tmp_path / '.swap.json'
+    write(journal, json.dumps({'started': time.time(), 'files': files}))
+    return files, journal
+
+
+def test_swap_replaces_every_file(tmp_path):
+    destinations = [tmp_path / 'a.pkl', tmp_path / 'b.pkl']
+    for destination in destinations:
+        write(destination, 'old')
+        write(f"{destination}.new", 'new')
+    journal = tmp_path / '.swap.json'
+
+    artifacts.swap_files({d: f"{d}.new" for d in destinations}, journal)
+
+    assert [read(d) for d in destinations] == ['new', 'new']
+    assert not journal.exists()
+    assert not any(os.path.exists(f"{d}.swap") for d in destinations)
+
+
+def test_interrupted_swap_is_completed_by_recover_swap(staged):
+    files, journal = staged
+    assert artifacts.recover_swap(journal)
+    assert [read(d) for d in files] == ['new', 'new']
+    assert not journal.exists()
+    assert not artifacts.recover_swap(journal)
+
+
+def test_interrupted_half_renamed_swap_is_completed(staged):
+    files, journal = staged
+    first = next(iter(files))
+    os.replace(files[first], first)  # died after the first rename
+    assert artifacts.recover_swap(journal)
+    assert [read(d) for d in files] == ['new', 'new']
+
+
+def test_unreadable_journal_leaves_the_old_files(tmp_path):
+    write(tmp_path / 'a.pkl', 'old')
+    journal = tmp_path / '.swap.json'
+    write(journal, '{"files": ')  # died while writing it
+    assert not artifacts.recover_swap(journal)
+    assert read(tmp_path / 'a.pkl') == 'old'
+    assert not journal.exists()
+
+
+def test_recent_journal_is_a_swap_in_progress(staged):
+    files, journal = staged
+    assert artifacts.swap_in_progress(journal)
+    assert [read(d) for d in files] == ['old', 'old']
+
+
+def test_stale_journal_of_a_running_swapper_is_left_alone(staged):
+    files, journal = staged
+    old = time.time() - 2 * artifacts.SWAP_TIMEOUT
+    os.utime(journal, (old, old))
+    with artifacts._swap_lock(journal):  # the swapper is still running
+        assert artifacts.swap_in_progress(journal)
+        assert [read(d) for d in files] == ['old', 'old']
+    # Once it is gone, the journal it left is completed
+    assert not artifacts.swap_in_progress(journal)
+    assert [read(d) for d in files] == ['new', 'new']
+    assert not journal.exists()
+
+
+# ------------- Promotion, rollback and pruning --------------
+@pytest.fixture
+def models_dir(tmp_path, monkeypatch):
+    """A copy of the model files; helper.retrain and the swap read and write there instead of models/."""
+    models = tmp_path / 'models'
+    models.mkdir()
+    files = [models / os.path.basename(path) for path in retrain.MODEL_FILES]
+    for source, copied in zip(retrain.MODEL_FILES, files):
+        shutil.copyfile(source, copied)
+    registry_files = {name: models / os.path.basename(path) for name, path in artifacts.ArtifactRegistry.MODEL_FILES.items()}
+    model_version, load_state, save_state = artifacts.model_version, retrain.load_state, retrain.save_state
+
+    monkeypatch.setattr(retrain, 'MODEL_FILES', files)
+    monkeypatch.setattr(retrain, 'MODEL_FILE', models / os.path.basename(retrain.MODEL_FILE))
+    monkeypatch.setattr(retrain, 'MODEL_HISTORY_DIR', str(tmp_path / 'history'))
+    monkeypatch.setattr(retrain, 'model_version', lambda directory=None: model_version(directory or models))
+    monkeypatch.setattr(retrain, 'swap_files', functools.partial(artifacts.swap_files, journal=models / '.swap.json'))
+    monkeypatch.setattr(retrain, 'exclusive', functools.partial(retrain.exclusive, tmp_path))
+    monkeypatch.setattr(retrain, 'load_state', lambda: load_state(tmp_path / 'state.json'))
+    monkeypatch.setattr(retrain, 'save_state', lambda state: save_state(state, tmp_path / 'state.json'))
+    monkeypatch.setattr(artifacts.ArtifactRegistry, 'MODEL_FILES', registry_files)
+    # The bundles are rebuilt from models/ and the process-wide registry reloads it: both are
+    # covered elsewhere, and must not touch the real files here
+    monkeypatch.setattr(model_bundle, 'export_bundle', lambda: None)
+    monkeypatch.setattr(evaluation_bundle, 'build_bundle', lambda: None)
+    monkeypatch.setattr(retrain, 'registry', types.SimpleNamespace(reload=lambda: None))
+    return models
+
+
+def retrained(c):
+    """The deployed model, encoders and scaler, with the SVC's C changed (a different version)."""
+    objects = {}
+    for name, path in artifacts.ArtifactRegistry.MODEL_FILES.items():
+        with open(path, 'rb') as f:
+            objects[name] = pickle.load(f)
+    objects['model'] = copy.copy(objects['model'])
+    objects['model'].C = c
+    return objects
+
+
+def test_promote_then_rollback_restores_the_previous_version(models_dir):
+    before = retrain.model_version()
+
+    promoted = retrain.promote(retrained(2.0), {}, {'candidate_f1': 1.0})
+    assert promoted != before
+    assert retrain.model_version() == promoted
+    assert {info['version']: info['deployed'] for info in retrain.history()} == {promoted: True, before: False}
+
+    assert retrain.rollback() == before
+    assert retrain.model_version() == before
+    assert not os.path.exists(models_dir / '.swap.json')
+
+
+def test_rollback_without_history_fails(models_dir):
+    with pytest.raises(ValueError):
+        retrain.rollback()
+
+
+def test_prune_keeps_retrain_history_versions(models_dir):
+    versions = [retrain.model_version()]
+    for i in range(RETRAIN_HISTORY + 2):
+        time.sleep(0.002)  # 'created' has millisecond resolution
+        versions.append(retrain.promote(retrained(2.0 + i), {}, {}))
+
+    entries = retrain.history()
+    assert entries[0]['version'] == versions[-1] and entries[0]['deployed']
+    # The deployed version and the RETRAIN_HISTORY newest others
+    assert [info['version'] for info in entries] == versions[::-1][:RETRAIN_HISTORY + 1]
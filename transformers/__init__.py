@@ -1,17 +1,35 @@
-from .bmi_categorizer import BMICategorizer
-from .bp_classifier import BPClassifier
-from .feature_correcter import FeatureCorrecter
-from .saved_encoder import SavedEncoderTransformer
-from .saved_scaler import SavedScalerTransformer
-from .pipeline import pipeline
-
-__all__ = [
-    'BMICategorizer',
-    'BPClassifier',
-    'FeatureCorrecter',
-    'SavedEncoderTransformer',
-    'SavedScalerTransformer',
-    'pipeline'
-]
-
-__version__ = '1.0.0'
\ No newline at end of file
+import importlib
+
+# Each name is imported from its module on first use (PEP 562), so `import transformers`
+# neither imports sklearn nor loads any artifact until a transformer is actually needed.
+# `default_pipeline` and `default_compiled_pipeline` are built by transformers/pipeline.py from the pickles.
+_LAZY = {
+    'BMICategorizer': 'bmi_categorizer',
+    'BPClassifier': 'bp_classifier',
+    'FeatureCorrecter': 'feature_correcter',
+    'FeatureSchema': 'feature_correcter',
+    'SavedEncoderTransformer': 'saved_encoder',
+    'SavedScalerTransformer': 'saved_scaler',
+    'EncodeScaleTransformer': 'encode_scale',
+    'CompiledPipeline': 'compiled',
+    'build_pipeline': 'pipeline',
+    'default_pipeline': 'pipeline',
+    'default_compiled_pipeline': 'pipeline',
+}
+
+__all__ = list(_LAZY)
+
+__version__ = '1.0.0'
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_LAZY[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
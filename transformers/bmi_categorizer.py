@@ -1,51 +1,67 @@
 from sklearn.base import BaseEstimator, TransformerMixin
+import numpy as np
 import pandas as pd
 
 class BMICategorizer(BaseEstimator, TransformerMixin):
     """
     Calculates BMI Category based on gender-specific criteria.
     """
+    # Upper BMI bounds (inclusive) for 'Normal Weight' and 'Overweight'; anything above is 'Obese'
+    THRESHOLDS = {
+        'male': (25, 30),
+        'female': (24, 39),
+    }
+    LABELS = np.array(['Unknown', 'Normal Weight', 'Overweight', 'Obese'], dtype=object)
+
     def fit(self, X, y=None):
         self.is_fitted_ = True
         return self
 
     def transform(self, X):
-        
+
         X = X.copy()
-        
+
         # Ensure 'weight', 'height', and 'Gender' columns exist in the data
         if 'Weight' in X.columns and 'Height' in X.columns and 'Gender' in X.columns:
             # Calculate BMI
-            X['BMI'] = X['Weight'] / (X['Height'] ** 2)
-            
-            def categorize(row):
-                bmi = row['BMI']
-                gender = str(row['Gender']).lower() if isinstance(row['Gender'], str) else None
-                if gender == 'male':
-                    if bmi <= 25: 
-                        return 'Normal Weight'
-                    elif bmi <= 30: 
-                        return 'Overweight'
-                    else: 
-                        return 'Obese'
-                    
-                elif gender == 'female':
-                    if bmi <= 24: 
-                        return 'Normal Weight'
-                    elif bmi <= 39: 
-                        return 'Overweight'
-                    else: 
-                        return 'Obese'
-
-                else:
-                    return 'Unknown'  # If gender is not recognized
-                
-            # Apply categorization logic
-            X['BMI Category'] = X.apply(categorize, axis=1)
-            
-            # Drop the 'weight', 'height', and 'BMI' columns as they are no longer needed
-            X.drop(columns=['Weight', 'Height', 'BMI'], inplace=True)
+            bmi = (X['Weight'] / (X['Height'] ** 2)).to_numpy(dtype=float)
+
+            # Apply categorization logic on whole columns at once
+            X['BMI Category'] = self.categorize(bmi, X['Gender'].to_numpy(dtype=object))
+
+            # Drop the 'weight', 'height', and any stale 'BMI' columns as they are no longer needed
+            X.drop(columns=['Weight', 'Height', 'BMI'], errors='ignore', inplace=True)
         else:
             raise ValueError("DataFrame must contain 'Weight', 'Height', and 'Gender' columns.")
-        
+
         return X
+
+    @classmethod
+    def categorize(cls, bmi, gender):
+        """
+        Vectorised BMI categorisation.
+
+        Arguments:
+            bmi : array-like of float
+                BMI values.
+            gender : array-like
+                Gender values. Anything that is not the string 'male' or 'female'
+                (case-insensitive) is categorised as 'Unknown'.
+
+        Returns:
+            numpy array of category labels (dtype object).
+        """
+        bmi = np.asarray(bmi, dtype=float)
+
+        # There are only a handful of distinct genders, so normalise the uniques rather than every row.
+        # Non-string genders (None, NaN, numbers) must not be coerced into a match.
+        codes, uniques = pd.factorize(np.asarray(gender, dtype=object))
+        lowered = np.array([g.lower() if isinstance(g, str) else None for g in uniques], dtype=object)
+
+        # Work on indices into LABELS and only look up the strings at the end
+        index = np.zeros(bmi.shape, dtype=np.intp)
+        for name, (normal, overweight) in cls.THRESHOLDS.items():
+            mask = np.isin(codes, np.flatnonzero(lowered == name))
+            # A NaN BMI fails both comparisons and falls through to 'Obese', as before
+            index[mask] = np.select([bmi[mask] <= normal, bmi[mask] <= overweight], [1, 2], default=3)
+        return cls.LABELS[index]
@@ -1,10 +1,14 @@
 from sklearn.base import BaseEstimator, TransformerMixin
+import numpy as np
 import pandas as pd
 
 class BPClassifier(BaseEstimator, TransformerMixin):
     """
     Classifies blood pressure into categories.
     """
+    LABELS = np.array(['Unknown', 'Low', 'Normal', 'Elevated', 'High BP (Stage 1)', 'High BP (Stage 2)'],
+                      dtype=object)
+
     def fit(self, X, y=None):
         self.is_fitted_ = True
         return self
@@ -14,28 +18,72 @@ class BPClassifier(BaseEstimator, TransformerMixin):
 
         # Ensure that 'Blood Pressure' exists in the DataFrame
         if 'Blood Pressure' in X.columns:
-            # Handle missing or invalid values in 'Blood Pressure'
-            def split_bp(bp_value):
-                try:
-                    systolic, diastolic = bp_value.split('/')
-                    return int(systolic), int(diastolic)
-                except (ValueError, AttributeError):
-                    return None, None  # Handle invalid format
-
-            X[['Systolic BP', 'Diastolic BP']] = X['Blood Pressure'].apply(lambda x: pd.Series(split_bp(x)))
+            # Invalid or missing values become NaN
+            X['Systolic BP'], X['Diastolic BP'] = self.split_bp(X['Blood Pressure'])
             X.drop(columns=['Blood Pressure'], inplace=True)
 
         # Check if 'Systolic BP' and 'Diastolic BP' are available and classify BP
         if 'Systolic BP' in X.columns and 'Diastolic BP' in X.columns:
-            # Use element-wise comparison for proper row-wise checking
-            X['BP Category'] = X.apply(
-                lambda row: self.classify_bp(row['Systolic BP'], row['Diastolic BP']), axis=1)
+            X['BP Category'] = self.classify_bp_array(
+                pd.to_numeric(X['Systolic BP'], errors='coerce'),
+                pd.to_numeric(X['Diastolic BP'], errors='coerce'))
 
             # Drop the 'Systolic BP' and 'Diastolic BP' columns as they're no longer needed
             X.drop(columns=['Systolic BP', 'Diastolic BP'], inplace=True)
 
         return X
 
+    @staticmethod
+    def split_bp(bp):
+        """
+        Splits a column of "120/80" strings into systolic and diastolic arrays.
+
+        Readings repeat a lot, so each distinct string is parsed once and the result
+        is broadcast back to every row that holds it.
+
+        Arguments:
+            bp : array-like
+                Blood Pressure strings.
+
+        Returns:
+            (systolic, diastolic) float arrays, NaN where the value cannot be parsed.
+        """
+        codes, uniques = pd.factorize(np.asarray(bp, dtype=object))
+
+        # One extra slot at the end stays NaN for missing values (code -1)
+        parsed = np.full((len(uniques) + 1, 2), np.nan)
+        for i, bp_value in enumerate(uniques):
+            try:
+                systolic, diastolic = bp_value.split('/')
+                parsed[i] = int(systolic), int(diastolic)
+            except (ValueError, AttributeError):
+                pass  # Invalid format stays NaN
+
+        values = parsed[codes]
+        return values[:, 0], values[:, 1]
+
+    @classmethod
+    def classify_bp_array(cls, systolic, diastolic):
+        """
+        Vectorised version of `classify_bp`. NaN values fail every check and end up 'Unknown'.
+        """
+        s = np.asarray(systolic, dtype=float)
+        d = np.asarray(diastolic, dtype=float)
+
+        # The order of the conditions matters: the first match wins, exactly as in `classify_bp`
+        index = np.select(
+            [
+                (s < 90) | (d < 60),
+                (90 <= s) & (s <= 120) & (60 <= d) & (d <= 80),
+                (120 <= s) & (s < 130) & (d < 80),
+                ((130 <= s) & (s <= 139)) | ((80 <= d) & (d <= 89)),
+                (s >= 140) | (d >= 90),
+            ],
+            [1, 2, 3, 4, 5],
+            default=0,
+        )
+        return cls.LABELS[index]
+
     def classify_bp(self, systolic, diastolic):
         if systolic is None or diastolic is None:
             return 'Unknown'  # If values are invalid
@@ -50,4 +98,4 @@ class BPClassifier(BaseEstimator, TransformerMixin):
         elif systolic >= 140 or diastolic >= 90:
             return 'High BP (Stage 2)'
         else:
-            return 'Unknown'
\ No newline at end of file
+            return 'Unknown'
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+from .bmi_categorizer import BMICategorizer
+from .bp_classifier import BPClassifier
+from .feature_correcter import FEATURE_SCHEMA
+from .saved_encoder import CategoryLookup
+
+
+class _NoTimer:
+    """Default timer: measures nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def lap(self, name: str):
+        pass
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def no_timer(stage: str, rows: int = 1):
+    """Timer factory that records nothing (same interface as `helper.metrics.metrics.timer`)."""
+    return _NO_TIMER
+
+
+class CompiledPipeline:
+    """
+    Single-pass replacement for `pipeline.transform`.
+
+    The saved encoder and scaler are compiled once into category lookup tables (`CategoryLookup`,
+    as in `SavedEncoderTransformer`) and mean/scale arrays. Each call then writes the scaled features column by column into
+    one float64 buffer, without the intermediate DataFrame copies of the five-step Pipeline.
+    The output is bit-identical to `pipeline.transform` for validated inputs, and the input columns
+    are held to the same contract: a column the pipeline's `FeatureCorrecter` would reject
+    (unexpected, e.g. 'Weight Unit', or duplicated) raises the same ValueError here.
+
+    Arguments:
+        encoders : dict
+            Fitted OrdinalEncoder per categorical column (models/feature_encoder.pkl).
+        scaler : StandardScaler
+            Fitted scaler (models/scaler.pkl). Its `feature_names_in_` fixes the column order.
+        timer : callable, optional
+            `timer(stage, rows)` returning a context manager with a `lap(name)` method, such as
+            `helper.metrics.metrics.timer`. Each call is timed as 'compiled_pipeline' and its parts
+            as laps of it. Nothing is timed by default.
+    """
+    NUMERIC_INPUTS = ['Age', 'Sleep Duration', 'Quality of Sleep', 'Physical Activity Level',
+                      'Stress Level', 'Heart Rate', 'Daily Steps']
+    # FeatureCorrecter title-cases Occupation before encoding
+    NORMALIZE = {'Occupation': str.title}
+
+    def __init__(self, encoders, scaler, timer=no_timer):
+        self.timer = timer
+        self.feature_names = list(scaler.feature_names_in_)
+        self.n_features = len(self.feature_names)
+        self.mean_ = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale_ = np.asarray(scaler.scale_, dtype=np.float64)
+        self.position = {name: i for i, name in enumerate(self.feature_names)}
+        self._layouts = set()  # input layouts already checked against FEATURE_SCHEMA
+
+        # category -> code, with the encoder's own code for unknown (and missing) values
+        self.lookups = {col: CategoryLookup(encoder) for col, encoder in encoders.items()}
+
+    @classmethod
+    def from_pipeline(cls, pipeline, timer=no_timer):
+        """Compiles the saved encoder and scaler held by a `transformers.pipeline` Pipeline."""
+        return cls(pipeline.named_steps['saved_encoder'].encoders,
+                   pipeline.named_steps['saved_scaler'].scaler, timer)
+
+    def transform(self, X: pd.DataFrame, out=None) -> np.ndarray:
+        """
+        Turns validated inputs (the output of `UserDataCollector.validate`) into the scaled feature matrix.
+
+        Arguments:
+            X : pd.DataFrame
+                Validated rows with either 'Blood Pressure' or 'Systolic BP' and 'Diastolic BP'.
+                'Weight' and 'Height' may be replaced by an already computed 'BMI Category'
+                (as in data/data.csv), in which case the BMI step is skipped.
+            out : np.ndarray, optional
+                Preallocated float64 array of shape (len(X), n_features) to write into.
+
+        Returns:
+            np.ndarray of shape (len(X), n_features).
+        """
+        with self.timer('compiled_pipeline', len(X)) as timer:
+            return self._transform(X, out, timer)
+
+    def _transform(self, X, out, timer):
+        missing = [col for col in self.NUMERIC_INPUTS + ['Gender', 'Occupation'] if col not in X.columns]
+        has_body = 'Weight' in X.columns and 'Height' in X.columns
+        if not has_body and 'BMI Category' not in X.columns:
+            missing.append('Weight and Height')
+        if 'Blood Pressure' not in X.columns and not {'Systolic BP', 'Diastolic BP'} <= set(X.columns):
+            missing.append('Blood Pressure')
+        if missing:
+            raise ValueError(f"Missing input columns: {', '.join(missing)}")
+        self._check_columns(X.columns, has_body)
+
+        n_rows = len(X)
+        if out is None:
+            out = np.empty((n_rows, self.n_features), dtype=np.float64)
+        elif out.shape != (n_rows, self.n_features) or out.dtype != np.float64:
+            raise ValueError(f"out must be a float64 array of shape {(n_rows, self.n_features)}")
+
+        gender = X['Gender'].to_numpy(dtype=object)
+
+        # Numeric features go straight in
+        for col in self.NUMERIC_INPUTS:
+            out[:, self.position[col]] = X[col].to_numpy(dtype=np.float64)
+        timer.lap('numeric_copy')
+
+        # Derived categories
+        if has_body:
+            weight = X['Weight'].to_numpy(dtype=np.float64)
+            height = X['Height'].to_numpy(dtype=np.float64)
+            bmi_category = BMICategorizer.categorize(weight / (height ** 2), gender)
+        else:
+            bmi_category = X['BMI Category'].to_numpy(dtype=object)
+        timer.lap('bmi_category')
+
+        if 'Blood Pressure' in X.columns:
+            systolic, diastolic = BPClassifier.split_bp(X['Blood Pressure'])
+        else:
+            systolic = pd.to_numeric(X['Systolic BP'], errors='coerce')
+            diastolic = pd.to_numeric(X['Diastolic BP'], errors='coerce')
+        bp_category = BPClassifier.classify_bp_array(systolic, diastolic)
+        timer.lap('bp_category')
+
+        categories = {
+            'Gender': gender,
+            'Occupation': X['Occupation'].to_numpy(dtype=object),
+            'BMI Category': bmi_category,
+            'BP Category': bp_category,
+        }
+        for col, values in categories.items():
+            out[:, self.position[col]] = self.lookups[col].encode(values, col, self.NORMALIZE.get(col))
+        timer.lap('encode_categories')
+
+        # Standardise in place with the same operations as StandardScaler.transform
+        out -= self.mean_
+        out /= self.scale_
+        timer.lap('standardise')
+        return out
+
+    def _check_columns(self, columns, has_body):
+        # The columns FeatureCorrecter gets in the pipeline: the BMI and BP steps replace their
+        # inputs with 'BMI Category' and 'BP Category', everything else is passed through
+        key = tuple(columns)
+        if key in self._layouts:
+            return
+        consumed = {'Blood Pressure', 'Systolic BP', 'Diastolic BP'}
+        if has_body:
+            consumed |= {'Weight', 'Height', 'BMI'}
+        arranged = [col for col in key if col not in consumed]
+        arranged += [col for col in ('BMI Category', 'BP Category') if col not in arranged]
+        FEATURE_SCHEMA.index_map(arranged)
+
+        if len(self._layouts) >= FEATURE_SCHEMA.MAX_LAYOUTS:
+            self._layouts.clear()
+        self._layouts.add(key)
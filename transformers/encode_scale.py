@@ -0,0 +1,166 @@
+import threading
+
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from .saved_encoder import CategoryLookup
+
+
+class EncodeScaleTransformer(BaseEstimator, TransformerMixin):
+    """
+    The `saved_encoder` and `saved_scaler` steps fused into one, writing into a caller-supplied array.
+
+    Takes the output of `FeatureCorrecter` and writes every feature, encoded (categorical columns)
+    and standardised with the scaler's `mean_` and `scale_`, straight into `out` (float64 or
+    float32, shape (n_rows, n_features), in the scaler's feature order). There is no encoded
+    DataFrame and no intermediate float array.
+
+    It is a standalone stage (the app's pipeline keeps the two steps, and `CompiledPipeline` does
+    the same work for the predictor). Once warm, a call allocates nothing that grows with the batch
+    (unless an encoder was fitted with missing values): the input columns are taken with `to_numpy`,
+    as views of the frame's blocks, which costs about a KiB of Python objects per call, and
+
+    - up to `SMALL` rows (the app's single patients) are written value by value;
+    - larger batches go through per-thread scratch buffers of `BLOCK` rows, allocated on the first
+      such call of each thread. Numeric columns are standardised in the scratch buffer, categorical
+      columns are filled with one equality mask per category, and each finished column is copied
+      (and cast, for float32) into `out`.
+
+    For float64 output the values are the same as `SavedEncoderTransformer` followed by
+    `SavedScalerTransformer`; float32 output is the float64 result rounded once.
+
+    Arguments:
+        encoders : dict
+            Fitted OrdinalEncoder per categorical column (models/feature_encoder.pkl).
+        scaler : StandardScaler
+            Fitted scaler (models/scaler.pkl). Its `feature_names_in_` fixes the column order.
+        cat_features : list
+            The categorical columns.
+        handle_unknown : str, optional
+            Policy for categories the encoders were not fitted on, see `CategoryLookup`.
+    """
+    SMALL = 32
+    BLOCK = 65_536
+
+    def __init__(self, encoders, scaler, cat_features, handle_unknown=None):
+        self.encoders = encoders
+        self.scaler = scaler
+        self.cat_features = cat_features
+        self.handle_unknown = handle_unknown
+
+    def _compile(self):
+        # Compiled on first use (the app's pipeline is never fitted)
+        compiled = getattr(self, 'compiled_', None)
+        if compiled is not None:
+            return compiled
+
+        names = list(self.scaler.feature_names_in_)
+        mean = np.zeros(len(names)) if self.scaler.mean_ is None else np.asarray(self.scaler.mean_, np.float64)
+        scale = np.ones(len(names)) if self.scaler.scale_ is None else np.asarray(self.scaler.scale_, np.float64)
+        features = []
+        for j, name in enumerate(names):
+            m, s = float(mean[j]), float(scale[j])
+            if name not in self.cat_features:
+                features.append((name, m, s, None))
+                continue
+            lookup = CategoryLookup(self.encoders[name], self.handle_unknown)
+            # category -> standardised code, computed with the scaler's own operations
+            scaled = {cat: float((np.float64(code) - m) / s) for cat, code in lookup.codes.items()}
+            unknown = float((np.float64(lookup.unknown_value) - m) / s)
+            features.append((name, m, s, (lookup, scaled, unknown)))
+        self.compiled_ = compiled = (names, features)
+        return compiled
+
+    def fit(self, X, y=None):
+        self.compiled_ = None
+        self._compile()
+        self.is_fitted_ = True
+        return self
+
+    _local = threading.local()
+
+    def _scratch(self):
+        # Per thread, so that sessions sharing the pipeline never share buffers
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = self._local.scratch = (np.empty(self.BLOCK), np.empty(self.BLOCK, dtype=bool),
+                                             np.empty(self.BLOCK, dtype=bool))
+        return scratch
+
+    def transform(self, X, out=None) -> np.ndarray:
+        """
+        Encodes and standardises `X` (the output of `FeatureCorrecter`).
+
+        Arguments:
+            X : pd.DataFrame
+                Rows with every feature of the scaler, categorical ones as strings.
+            out : np.ndarray, optional
+                Writable float64 or float32 array of shape (len(X), n_features) to write into.
+                A float64 array is allocated if omitted.
+
+        Returns:
+            `out`.
+        """
+        names, features = self._compile()
+        n_rows = len(X)
+        if out is None:
+            out = np.empty((n_rows, len(names)), dtype=np.float64)
+        elif (out.shape != (n_rows, len(names)) or out.dtype not in (np.float64, np.float32)
+              or not out.flags.writeable):
+            raise ValueError(f"out must be a writable float64 or float32 array of shape {(n_rows, len(names))}")
+
+        columns = [X[name].to_numpy() for name in names]
+        if n_rows <= self.SMALL:
+            self._transform_rows(columns, features, out)
+        else:
+            self._transform_blocks(columns, features, out)
+        return out
+
+    @staticmethod
+    def _transform_rows(columns, features, out):
+        for j, ((name, m, s, categorical), values) in enumerate(zip(features, columns)):
+            if categorical is None:
+                for i in range(len(values)):
+                    out[i, j] = (float(values[i]) - m) / s
+                continue
+            lookup, scaled, _ = categorical
+            unknown = []
+            for i in range(len(values)):
+                value = scaled.get(values[i])
+                if value is None:
+                    value = (lookup.code(values[i], unknown) - m) / s
+                out[i, j] = value
+            lookup.report_unknown(unknown, name)
+
+    def _transform_blocks(self, columns, features, out):
+        buffer, mask, matched = self._scratch()
+        for start in range(0, len(out), self.BLOCK):
+            stop = min(start + self.BLOCK, len(out))
+            buf, msk, seen = buffer[:stop - start], mask[:stop - start], matched[:stop - start]
+            for j, ((name, m, s, categorical), values) in enumerate(zip(features, columns)):
+                block = values[start:stop]
+                if categorical is None:
+                    buf[...] = block
+                    buf -= m
+                    buf /= s
+                else:
+                    lookup, scaled, unknown_scaled = categorical
+                    if lookup.missing_value is not None:
+                        # Encoders fitted with missing values need the general lookup (which allocates)
+                        buf[...] = lookup.encode(block, name)
+                        buf -= m
+                        buf /= s
+                    else:
+                        # Rows matching no category keep the unknown code
+                        buf.fill(unknown_scaled)
+                        check = lookup.handle_unknown != 'use_encoded_value'
+                        if check:
+                            seen.fill(False)
+                        for category, value in scaled.items():
+                            np.equal(block, category, out=msk)
+                            np.copyto(buf, value, where=msk)
+                            if check:
+                                seen |= msk
+                        if check and not seen.all():
+                            lookup.report_unknown(list(block[~seen]), name)
+                out[start:stop, j] = buf
@@ -1,22 +1,132 @@
+import numpy as np
+import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
 
+from config import CAT_FEATURES, MODEL_FEATURES, NUM_FEATURES
+
+
+class FeatureSchema:
+    """
+    The model's input columns, compiled once: their order, dtypes and normalisation rules.
+
+    `arrange` checks the columns of a frame at entry (a missing, unexpected or duplicated column
+    raises a ValueError naming it) and puts them in the model's order with one `take` through an
+    index map. The map is computed once per input layout and cached, so for the layouts the app
+    produces a call costs a tuple of the column names and a dictionary lookup, plus the copy.
+
+    Arguments:
+        order : list
+            Columns in the order of the scaler and the model.
+        num_features : list
+            Numeric columns; cast to float64 if they arrive as another (e.g. object) dtype.
+        cat_features : list
+            Categorical columns, kept as objects.
+        normalize : dict, optional
+            Column -> function applied to each of its string values (e.g. `str.title`).
+    """
+    # Up to this many rows are normalised value by value; more are factorized first
+    SMALL = 32
+    # Input layouts remembered; the cache is emptied when it grows past this
+    MAX_LAYOUTS = 64
+
+    def __init__(self, order, num_features, cat_features, normalize=None):
+        order = list(order)
+        if set(order) != set(num_features) | set(cat_features) or len(order) != len(set(order)):
+            raise ValueError("order must list every numeric and categorical feature exactly once")
+        self.order = order
+        self.dtypes = {col: np.dtype(np.float64) if col in num_features else np.dtype(object) for col in order}
+        self.normalize = {col: (self.order.index(col), func) for col, func in (normalize or {}).items()}
+        self._numeric = [j for j, col in enumerate(order) if col in num_features]
+        self._layouts = {}
+
+    def index_map(self, columns) -> np.ndarray:
+        """
+        Positions in `columns` of the model's features, in the model's order (None if `columns`
+        are already in that order). Raises a ValueError if a feature is missing, unexpected or
+        duplicated.
+        """
+        key = tuple(columns)
+        index = self._layouts.get(key, False)
+        if index is not False:
+            return index
+
+        missing = [col for col in self.order if col not in key]
+        extra = [col for col in key if col not in self.dtypes]
+        duplicated = sorted({col for col in key if key.count(col) > 1})
+        problems = [f"{label}: {cols}" for label, cols in (("missing columns", missing),
+                                                            ("unexpected columns", extra),
+                                                            ("duplicated columns", duplicated)) if cols]
+        if problems:
+            raise ValueError(f"Input does not match the model's features ({'; '.join(problems)})")
+
+        index = None if list(key) == self.order else np.array([key.index(col) for col in self.order], dtype=np.intp)
+        if len(self._layouts) >= self.MAX_LAYOUTS:
+            self._layouts.clear()
+        self._layouts[key] = index
+        return index
+
+    def arrange(self, X: pd.DataFrame) -> pd.DataFrame:
+        """
+        A copy of `X` with the model's columns, in its order, with numeric columns as numbers and
+        normalised categorical values.
+        """
+        index = self.index_map(X.columns)
+        X = X.copy() if index is None else X.take(index, axis=1)
+
+        dtypes = X.dtypes.to_numpy()
+        for j in self._numeric:
+            if dtypes[j].kind not in 'biuf':
+                try:
+                    X.isetitem(j, X[self.order[j]].astype(np.float64))
+                except (TypeError, ValueError) as e:
+                    raise ValueError(f"Column {self.order[j]!r} must be numeric") from e
+
+        # Columns are read by name (names are unique once checked), which is cheaper than `iloc`
+        for col, (j, func) in self.normalize.items():
+            values = X[col].to_numpy()
+            normalized = self._normalize(values, func)
+            if normalized is not None:
+                X.isetitem(j, normalized)
+        return X
+
+    def _normalize(self, values: np.ndarray, func):
+        # Returns the normalised column, or None if no value changes (the usual case)
+        if len(values) <= self.SMALL:
+            normalized = [func(v) if isinstance(v, str) else v for v in values]
+            return None if normalized == list(values) else np.array(normalized, dtype=object)
+        # Each distinct value is normalised once, then broadcast back to the rows
+        positions, uniques = pd.factorize(values)
+        normalized = [func(v) if isinstance(v, str) else v for v in uniques]
+        if normalized == list(uniques):
+            return None
+        known = positions >= 0  # missing values (position -1) are left as they are
+        result = values.copy()
+        result[known] = np.array(normalized, dtype=object)[positions[known]]
+        return result
+
+
+# Compiled once, shared by every FeatureCorrecter
+FEATURE_SCHEMA = FeatureSchema(MODEL_FEATURES, NUM_FEATURES, CAT_FEATURES, normalize={'Occupation': str.title})
+
 
 class FeatureCorrecter(BaseEstimator, TransformerMixin):
     """
     This transformer rearranges the columns to match that of the model.
     It also capitalises Occupation column
+
+    The columns are checked and arranged by a `FeatureSchema` (`FEATURE_SCHEMA` by default), so an
+    input with a missing or unexpected column raises a ValueError instead of reaching the model.
+
+    Arguments:
+        schema : FeatureSchema, optional
+            Columns, dtypes and normalisation rules of the model.
     """
+    def __init__(self, schema=None):
+        self.schema = schema
+
     def fit(self, X, y=None):
         self.is_fitted_ = True
         return self
 
     def transform(self, X):
-        X = X.copy()
-        expected_order = ['Gender', 'Age', 'Occupation', 'Sleep Duration',
-                          'Quality of Sleep', 'Physical Activity Level', 'Stress Level',
-                          'BMI Category', 'Heart Rate', 'Daily Steps', 'BP Category']
-        X = X.reindex(columns=expected_order)
-
-        if 'Occupation' in X.columns:
-            X['Occupation'] = X['Occupation'].str.title()
-        return X
\ No newline at end of file
+        return (self.schema or FEATURE_SCHEMA).arrange(X)
@@ -1,29 +1,59 @@
 import pickle
-import sys
-import os
 from sklearn.pipeline import Pipeline
 from config import CAT_FEATURES, FEATURE_ENCODER, SCALER_FILE
-from transformers import BMICategorizer, BPClassifier, SavedEncoderTransformer, SavedScalerTransformer, FeatureCorrecter
-
-
-
-with open(SCALER_FILE, 'rb') as f:
-    scaler = pickle.load(f)
-
-with open(FEATURE_ENCODER, 'rb') as f:
-    f_encoder = pickle.load(f)
-
-
-# Define feature groups
-#cat_features = ['Gender', 'Occupation', 'BMI Category', 'BP Category']
-#num_features = ['Age', 'Sleep Duration', 'Quality of Sleep', 'Physical Activity Level', 'Stress Level', 'Heart Rate', 'Daily Steps']
-
-
-# Final pipeline
-pipeline = Pipeline([
-    ('bmi_categorizer', BMICategorizer()),
-    ('bp_classifier', BPClassifier()),
-    ('feature_correcter', FeatureCorrecter()),
-    ('saved_encoder', SavedEncoderTransformer(f_encoder, CAT_FEATURES)),
-    ('saved_scaler', SavedScalerTransformer(scaler))
-])
\ No newline at end of file
+from transformers import BMICategorizer, BPClassifier, SavedEncoderTransformer, SavedScalerTransformer, FeatureCorrecter, CompiledPipeline
+from transformers.compiled import no_timer
+
+
+class InstrumentedPipeline(Pipeline):
+    """
+    `Pipeline` whose `transform` times each step as 'pipeline.<step>' with `timer(stage, rows)`
+    (e.g. `helper.metrics.metrics.timer`; nothing is timed by default).
+    """
+
+    def __init__(self, steps, *, transform_input=None, memory=None, verbose=False, timer=no_timer):
+        super().__init__(steps, transform_input=transform_input, memory=memory, verbose=verbose)
+        self.timer = timer
+
+    def transform(self, X, **params):
+        if self.timer is no_timer or params:
+            return super().transform(X, **params)
+        for _, name, step in self._iter():
+            with self.timer(f"pipeline.{name}", len(X)):
+                X = step.transform(X)
+        return X
+
+
+def build_pipeline(f_encoder, scaler, timer=no_timer):
+    """
+    Builds the preprocessing pipeline around a fitted feature encoder and scaler, timing its
+    steps with `timer` (see `InstrumentedPipeline`).
+    """
+    steps = [
+        ('bmi_categorizer', BMICategorizer()),
+        ('bp_classifier', BPClassifier()),
+        ('feature_correcter', FeatureCorrecter()),
+        ('saved_encoder', SavedEncoderTransformer(f_encoder, CAT_FEATURES)),
+        ('saved_scaler', SavedScalerTransformer(scaler)),
+    ]
+    return InstrumentedPipeline(steps, timer=timer)
+
+
+def __getattr__(name):
+    """
+    `default_pipeline` and `default_compiled_pipeline` are built from the pickled feature encoder
+    and scaler on first use rather than on import (the app itself uses `helper.artifacts.registry`).
+    """
+    if name not in ('default_pipeline', 'default_compiled_pipeline'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    with open(SCALER_FILE, 'rb') as f:
+        scaler = pickle.load(f)
+
+    with open(FEATURE_ENCODER, 'rb') as f:
+        f_encoder = pickle.load(f)
+
+    # Final pipeline, and its single-pass equivalent compiled from the same encoder and scaler
+    globals().update(default_pipeline=build_pipeline(f_encoder, scaler),
+                     default_compiled_pipeline=CompiledPipeline(f_encoder, scaler))
+    return globals()[name]
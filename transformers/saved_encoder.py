@@ -1,22 +1,159 @@
+import logging
+
+import numpy as np
+import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
+
+logger = logging.getLogger(__name__)
+
 cat_features = ['Gender', 'Occupation', 'BMI Category', 'BP Category']
 
+# What to do with a category the encoder was not fitted on (e.g. the form's 'Others' occupation)
+UNKNOWN_POLICIES = ('use_encoded_value', 'warn', 'error')
+
+
+def _is_missing(value) -> bool:
+    return value is None or (not isinstance(value, str) and bool(pd.isna(value)))
+
+
+class CategoryLookup:
+    """
+    A fitted OrdinalEncoder compiled into a lookup table.
+
+    Codes are the positions in `encoder.categories_[0]`, as in `OrdinalEncoder.transform`. A value
+    the encoder was not fitted on is handled according to `handle_unknown`:
+
+    - 'use_encoded_value': gets the encoder's `unknown_value` (-1 for the saved encoders), which is
+      what `OrdinalEncoder.transform` does. The Clinician Portal's 'Others' occupation and any
+      occupation added to a form later are encoded this way.
+    - 'warn': the same, and the unknown categories are logged.
+    - 'error': raises a ValueError naming the column and the unknown categories.
+
+    Missing values (None, NaN) are unknown too, unless the encoder was fitted with missing values,
+    in which case they get its `encoded_missing_value`.
+
+    Arguments:
+        encoder : OrdinalEncoder
+            Fitted encoder of one column (or any object with its `categories_` and `unknown_value`,
+            such as the tables of the model bundle).
+        handle_unknown : str, optional
+            One of UNKNOWN_POLICIES. Defaults to 'use_encoded_value' if the encoder has an
+            `unknown_value`, 'error' otherwise (as `OrdinalEncoder` itself).
+    """
+    # Up to this many values are looked up one by one in Python; more are factorized first
+    SMALL = 32
+
+    def __init__(self, encoder, handle_unknown: str = None):
+        unknown_value = getattr(encoder, 'unknown_value', None)
+        if handle_unknown is None:
+            handle_unknown = 'error' if unknown_value is None else 'use_encoded_value'
+        if handle_unknown not in UNKNOWN_POLICIES:
+            raise ValueError(f"handle_unknown must be one of {UNKNOWN_POLICIES}, got {handle_unknown!r}")
+        if handle_unknown != 'error' and unknown_value is None:
+            raise ValueError("The encoder has no unknown_value to encode unknown categories with")
+        self.handle_unknown = handle_unknown
+
+        categories = list(encoder.categories_[0])
+        # OrdinalEncoder keeps a missing category (if it saw one) last
+        missing_known = bool(categories) and _is_missing(categories[-1])
+        if missing_known:
+            categories = categories[:-1]
+        self.categories = categories
+        self.codes = {category: float(code) for code, category in enumerate(categories)}
+        self.unknown_value = np.nan if unknown_value is None else float(unknown_value)
+        self.missing_value = float(getattr(encoder, 'encoded_missing_value', np.nan)) if missing_known else None
+
+    def code(self, value, unknown: list) -> float:
+        """Code of one value; unknown values are appended to `unknown`."""
+        code = self.codes.get(value)
+        if code is not None:
+            return code
+        if self.missing_value is not None and _is_missing(value):
+            return self.missing_value
+        unknown.append(value)
+        return self.unknown_value
+
+    def encode(self, values, column: str = None, normalize=None) -> np.ndarray:
+        """
+        Codes of `values` as a float64 array.
+
+        Arguments:
+            values : array-like
+                Categories of one column.
+            column : str, optional
+                Name of the column, for the messages about unknown categories.
+            normalize : callable, optional
+                Applied to every string value before the lookup (e.g. `str.title`).
+        """
+        unknown = []
+        if len(values) <= self.SMALL:
+            if normalize is not None:
+                values = [normalize(v) if isinstance(v, str) else v for v in values]
+            codes = np.array([self.code(v, unknown) for v in values], dtype=np.float64)
+        else:
+            # Each distinct category is looked up once, then the codes are broadcast back to the rows
+            positions, uniques = pd.factorize(np.asarray(values, dtype=object))
+            if normalize is not None:
+                uniques = [normalize(v) if isinstance(v, str) else v for v in uniques]
+            table = [self.code(v, unknown) for v in uniques]
+            if (positions < 0).any():
+                table.append(self.code(None, unknown))
+            table = np.array(table, dtype=np.float64)
+            codes = table[positions]  # position -1 (a missing value) takes the last entry
+
+        self.report_unknown(unknown, column)
+        return codes
+
+    def report_unknown(self, unknown: list, column: str = None):
+        """Applies the `handle_unknown` policy to the unknown values met while encoding."""
+        if unknown and self.handle_unknown != 'use_encoded_value':
+            found = sorted({str(v) for v in unknown})
+            message = f"Found unknown categories {found} in column {column!r}"
+            if self.handle_unknown == 'error':
+                raise ValueError(message)
+            logger.warning("%s; encoded as %s", message, self.unknown_value)
+
+
 class SavedEncoderTransformer(BaseEstimator, TransformerMixin):
     """
     Applies the saved encoder to specified categorical columns.
+
+    Each fitted OrdinalEncoder is compiled once into a `CategoryLookup`, so a call costs a
+    dictionary lookup per distinct category instead of one `OrdinalEncoder.transform` (with
+    sklearn's input validation) per column. The codes are the same as the encoder's.
+
+    Arguments:
+        encoders : dict
+            Fitted OrdinalEncoder per categorical column (models/feature_encoder.pkl).
+        cat_features : list
+            Columns to encode; those missing from the input are left out.
+        handle_unknown : str, optional
+            Policy for categories the encoders were not fitted on, see `CategoryLookup`.
     """
-    def __init__(self, encoders, cat_features):
+    def __init__(self, encoders, cat_features, handle_unknown=None):
         self.encoders = encoders
         self.cat_features = cat_features
+        self.handle_unknown = handle_unknown
+
+    def _lookups(self):
+        # Compiled on first use (the app's pipeline is never fitted)
+        lookups = getattr(self, 'lookups_', None)
+        if lookups is None:
+            lookups = self.lookups_ = {col: CategoryLookup(self.encoders[col], self.handle_unknown)
+                                       for col in self.cat_features}
+        return lookups
 
     def fit(self, X, y=None):
+        self.lookups_ = None
+        self._lookups()
         self.is_fitted_ = True
         return self
 
     def transform(self, X):
+        lookups = self._lookups()
         X = X.copy()
         for col in self.cat_features:
             if col in X.columns:
-                # Transform and override the column with encoded values.
-                X[col] = self.encoders[col].transform(X[[col]])
+                # Override the column with its codes
+                X[col] = lookups[col].encode(X[col].to_numpy(dtype=object), col)
         return X